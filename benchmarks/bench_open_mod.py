@@ -0,0 +1,63 @@
+# Measures how long opening a mod in the editor takes, using the offscreen
+# Qt platform so it runs without a display:
+#
+#   python benchmarks/bench_open_mod.py [--runs N]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PyQt6.QtWidgets import QApplication, QListWidgetItem  # noqa: E402
+
+import main as editor  # noqa: E402
+from xggx.model import PAYLOAD_OPTIONS, ModProject  # noqa: E402
+
+
+def write_full_project(projects_dir):
+    # Every payload field filled in, the worst case for building the editor
+    project = ModProject()
+    project.set(("name",), "Benchmark")
+    for _, key, fields in PAYLOAD_OPTIONS:
+        for field in fields:
+            project.set((key, field), "7" if key == "theme" else f"{key}/{field}.bin")
+    mod_path = os.path.join(projects_dir, "Benchmark_Mod")
+    os.makedirs(mod_path, exist_ok=True)
+    with open(os.path.join(mod_path, "manifest.json"), "w") as f:
+        f.write(project.to_json())
+    return "Benchmark_Mod"
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    app = QApplication(sys.argv)
+    window = editor.OperaGXModMaker(tempfile.mkdtemp())
+    folder = write_full_project(window.projects_dir)
+
+    open_times, group_times = [], []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        window.load_mod(QListWidgetItem(folder))
+        app.processEvents()
+        open_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _, key, _ in PAYLOAD_OPTIONS:
+            window.build_payload_group(key)
+        group_times.append(time.perf_counter() - start)
+        window.autosave.discard()
+
+    print(f"open mod:            median {statistics.median(open_times) * 1000:.1f} ms")
+    print(f"build all groups:    median {statistics.median(group_times) * 1000:.1f} ms")
+    window.jobs.shutdown()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,377 @@
+# Times the editor's hot paths on synthetic projects and compares the results
+# with a saved baseline. Widgets run on the offscreen Qt platform, so no
+# display is needed:
+#
+#   python benchmarks/suite.py --size medium --save-baseline benchmarks/results/baseline-medium.json
+#   python benchmarks/suite.py --size medium --baseline benchmarks/results/baseline-medium.json
+#
+# Exits with status 1 when any benchmark's median is more than --threshold
+# slower than the baseline.
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+import synthetic  # noqa: E402
+from bench_open_mod import write_full_project  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+# Differences below this are timer noise, whatever the ratio
+NOISE_FLOOR = 0.002
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS.append((name, fn))
+        return fn
+    return register
+
+
+def measure(fn, runs, setup=None):
+    times = []
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+class Context:
+    # Fixtures shared by every benchmark, built once per run of the suite
+    def __init__(self, root, size, runs):
+        self.root = root
+        self.size = size
+        self.params = synthetic.SIZES[size]
+        self.runs = runs
+        self.app = None
+        self.window = None
+
+        self.projects_dir = os.path.join(root, "projects")
+        synthetic.reset(self.projects_dir)
+        sources_dir = os.path.join(root, "sources")
+        self.project = synthetic.write_project(self.projects_dir, self.params, sources_dir)
+        self.sources = sorted(os.path.join(sources_dir, name) for name in os.listdir(sources_dir))
+        self.many_dir = os.path.join(root, "many")
+        synthetic.write_many_projects(self.many_dir, self.params["projects"])
+
+    def editor(self):
+        # One window for every GUI benchmark; constructing it is not timed
+        if self.window is None:
+            from PyQt6.QtWidgets import QApplication, QMessageBox
+            self.app = QApplication.instance() or QApplication([])
+            import main as editor
+            QMessageBox.information = lambda *args: None
+            # Never the developer's own projects folder, which the window
+            # would otherwise migrate, index and thumbnail
+            self.window = editor.OperaGXModMaker(self.projects_dir)
+        return self.window
+
+    def open_project(self):
+        from PyQt6.QtWidgets import QListWidgetItem
+        window = self.editor()
+        window.projects_dir = self.projects_dir
+        window.load_mod(QListWidgetItem(os.path.basename(self.project)))
+        self.app.processEvents()
+        return window
+
+    def close(self):
+        if self.window is not None:
+            self.window.autosave.discard()
+            self.window.jobs.shutdown()
+
+
+@benchmark("save_manifest")
+def bench_save_manifest(ctx):
+    # One edited text field, as written by autosave
+    window = ctx.open_project()
+    counter = iter(range(10 ** 9))
+
+    def edit():
+        window.project.set(("description",), f"Edit {next(counter)}")
+
+    def save():
+        window.save_manifest({("description",)})
+    return measure(save, ctx.runs, edit)
+
+
+@benchmark("save_manifest_full")
+def bench_save_manifest_full(ctx):
+    # Manual save: every image field is checked against the asset cache
+    window = ctx.open_project()
+
+    def save():
+        window.save_manifest()
+        window.jobs.wait_group(window.current_mod_path)
+    # As if both images had just been picked with Browse
+    window.project.set(("wallpaper", "dark.image"), ctx.sources[0])
+    window.project.set(("wallpaper", "light.image"), ctx.sources[-1])
+    save()
+    return measure(save, ctx.runs)
+
+
+@benchmark("load_manifest")
+def bench_load_manifest(ctx):
+    window = ctx.open_project()
+    return measure(window.load_manifest, ctx.runs)
+
+
+@benchmark("open_mod")
+def bench_open_mod(ctx):
+    # Every payload field filled in, the worst case for building the editor
+    from PyQt6.QtWidgets import QListWidgetItem
+    window = ctx.editor()
+    window.projects_dir = os.path.join(ctx.root, "open_mod")
+    os.makedirs(window.projects_dir, exist_ok=True)
+    folder = write_full_project(window.projects_dir)
+
+    def open_mod():
+        window.load_mod(QListWidgetItem(folder))
+        ctx.app.processEvents()
+    times = measure(open_mod, ctx.runs, window.autosave.discard)
+    window.autosave.discard()
+    return times
+
+
+def image_benchmark(ctx, cold):
+    window = ctx.open_project()
+
+    def clear():
+        # Drops the processed copies and the asset cache that remembers them
+        window.asset_cache = None
+        synthetic.reset(os.path.join(window.current_mod_path, "wallpaper"))
+        try:
+            os.remove(os.path.join(window.current_mod_path, ".xggx", "assets.json"))
+        except OSError:
+            pass
+
+    def process():
+        for i, source in enumerate(ctx.sources):
+            # Distinct fields, so no job supersedes another
+            window.handle_image(source, "wallpaper", "image", f"image_{i}")
+        window.jobs.wait_group(window.current_mod_path)
+        ctx.app.processEvents()
+    process()
+    return measure(process, ctx.runs, clear if cold else None)
+
+
+@benchmark("handle_image_cold")
+def bench_handle_image_cold(ctx):
+    return image_benchmark(ctx, cold=True)
+
+
+@benchmark("handle_image_warm")
+def bench_handle_image_warm(ctx):
+    return image_benchmark(ctx, cold=False)
+
+
+@benchmark("scan_mods_cold")
+def bench_scan_mods_cold(ctx):
+    # Headless: a projects folder seen for the first time
+    from xggx.index import INDEX_NAME, ProjectIndex
+
+    def drop_index():
+        try:
+            os.remove(os.path.join(ctx.many_dir, INDEX_NAME))
+        except OSError:
+            pass
+    return measure(lambda: ProjectIndex(ctx.many_dir).refresh(), ctx.runs, drop_index)
+
+
+@benchmark("scan_mods")
+def bench_scan_mods(ctx):
+    # Returning to the main menu: index refresh plus filling the list
+    window = ctx.editor()
+    window.projects_dir = ctx.many_dir
+    window.setup_project_index()
+    window.show_main_menu()
+
+    def scan():
+        window.scan_mods()
+        ctx.app.processEvents()
+    return measure(scan, ctx.runs)
+
+
+@benchmark("startup")
+def bench_startup(ctx):
+    # A fresh interpreter up to the main menu taking input, as reported by
+    # --profile-startup, with the many-projects folder and no saved index
+    from xggx.index import INDEX_NAME
+    src_dir = os.path.join(BENCH_DIR, "..", "src")
+    app_dir = os.path.join(ctx.root, "startup")
+    os.makedirs(app_dir, exist_ok=True)
+    # main.py keeps its projects next to itself
+    shutil.copy(os.path.join(src_dir, "main.py"), app_dir)
+    if not os.path.exists(os.path.join(app_dir, "projects")):
+        shutil.copytree(ctx.many_dir, os.path.join(app_dir, "projects"))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [src_dir, os.environ.get("PYTHONPATH")])))
+
+    times = []
+    for _ in range(ctx.runs):
+        try:
+            os.remove(os.path.join(app_dir, "projects", INDEX_NAME))
+        except OSError:
+            pass
+        result = subprocess.run([sys.executable, os.path.join(app_dir, "main.py"), "--profile-startup"],
+                                env=env, capture_output=True, text=True, timeout=120, check=True)
+        for line in result.stderr.splitlines():
+            if line.startswith("interactive"):
+                times.append(float(line.split()[1]) / 1000)
+    return times
+
+
+def zip_benchmark(ctx, incremental):
+    from xggx.build import default_zip_path, load_project_manifest, package_project
+    from xggx.packager import STATE_NAME
+    manifest = load_project_manifest(ctx.project)
+    zip_path = default_zip_path(ctx.project, manifest)
+    sticker = os.path.join(ctx.project, "stickers", "sticker_0000.png")
+
+    def prepare():
+        if incremental:
+            os.utime(sticker)
+            return
+        for path in [zip_path, os.path.join(ctx.project, ".xggx", STATE_NAME)]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    package_project(ctx.project, zip_path, manifest)
+    return measure(lambda: package_project(ctx.project, zip_path, manifest), ctx.runs, prepare)
+
+
+@benchmark("create_zip")
+def bench_create_zip(ctx):
+    return zip_benchmark(ctx, incremental=False)
+
+
+@benchmark("create_zip_incremental")
+def bench_create_zip_incremental(ctx):
+    # One sticker touched since the last build
+    return zip_benchmark(ctx, incremental=True)
+
+
+@benchmark("watch_update")
+def bench_watch_update(ctx):
+    # Watch mode picking up one edited sticker and patching it into the zip
+    from xggx.watch import ProjectWatcher
+    watcher = ProjectWatcher(ctx.project)
+    watcher.build()
+    sticker = os.path.join(ctx.project, "stickers", "sticker_0000.png")
+
+    def edit():
+        with open(sticker, "ab") as f:
+            f.write(b"\0")
+    return measure(watcher.update, ctx.runs, edit)
+
+
+@benchmark("preflight")
+def bench_preflight(ctx):
+    # Every referenced file resolved against a warm index, as before each zip
+    from xggx.build import load_project_manifest
+    from xggx.preflight import preflight
+    manifest = load_project_manifest(ctx.project)
+    preflight(ctx.project, manifest)
+    return measure(lambda: preflight(ctx.project, manifest), ctx.runs)
+
+
+@benchmark("stream_zip")
+def bench_stream_zip(ctx):
+    from xggx.build import stream_project
+
+    def stream():
+        with open(os.devnull, "wb") as f:
+            stream_project(ctx.project, f)
+    return measure(stream, ctx.runs)
+
+
+def summarize(times):
+    return {"median": statistics.median(times), "min": min(times), "max": max(times), "runs": times}
+
+
+def compare(results, baseline, threshold):
+    # Returns the names of benchmarks that regressed
+    regressions = []
+    print(f"{'benchmark':<26}{'baseline':>12}{'now':>12}{'change':>10}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        now = result["median"]
+        if base is None:
+            print(f"{name:<26}{'-':>12}{now * 1000:>10.1f}ms{'new':>10}")
+            continue
+        before = base["median"]
+        change = now / before - 1 if before else 0.0
+        regressed = change > threshold and now - before > NOISE_FLOOR
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<26}{before * 1000:>10.1f}ms{now * 1000:>10.1f}ms{change:>+10.0%}{flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the editor's hot paths")
+    parser.add_argument("--size", choices=sorted(synthetic.SIZES), default="small")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--only", action="append", default=[], help="run only this benchmark (repeatable)")
+    parser.add_argument("--output", default=None, help="results file (default: benchmarks/results/latest-SIZE.json)")
+    parser.add_argument("--baseline", default=None, help="compare against this results file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing (default: 0.2)")
+    parser.add_argument("--save-baseline", default=None, help="also write the results here as the new baseline")
+    args = parser.parse_args(argv)
+
+    selected = [(name, fn) for name, fn in BENCHMARKS if not args.only or name in args.only]
+    with tempfile.TemporaryDirectory(prefix="xggx-bench-") as root:
+        start = time.perf_counter()
+        ctx = Context(root, args.size, args.runs)
+        print(f"generated {args.size} fixtures in {time.perf_counter() - start:.1f}s")
+        results = {}
+        try:
+            for name, fn in selected:
+                results[name] = summarize(fn(ctx))
+                print(f"{name:<26}median {results[name]['median'] * 1000:9.1f} ms")
+        finally:
+            ctx.close()
+
+    data = {
+        "meta": {"size": args.size, "runs": args.runs, "python": platform.python_version(),
+                 "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    write_json(args.output or os.path.join(RESULTS_DIR, f"latest-{args.size}.json"), data)
+    if args.save_baseline:
+        write_json(args.save_baseline, data)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("size") != args.size:
+            print(f"warning: baseline was recorded with --size {baseline.get('meta', {}).get('size')}")
+        regressions = compare(results, baseline.get("results", {}), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
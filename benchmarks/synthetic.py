@@ -0,0 +1,102 @@
+# Generates synthetic mod projects for the benchmark suite. Content is random
+# so compression and image encoding do realistic amounts of work.
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from xggx.assets import AssetCache  # noqa: E402
+from xggx.model import ModProject  # noqa: E402
+from xggx.projects import new_project_path, project_id, write_project_file  # noqa: E402
+
+# stickers: 256x256 PNGs, wallpapers: 4K sources, music: 128 kbit/s tracks,
+# projects: size of the projects folder for the scanning benchmarks
+SIZES = {
+    "small": {"stickers": 10, "wallpapers": 1, "tracks": 1, "music_seconds": 30, "projects": 50},
+    "medium": {"stickers": 100, "wallpapers": 2, "tracks": 2, "music_seconds": 180, "projects": 500},
+    "huge": {"stickers": 1000, "wallpapers": 4, "tracks": 4, "music_seconds": 600, "projects": 5000},
+}
+WALLPAPER_SIZE = (3840, 2160)
+# Below 1920x1080, so handle_image has to upscale it
+SMALL_WALLPAPER_SIZE = (1280, 720)
+STICKER_SIZE = (256, 256)
+MUSIC_BYTES_PER_SECOND = 128 * 1000 // 8
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz
+MP3_FRAME_HEADER = b"\xff\xfb\x90\x64"
+
+
+def noise_image(size):
+    from PIL import Image
+    return Image.merge("RGB", [Image.effect_noise(size, 40 + 20 * i) for i in range(3)])
+
+
+def write_sources(root, params):
+    # External images the manifest points at, as if picked with Browse
+    os.makedirs(root, exist_ok=True)
+    sources = []
+    for i in range(params["wallpapers"]):
+        path = os.path.join(root, f"wallpaper_{i}.jpg")
+        noise_image(WALLPAPER_SIZE).save(path, "JPEG", quality=90)
+        sources.append(path)
+    small = os.path.join(root, "wallpaper_small.png")
+    noise_image(SMALL_WALLPAPER_SIZE).save(small, "PNG")
+    return sources, small
+
+
+def write_project(projects_dir, params, sources_dir, name="Benchmark"):
+    # Returns the new project's path
+    sources, small = write_sources(sources_dir, params)
+    project = ModProject()
+    project.set(("name",), name)
+    project.set(("wallpaper", "dark.image"), sources[0])
+    project.set(("wallpaper", "light.image"), small)
+
+    path = new_project_path(projects_dir)
+    os.makedirs(os.path.join(path, "stickers"))
+    os.makedirs(os.path.join(path, "music"))
+    write_project_file(path, {"id": project_id(path)})
+    sticker = noise_image(STICKER_SIZE)
+    for i in range(params["stickers"]):
+        sticker.save(os.path.join(path, "stickers", f"sticker_{i:04d}.png"), "PNG")
+    # Processed into wallpaper/ the way the editor's handle_image does, so the
+    # manifest's basenames resolve and builds package the 4K wallpaper
+    cache = AssetCache(path)
+    for source in (sources[0], small):
+        cache.process_image(source, os.path.join(path, "wallpaper", os.path.basename(source)), "wallpaper", "image")
+    cache.save()
+    tracks = []
+    for i in range(params["tracks"]):
+        track = os.path.join(path, "music", f"track_{i}.mp3")
+        with open(track, "wb") as f:
+            # An MPEG frame header, so preflight sees audio rather than noise
+            f.write(MP3_FRAME_HEADER)
+            remaining = params["music_seconds"] * MUSIC_BYTES_PER_SECOND - len(MP3_FRAME_HEADER)
+            while remaining:
+                chunk = min(remaining, 1024 * 1024)
+                f.write(os.urandom(chunk))
+                remaining -= chunk
+        tracks.append(f"music/{os.path.basename(track)}")
+    project.set(("background_music", "tracks"), ", ".join(tracks))
+    project.set(("stickers", "images"), "stickers/sticker_0000.png")
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        f.write(project.to_json())
+    return path
+
+
+def write_many_projects(projects_dir, count):
+    # Small manifest-only projects, for listing and scanning
+    os.makedirs(projects_dir, exist_ok=True)
+    for i in range(count):
+        project = ModProject()
+        project.set(("name",), f"Mod {i:05d}")
+        project.set(("developer",), f"Developer {i % 37}")
+        path = new_project_path(projects_dir)
+        os.makedirs(path)
+        with open(os.path.join(path, "manifest.json"), "w") as f:
+            f.write(project.to_json())
+
+
+def reset(path):
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
@@ -1,28 +1,420 @@
+import time
+# Taken before anything else is imported, for --profile-startup
+STARTED = time.perf_counter()
 import os
-import json
-import shutil
 import sys
-import zipfile
+from collections import OrderedDict
+from PyQt6 import sip
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
                              QPushButton, QFileDialog, QTabWidget, QTextEdit, QMessageBox, QComboBox, QListWidget, 
-                             QListWidgetItem, QSizePolicy)
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QFont, QIcon
-from PIL import Image
+                             QListWidgetItem, QSizePolicy, QProgressBar, QToolBox, QScrollArea, QFrame, QCheckBox,
+                             QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt6.QtCore import Qt, QTimer, QObject, pyqtSignal, QFileSystemWatcher, QSize, QEvent
+from PyQt6.QtGui import QFont, QIcon, QKeySequence, QPixmap, QShortcut
+from xggx import META_DIR, perf
+from xggx.archive import ensure_extracted, import_archive, is_pending
+from xggx.assets import AssetCache, render_image
+from xggx.history import PERSIST as HISTORY_PERSIST, History, load_history, save_history
+from xggx.jobs import JobQueue
+from xggx.index import ARCHIVE, ProjectIndex
+from xggx.model import PAYLOAD_OPTIONS, ModProject
+from xggx.projects import migrate_legacy_folders, new_project_path, project_id, write_project_file, zip_file_name
+from xggx.storage import recover_manifest, write_manifest
+from xggx.store import ENABLED as ASSET_STORE_ENABLED, AssetStore
+from xggx.thumbnails import THUMBNAIL_DIR, is_image_path, make_thumbnail, prune_thumbnails
+# Pillow, zipfile and the build pipeline are imported where they are first
+# used, so none of them delay the first window
+IMPORTED = time.perf_counter()
+
+# Parsed once for the whole application instead of per widget
+STYLESHEET = """
+    QMainWindow {
+        background-color: #2b2b2b;
+    }
+    QLabel, QStatusBar, QCheckBox {
+        color: #ffffff;
+    }
+    QLabel#fieldLabel {
+        font-size: 12px;
+    }
+    QPushButton {
+        background-color: #1f538d;
+        color: #ffffff;
+        border: none;
+        border-radius: 15px;
+        padding: 10px 30px;
+        font-size: 14px;
+        font-weight: bold;
+    }
+    QPushButton:hover {
+        background-color: #2a6bbf;
+    }
+    QPushButton#createButton {
+        padding: 15px 30px;
+        font-size: 16px;
+    }
+    QPushButton#browseButton {
+        border-radius: 10px;
+        padding: 5px 15px;
+        font-size: 12px;
+    }
+    QLineEdit {
+        background-color: #3a3a3a;
+        color: #ffffff;
+        border: 1px solid #555555;
+        border-radius: 10px;
+        padding: 8px;
+        font-size: 14px;
+        min-width: 400px;
+    }
+    QLineEdit#payloadEntry {
+        font-size: 12px;
+    }
+    QLineEdit:focus {
+        border: 1px solid #1f538d;
+    }
+    QComboBox {
+        background-color: #3a3a3a;
+        color: #ffffff;
+        border: 1px solid #555555;
+        border-radius: 10px;
+        padding: 8px;
+        font-size: 14px;
+    }
+    QListWidget {
+        background-color: #3a3a3a;
+        color: #ffffff;
+        border: 1px solid #555555;
+        border-radius: 10px;
+        padding: 5px;
+        min-width: 300px;
+    }
+    QListWidget::item {
+        padding: 10px;
+        margin: 2px;
+        border-radius: 5px;
+    }
+    QListWidget::item:hover {
+        background-color: #444444;
+    }
+    QTabWidget {
+        background-color: #3a3a3a;
+        border: 1px solid #555555;
+        border-radius: 10px;
+    }
+    QTabBar::tab {
+        background-color: #3a3a3a;
+        color: #ffffff;
+        border: 1px solid #555555;
+        border-radius: 10px 10px 0 0;
+        padding: 10px 20px;
+        margin-right: 2px;
+    }
+    QTabBar::tab:selected {
+        background-color: #1f538d;
+        border-bottom: none;
+    }
+    QTabWidget::pane {
+        border: 1px solid #555555;
+        border-radius: 0 0 10px 10px;
+        background-color: #2b2b2b;
+        padding: 15px;
+    }
+    QToolBox::tab {
+        background-color: #3a3a3a;
+        color: #ffffff;
+        border-radius: 5px;
+        font-size: 14px;
+        font-weight: bold;
+    }
+    QToolBox::tab:selected {
+        background-color: #1f538d;
+    }
+    QScrollArea, QScrollArea > QWidget > QWidget {
+        background-color: #2b2b2b;
+    }
+"""
+
+IMAGE_KEYS = ["app_icon", "wallpaper", "image_overrides", "mobile_image_overrides", "splash_screen", "stickers"]
+THUMBNAIL_CACHE_BYTES = int(os.environ.get("XGGX_THUMBNAIL_CACHE_MB", "32")) * 1024 * 1024
+
+SORT_OPTIONS = [("Name (A-Z)", "name", False), ("Name (Z-A)", "name", True),
+                ("Recently modified", "modified", True), ("Developer", "developer", False)]
+
+# Idle time after the last edit before pending changes are written to disk
+AUTOSAVE_IDLE_MS = int(os.environ.get("XGGX_AUTOSAVE_MS", "750"))
+# Preflight problems listed in a dialog; the rest are counted
+PROBLEMS_SHOWN = 20
+
+class AutosaveScheduler(QObject):
+    def __init__(self, save_callback, idle_ms=AUTOSAVE_IDLE_MS, parent=None):
+        super().__init__(parent)
+        self.save_callback = save_callback
+        self.dirty = set()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(idle_ms)
+        self.timer.timeout.connect(self.flush)
+
+    def mark_dirty(self, field):
+        self.dirty.add(field)
+        # Restarting the timer coalesces a burst of edits into a single write
+        self.timer.start()
+
+    def discard(self):
+        self.timer.stop()
+        self.dirty.clear()
+
+    def flush(self):
+        self.timer.stop()
+        if not self.dirty:
+            return False
+        dirty, self.dirty = self.dirty, set()
+        self.save_callback(dirty)
+        return True
+
+class PixmapCache:
+    # LRU of decoded thumbnails, bounded by the memory the pixmaps use
+    def __init__(self, budget_bytes=THUMBNAIL_CACHE_BYTES):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.pixmaps = OrderedDict()
+
+    @staticmethod
+    def cost(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def get(self, key):
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        if key in self.pixmaps:
+            self.used_bytes -= self.cost(self.pixmaps.pop(key))
+        self.pixmaps[key] = pixmap
+        self.used_bytes += self.cost(pixmap)
+        while self.used_bytes > self.budget_bytes and len(self.pixmaps) > 1:
+            _, evicted = self.pixmaps.popitem(last=False)
+            self.used_bytes -= self.cost(evicted)
+
+class JobSignals(QObject):
+    # Worker threads never touch widgets; they emit these and Qt delivers
+    # them on the GUI thread
+    progress = pyqtSignal(str, int, int)
+    dispatch = pyqtSignal(object)
+
+class UndoShortcuts(QObject):
+    # QLineEdit claims Ctrl+Z for its own undo, which only knows the text
+    # typed since the field got focus. Refusing it the shortcut lets the
+    # editor's history handle it instead, for every field alike.
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.keys = (QKeySequence.keyBindings(QKeySequence.StandardKey.Undo)
+                     + QKeySequence.keyBindings(QKeySequence.StandardKey.Redo))
+        QShortcut(QKeySequence.StandardKey.Undo, window, window.undo)
+        QShortcut(QKeySequence.StandardKey.Redo, window, window.redo)
+        QApplication.instance().installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.ShortcutOverride and isinstance(obj, QLineEdit) \
+                and not self.window.main_menu_visible:
+            pressed = QKeySequence(event.keyCombination())
+            return any(pressed.matches(key) == QKeySequence.SequenceMatch.ExactMatch for key in self.keys)
+        return False
+
+class StartupProfile(QObject):
+    # --profile-startup: prints how long the imports, building the window, the
+    # first paint and the project scan took, counted from the first line of
+    # this file, then quits
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.marks = [("imports", IMPORTED)]
+        self.painted = False
+        self.pending = {"interactive", "scan"}
+        window.installEventFilter(self)
+        window.mods_scanned.connect(self.scanned)
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter()))
+
+    def eventFilter(self, obj, event):
+        if obj is self.window and event.type() == QEvent.Type.Paint and not self.painted:
+            self.painted = True
+            self.mark("first paint")
+            # Runs once the event loop is idle again, i.e. input is handled
+            QTimer.singleShot(0, lambda: self.done("interactive", "interactive"))
+        return False
+
+    def scanned(self):
+        self.done("scan", f"projects scanned ({len(self.window.project_index.projects)})")
+
+    def done(self, step, label):
+        if step not in self.pending:
+            return
+        self.pending.discard(step)
+        self.mark(label)
+        if self.pending:
+            return
+        previous = STARTED
+        for label, at in sorted(self.marks, key=lambda mark: mark[1]):
+            print(f"{label:<28}{(at - STARTED) * 1000:>9.1f} ms{(at - previous) * 1000:>+10.1f} ms", file=sys.stderr)
+            previous = at
+        self.window.close()
+
 
 class OperaGXModMaker(QMainWindow):
-    def __init__(self):
+    # Emitted on the GUI thread when a background project scan has finished
+    mods_scanned = pyqtSignal()
+
+    def __init__(self, projects_dir=None):
+        # projects_dir defaults to the projects folder next to this file
         super().__init__()
+        QApplication.instance().setStyleSheet(STYLESHEET)
         self.setWindowTitle("Opera GX Mod Maker")
         self.setFixedSize(900, 700)  # Increased size to accommodate payload tab
 
-        self.projects_dir = os.path.join(os.path.dirname(__file__), "projects")
+        self.projects_dir = projects_dir or os.path.join(os.path.dirname(__file__), "projects")
         os.makedirs(self.projects_dir, exist_ok=True)
+        migrate_legacy_folders(self.projects_dir)
+        self.setup_project_index()
 
         self.current_mod_path = None
+        self.project = ModProject()
+        self.prepared_mod_path = None
+        self.asset_cache = None
+        self.asset_store = None
+        self.autosave = AutosaveScheduler(self.flush_autosave, parent=self)
+        self.history = None
+        self.undo_shortcuts = UndoShortcuts(self)
+        self.setup_jobs()
+        self.setup_watch()
+        self.pixmap_cache = PixmapCache()
+        self.thumbnail_dir = os.path.join(self.projects_dir, THUMBNAIL_DIR)
+        self.thumbnail_waiters = {}
         self.show_main_menu()
 
+    def setup_project_index(self):
+        self.project_index = ProjectIndex(self.projects_dir)
+        # Folder additions, removals and renames refresh the listing without a
+        # full rescan on every return to the main menu. Set XGGX_WATCH_PROJECTS=0
+        # to turn the watcher off, e.g. on shares that do not support it.
+        self.projects_watcher = None
+        self.index_refresh_timer = QTimer(self)
+        self.index_refresh_timer.setSingleShot(True)
+        self.index_refresh_timer.setInterval(300)
+        self.index_refresh_timer.timeout.connect(self.refresh_mods_in_background)
+        if os.environ.get("XGGX_WATCH_PROJECTS", "1") != "0":
+            self.projects_watcher = QFileSystemWatcher([self.projects_dir], self)
+            self.projects_watcher.directoryChanged.connect(lambda path: self.index_refresh_timer.start())
+
+    def setup_jobs(self):
+        self.jobs = JobQueue()
+        self.job_signals = JobSignals(self)
+        self.job_signals.progress.connect(self.show_job_progress)
+        self.job_signals.dispatch.connect(lambda callback: callback())
+
+        self.job_progress = QProgressBar()
+        self.job_progress.setMaximumWidth(200)
+        self.job_progress.hide()
+        self.job_cancel_button = QPushButton("Cancel")
+        self.job_cancel_button.clicked.connect(lambda: self.jobs.cancel_group(self.current_mod_path))
+        self.job_cancel_button.hide()
+        self.statusBar().addPermanentWidget(self.job_progress)
+        self.statusBar().addPermanentWidget(self.job_cancel_button)
+
+        # Cancelled jobs report nothing, so the status bar polls while work is pending
+        self.job_status_timer = QTimer(self)
+        self.job_status_timer.setInterval(200)
+        self.job_status_timer.timeout.connect(self.update_job_status)
+
+    def setup_watch(self):
+        # "Rebuild ZIP on changes": file system events restart the debounce
+        # timer, which runs a ProjectWatcher update as a background job
+        self.project_watcher = None
+        self.watch_fs = None
+        self.watch_job = None
+        self.watch_again = False
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.timeout.connect(self.update_watched_zip)
+        # Polls instead where file watches run out (e.g. the inotify limit)
+        self.watch_poll_timer = QTimer(self)
+        self.watch_poll_timer.timeout.connect(self.update_watched_zip)
+
+    def submit_job(self, key, label, fn, *args, on_done=None, on_error=None, group=None):
+        def finished(job, result):
+            self.job_signals.dispatch.emit(lambda: on_done(result) if on_done else None)
+
+        def failed(job, error):
+            if on_error is not None:
+                self.job_signals.dispatch.emit(lambda: on_error(error))
+            else:
+                self.job_signals.dispatch.emit(lambda: QMessageBox.critical(self, "Error", f"{label} failed: {error}"))
+
+        def progress(job, done, total):
+            self.job_signals.progress.emit(label, done, total)
+
+        job = self.jobs.submit(group or self.current_mod_path, key, fn, *args,
+                               on_done=finished, on_error=failed, on_progress=progress)
+        self.update_job_status()
+        return job
+
+    def show_job_progress(self, label, done, total):
+        self.job_progress.setMaximum(max(total, 1))
+        self.job_progress.setValue(done)
+        self.job_progress.show()
+        self.statusBar().showMessage(f"{label}... {done}/{total}")
+
+    def request_thumbnail(self, source, callback):
+        # callback(pixmap) runs on the GUI thread, right away on a cache hit
+        try:
+            st = os.stat(source)
+        except OSError:
+            return
+        key = (source, st.st_mtime_ns, st.st_size)
+        pixmap = self.pixmap_cache.get(key)
+        if pixmap is not None:
+            callback(pixmap)
+            return
+        waiters = self.thumbnail_waiters.setdefault(key, [])
+        waiters.append(callback)
+        if len(waiters) > 1:
+            return
+
+        def render(job):
+            # Decoding happens in a worker process; only the small PNG comes back
+            return self.jobs.run_in_process(job, make_thumbnail, source, self.thumbnail_dir)
+
+        def done(thumb_path):
+            pixmap = QPixmap(thumb_path)
+            self.pixmap_cache.put(key, pixmap)
+            for waiter in self.thumbnail_waiters.pop(key, []):
+                waiter(pixmap)
+
+        self.submit_job(key, "Loading previews", render, on_done=done, group="thumbnails",
+                        on_error=lambda error: self.thumbnail_waiters.pop(key, None))
+
+    def update_job_status(self):
+        pending = self.jobs.pending_count()
+        if pending:
+            self.job_cancel_button.show()
+            if not self.job_progress.isVisible():
+                self.statusBar().showMessage(f"{pending} background job(s) running...")
+            self.job_status_timer.start()
+        else:
+            self.job_status_timer.stop()
+            self.job_progress.hide()
+            self.job_cancel_button.hide()
+            self.statusBar().clearMessage()
+
     def show_main_menu(self):
+        self.stop_watching()
+        self.close_history()
+        self.main_menu_visible = True
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         self.layout = QVBoxLayout(self.central_widget)
@@ -33,78 +425,153 @@ class OperaGXModMaker(QMainWindow):
         title_label = QLabel("Opera GX Mod Maker")
         title_label.setFont(QFont("Arial", 24, QFont.Weight.Bold))
         title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        title_label.setStyleSheet("color: #ffffff;")
         self.layout.addWidget(title_label)
 
         create_button = QPushButton("Create New Mod")
+        create_button.setObjectName("createButton")
         create_button.clicked.connect(self.create_new_mod)
-        create_button.setStyleSheet("""
-            QPushButton {
-                background-color: #1f538d;
-                color: #ffffff;
-                border: none;
-                border-radius: 15px;
-                padding: 15px 30px;
-                font-size: 16px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #2a6bbf;
-            }
-        """)
         self.layout.addWidget(create_button)
 
+        import_button = QPushButton("Import Mod Archive")
+        import_button.setToolTip("Open a mod .zip or .crx; assets are extracted only when needed")
+        import_button.clicked.connect(self.import_mod)
+        self.layout.addWidget(import_button)
+
         scan_label = QLabel("Existing Mods:")
         scan_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        scan_label.setStyleSheet("color: #ffffff;")
         self.layout.addWidget(scan_label)
 
+        filter_layout = QHBoxLayout()
+        filter_layout.setSpacing(10)
+        self.mod_filter_entry = QLineEdit()
+        self.mod_filter_entry.setPlaceholderText("Filter by name, developer or description")
+        self.mod_filter_entry.textChanged.connect(lambda text: self.populate_mod_list())
+        filter_layout.addWidget(self.mod_filter_entry)
+        self.mod_sort_combo = QComboBox()
+        for label, _, _ in SORT_OPTIONS:
+            self.mod_sort_combo.addItem(label)
+        self.mod_sort_combo.currentIndexChanged.connect(lambda index: self.populate_mod_list())
+        filter_layout.addWidget(self.mod_sort_combo)
+        self.layout.addLayout(filter_layout)
+
         self.mod_list = QListWidget()
-        self.mod_list.setStyleSheet("""
-            QListWidget {
-                background-color: #3a3a3a;
-                color: #ffffff;
-                border: 1px solid #555555;
-                border-radius: 10px;
-                padding: 5px;
-                min-width: 300px;
-            }
-            QListWidget::item {
-                padding: 10px;
-                margin: 2px;
-                border-radius: 5px;
-            }
-            QListWidget::item:hover {
-                background-color: #444444;
-            }
-        """)
-        self.scan_mods()
+        self.mod_list.setIconSize(QSize(48, 48))
+        self.mod_list.verticalScrollBar().valueChanged.connect(lambda value: self.request_visible_thumbnails())
+        # The saved index is listed right away; what changed on disk since
+        # fills in when the background scan finishes
+        self.populate_mod_list()
+        self.refresh_mods_in_background()
         self.mod_list.itemDoubleClicked.connect(self.load_mod)
         self.layout.addWidget(self.mod_list)
 
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #2b2b2b;
-            }
-        """)
+        usage_button = QPushButton("Disk Usage && Clean Up")
+        usage_button.setToolTip("Delete shared assets no project uses any more and report disk usage")
+        usage_button.clicked.connect(self.clean_up_assets)
+        self.layout.addWidget(usage_button)
 
+    @perf.timed("scan_mods")
     def scan_mods(self):
+        self.project_index.refresh()
+        self.populate_mod_list()
+
+    def refresh_mods_in_background(self):
+        def scan(job):
+            with perf.span("scan_mods.background"):
+                changed = self.project_index.refresh()
+                prune_thumbnails(self.thumbnail_dir)
+                return changed
+
+        def done(changed):
+            if changed:
+                self.populate_mod_list()
+            self.mods_scanned.emit()
+
+        self.submit_job("scan", "Scanning projects", scan, on_done=done, group=self.projects_dir)
+
+    def populate_mod_list(self):
+        # Filtering and sorting work on the in-memory index only
+        if not self.main_menu_visible:
+            return
+        _, sort_by, reverse = SORT_OPTIONS[self.mod_sort_combo.currentIndex()]
+        # A refresh can land while the user is picking a mod; keep their selection
+        current = self.mod_list.currentItem()
+        selected = current.data(Qt.ItemDataRole.UserRole) if current is not None else None
         self.mod_list.clear()
-        for folder in os.listdir(self.projects_dir):
-            mod_path = os.path.join(self.projects_dir, folder)
-            if os.path.isdir(mod_path) and os.path.exists(os.path.join(mod_path, "manifest.json")):
-                self.mod_list.addItem(QListWidgetItem(folder))
+        self.mod_items = {}
+        for entry in self.project_index.entries(self.mod_filter_entry.text().strip(), sort_by, reverse):
+            item = QListWidgetItem(f"{entry.name} (archive)" if entry.kind == ARCHIVE else entry.name)
+            item.setData(Qt.ItemDataRole.UserRole, entry.folder)
+            summary = entry.summary
+            tooltip = [entry.folder if entry.kind != ARCHIVE else f"{entry.folder}, opening it imports it as a project"]
+            if summary.get("developer"):
+                tooltip.append(f"by {summary['developer']}")
+            if summary.get("description"):
+                tooltip.append(summary["description"])
+            if summary.get("payload"):
+                tooltip.append("Payload: " + ", ".join(summary["payload"]))
+            if summary.get("error"):
+                tooltip.append(summary["error"])
+            item.setToolTip("\n".join(tooltip))
+            self.mod_list.addItem(item)
+            self.mod_items[entry.folder] = item
+            if entry.folder == selected:
+                self.mod_list.setCurrentItem(item)
+        # Visible rows are only known once the list has been laid out
+        QTimer.singleShot(0, self.request_visible_thumbnails)
+
+    def request_visible_thumbnails(self):
+        # Only rows on screen get previews; the rest load as they scroll into view
+        if not self.main_menu_visible or not self.mod_list.count():
+            return
+        viewport = self.mod_list.viewport().rect()
+        first = self.mod_list.indexAt(viewport.topLeft())
+        last = self.mod_list.indexAt(viewport.bottomLeft())
+        start = first.row() if first.isValid() else 0
+        end = last.row() if last.isValid() else self.mod_list.count() - 1
+        for row in range(start, end + 1):
+            item = self.mod_list.item(row)
+            folder = item.data(Qt.ItemDataRole.UserRole)
+            entry = self.project_index.projects.get(folder)
+            if entry and entry.thumbnail and item.icon().isNull():
+                self.request_thumbnail(entry.thumbnail, lambda pixmap, f=folder: self.set_mod_icon(f, pixmap))
+
+    def set_mod_icon(self, folder, pixmap):
+        item = self.mod_items.get(folder) if self.main_menu_visible else None
+        if item is not None:
+            item.setIcon(QIcon(pixmap))
 
     def create_new_mod(self):
-        self.current_mod_path = None
+        # The folder itself is only created by the first save
+        self.current_mod_path = new_project_path(self.projects_dir)
         self.show_edit_window("New Mod")
 
     def load_mod(self, item):
-        mod_name = item.text()
-        self.current_mod_path = os.path.join(self.projects_dir, mod_name)
-        self.show_edit_window(mod_name)
+        folder = item.data(Qt.ItemDataRole.UserRole) or item.text()
+        entry = self.project_index.projects.get(folder)
+        if entry is not None and entry.kind == ARCHIVE:
+            # The zip moves into the new project, which replaces it in the list
+            self.open_archive(entry.path, move=True)
+            return
+        self.current_mod_path = os.path.join(self.projects_dir, folder)
+        self.show_edit_window(item.text())
+
+    def import_mod(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Import Mod Archive", "", "Mod Archives (*.zip *.crx)")
+        if file_path:
+            self.open_archive(file_path, move=False)
+
+    def open_archive(self, archive_path, move):
+        import zipfile
+        try:
+            project_path = import_archive(archive_path, self.projects_dir, move)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            QMessageBox.critical(self, "Error", f"Failed to import {os.path.basename(archive_path)}: {e}")
+            return
+        self.current_mod_path = project_path
+        self.show_edit_window(os.path.basename(archive_path))
 
     def show_edit_window(self, mod_name):
+        self.main_menu_visible = False
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         layout = QVBoxLayout(self.central_widget)
@@ -113,31 +580,6 @@ class OperaGXModMaker(QMainWindow):
 
         # Tabs for different sections
         tabs = QTabWidget()
-        tabs.setStyleSheet("""
-            QTabWidget {
-                background-color: #3a3a3a;
-                border: 1px solid #555555;
-                border-radius: 10px;
-            }
-            QTabBar::tab {
-                background-color: #3a3a3a;
-                color: #ffffff;
-                border: 1px solid #555555;
-                border-radius: 10px 10px 0 0;
-                padding: 10px 20px;
-                margin-right: 2px;
-            }
-            QTabBar::tab:selected {
-                background-color: #1f538d;
-                border-bottom: none;
-            }
-            QTabWidget::pane {
-                border: 1px solid #555555;
-                border-radius: 0 0 10px 10px;
-                background-color: #2b2b2b;
-                padding: 15px;
-            }
-        """)
         layout.addWidget(tabs)
 
         # General Info Tab
@@ -147,213 +589,219 @@ class OperaGXModMaker(QMainWindow):
 
         self.mod_name_entry = QLineEdit()
         self.mod_name_entry.setPlaceholderText("e.g., My Cool Mod")
-        self.mod_name_entry.setStyleSheet("""
-            QLineEdit {
-                background-color: #3a3a3a;
-                color: #ffffff;
-                border: 1px solid #555555;
-                border-radius: 10px;
-                padding: 8px;
-                font-size: 14px;
-                min-width: 400px;
-            }
-            QLineEdit:focus {
-                border: 1px solid #1f538d;
-            }
-        """)
-        self.mod_name_entry.textChanged.connect(self.update_mod_folder)
+        # Renaming a mod only changes the manifest; the folder keeps its id
+        self.mod_name_entry.textChanged.connect(lambda text: self.auto_save(text, ("name",)))
         general_layout.addWidget(QLabel("Mod Name:"))
         general_layout.addWidget(self.mod_name_entry)
 
         self.dev_name_entry = QLineEdit()
         self.dev_name_entry.setPlaceholderText("e.g., John Doe")
-        self.dev_name_entry.setStyleSheet("""
-            QLineEdit {
-                background-color: #3a3a3a;
-                color: #ffffff;
-                border: 1px solid #555555;
-                border-radius: 10px;
-                padding: 8px;
-                font-size: 14px;
-                min-width: 400px;
-            }
-            QLineEdit:focus {
-                border: 1px solid #1f538d;
-            }
-        """)
-        self.dev_name_entry.textChanged.connect(self.auto_save)
+        self.dev_name_entry.textChanged.connect(lambda text: self.auto_save(text, ("developer",)))
         general_layout.addWidget(QLabel("Your Name:"))
         general_layout.addWidget(self.dev_name_entry)
 
         self.desc_entry = QLineEdit()
         self.desc_entry.setPlaceholderText("e.g., A cool mod")
-        self.desc_entry.setStyleSheet("""
-            QLineEdit {
-                background-color: #3a3a3a;
-                color: #ffffff;
-                border: 1px solid #555555;
-                border-radius: 10px;
-                padding: 8px;
-                font-size: 14px;
-                min-width: 400px;
-            }
-            QLineEdit:focus {
-                border: 1px solid #1f538d;
-            }
-        """)
-        self.desc_entry.textChanged.connect(self.auto_save)
+        self.desc_entry.textChanged.connect(lambda text: self.auto_save(text, ("description",)))
         general_layout.addWidget(QLabel("Description:"))
         general_layout.addWidget(self.desc_entry)
 
         tabs.addTab(general_tab, "General")
 
-        # Payload Options Tab
+        # Payload Options Tab. Each group gets an empty page up front; its rows
+        # are only created the first time the group is opened.
         payload_tab = QWidget()
         payload_layout = QVBoxLayout(payload_tab)
-        payload_layout.setSpacing(20)
-
-        payload_options = [
-            ("App Icon", "app_icon", ["id", "name", "path"]),
-            ("Wallpaper", "wallpaper", ["id", "name", "dark.image", "light.image"]),
-            ("Background Music", "background_music", ["tracks"]),
-            ("Browser Sounds", "browser_sounds", ["sounds.CLICK", "sounds.FEATURE_SWITCH_OFF", "sounds.FEATURE_SWITCH_ON", 
-                                                  "sounds.HOVER", "sounds.HOVER_UP", "sounds.IMPORTANT_CLICK", 
-                                                  "sounds.LEVEL_UPGRADE", "sounds.LIMITER_OFF", "sounds.LIMITER_ON", 
-                                                  "sounds.SWITCH_TOGGLE", "sounds.TAB_CLOSE", "sounds.TAB_INSERT", 
-                                                  "sounds.TAB_SLASH"]),
-            ("Keyboard Sounds", "keyboard_sounds", ["sounds.TYPING_BACKSPACE", "sounds.TYPING_ENTER", "sounds.TYPING_LETTER", 
-                                                    "sounds.TYPING_SPACE"]),
-            ("Fonts", "fonts", ["header.name", "variants.path"]),
-            ("Image Overrides", "image_overrides", ["images.sidebar_bookmarks_button", "images.sidebar_gx_booster_button", 
-                                                    "images.sidebar_limiters_button", "images.sidebar_mods_button", 
-                                                    "images.sidebar_settings_button", "images.sidebar_shaders_button"]),
-            ("Mobile Image Overrides", "mobile_image_overrides", ["images.start_page_logo"]),
-            ("Page Styles", "page_styles", ["css", "matches"]),
-            ("Shaders", "shaders", ["path"]),
-            ("Splash Screen", "splash_screen", ["path"]),
-            ("Stickers", "stickers", ["images", "preview"]),
-            ("Theme", "theme", ["dark.gx_accent.h", "dark.gx_accent.s", "dark.gx_accent.l", "dark.gx_secondary_base.h", 
-                                "dark.gx_secondary_base.s", "dark.gx_secondary_base.l", "light.gx_accent.h", "light.gx_accent.s", 
-                                "light.gx_accent.l", "light.gx_secondary_base.h", "light.gx_secondary_base.s", 
-                                "light.gx_secondary_base.l"])
-        ]
-
         self.payload_entries = {}
-        for label, key, fields in payload_options:
-            group_layout = QVBoxLayout()
-            group_layout.setSpacing(10)
-            group_label = QLabel(f"{label}:")
-            group_label.setStyleSheet("color: #ffffff; font-size: 14px; font-weight: bold;")
-            group_layout.addWidget(group_label)
-            for field in fields:
-                field_label = QLabel(f"{field.replace('.', ' > ')}:")
-                field_label.setStyleSheet("color: #ffffff; font-size: 12px;")
-                h_layout = QHBoxLayout()
-                h_layout.setSpacing(10)
-
-                entry = QLineEdit()
-                entry.setPlaceholderText(f"Enter {field.replace('.', ' ')} path or value")
-                entry.setStyleSheet("""
-                    QLineEdit {
-                        background-color: #3a3a3a;
-                        color: #ffffff;
-                        border: 1px solid #555555;
-                        border-radius: 10px;
-                        padding: 8px;
-                        font-size: 12px;
-                        min-width: 400px;
-                    }
-                    QLineEdit:focus {
-                        border: 1px solid #1f538d;
-                    }
-                """)
-                entry.textChanged.connect(self.auto_save)
-                h_layout.addWidget(field_label)
-                h_layout.addWidget(entry)
-
-                browse_button = QPushButton("Browse")
-                browse_button.clicked.connect(lambda checked, e=entry, k=key, f=field: self.browse_file(e, k, f))
-                browse_button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #1f538d;
-                        color: #ffffff;
-                        border: none;
-                        border-radius: 10px;
-                        padding: 5px 15px;
-                        font-size: 12px;
-                        font-weight: bold;
-                    }
-                    QPushButton:hover {
-                        background-color: #2a6bbf;
-                    }
-                """)
-                h_layout.addWidget(browse_button)
-                group_layout.addLayout(h_layout)
-                if key not in self.payload_entries:
-                    self.payload_entries[key] = {}
-                self.payload_entries[key][field] = entry
-            payload_layout.addLayout(group_layout)
-
+        self.payload_pages = {}
+        self.payload_toolbox = QToolBox()
+        for label, key, fields in PAYLOAD_OPTIONS:
+            page = QScrollArea()
+            page.setWidgetResizable(True)
+            page.setFrameShape(QFrame.Shape.NoFrame)
+            self.payload_toolbox.addItem(page, label)
+            self.payload_pages[key] = (page, fields)
+        self.payload_toolbox.currentChanged.connect(
+            lambda index: self.build_payload_group(PAYLOAD_OPTIONS[index][1]))
+        payload_layout.addWidget(self.payload_toolbox)
         tabs.addTab(payload_tab, "Payload Options")
 
+        def tab_changed(index):
+            self.autosave.flush()
+            if tabs.widget(index) is payload_tab:
+                self.build_payload_group(PAYLOAD_OPTIONS[self.payload_toolbox.currentIndex()][1])
+        tabs.currentChanged.connect(tab_changed)
+
+        # Only shown when timing spans are on (XGGX_PERF=1 or --perf)
+        if perf.enabled:
+            tabs.addTab(self.build_performance_tab(), "Performance")
+
         # Buttons
         button_layout = QHBoxLayout()
         button_layout.setSpacing(20)
         button_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
         zip_button = QPushButton("Create ZIP")
-        zip_button.clicked.connect(self.create_zip)
-        zip_button.setStyleSheet("""
-            QPushButton {
-                background-color: #1f538d;
-                color: #ffffff;
-                border: none;
-                border-radius: 15px;
-                padding: 10px 30px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #2a6bbf;
-            }
-        """)
+        zip_button.clicked.connect(lambda: self.create_zip())
         button_layout.addWidget(zip_button)
 
+        self.watch_checkbox = QCheckBox("Rebuild ZIP on changes")
+        self.watch_checkbox.setToolTip("Keep the ZIP up to date while wallpapers, CSS, shaders and other assets "
+                                       "are edited in other programs")
+        self.watch_checkbox.toggled.connect(self.set_watching)
+        button_layout.addWidget(self.watch_checkbox)
+
+        self.optimize_checkbox = QCheckBox("Optimize media")
+        self.optimize_checkbox.setToolTip("Re-encode wallpapers to WebP, quantize stickers, strip image metadata "
+                                          "downmix short WAV sounds and minify CSS and shaders before zipping")
+        button_layout.addWidget(self.optimize_checkbox)
+
         save_button = QPushButton("Save")
         save_button.clicked.connect(self.manual_save)
-        save_button.setStyleSheet("""
-            QPushButton {
-                background-color: #1f538d;
-                color: #ffffff;
-                border: none;
-                border-radius: 15px;
-                padding: 10px 30px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #2a6bbf;
-            }
-        """)
         button_layout.addWidget(save_button)
 
-        layout.addLayout(button_layout)
+        self.undo_button = QPushButton("Undo")
+        self.undo_button.setToolTip("Undo the last change (Ctrl+Z)")
+        self.undo_button.clicked.connect(self.undo)
+        button_layout.addWidget(self.undo_button)
+        self.redo_button = QPushButton("Redo")
+        self.redo_button.setToolTip("Redo the last undone change (Ctrl+Shift+Z)")
+        self.redo_button.clicked.connect(self.redo)
+        button_layout.addWidget(self.redo_button)
 
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #2b2b2b;
-            }
-        """)
+        layout.addLayout(button_layout)
 
-        if self.current_mod_path:
+        self.project = ModProject()
+        if self.current_mod_path and os.path.isdir(self.current_mod_path):
             self.load_manifest()
         else:
             self.mod_name_entry.setText(mod_name)
             self.dev_name_entry.setText("Anonymous")
             self.desc_entry.setText("A custom Opera GX mod.")
+        # Populating the widgets is not an edit
+        self.autosave.discard()
+        self.open_history()
+
+    def build_performance_tab(self):
+        tab = QWidget()
+        tab_layout = QVBoxLayout(tab)
+        self.perf_table = QTableWidget(0, 7)
+        self.perf_table.setHorizontalHeaderLabels(["Span", "Calls", "Total ms", "Mean ms", "Max ms", "Read", "Written"])
+        self.perf_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.perf_table.verticalHeader().setVisible(False)
+        self.perf_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        tab_layout.addWidget(self.perf_table)
+
+        perf_buttons = QHBoxLayout()
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(lambda: (perf.reset(), self.refresh_performance_tab()))
+        perf_buttons.addWidget(reset_button)
+        export_button = QPushButton("Export Trace")
+        export_button.clicked.connect(self.export_trace)
+        perf_buttons.addWidget(export_button)
+        tab_layout.addLayout(perf_buttons)
+
+        # Live while the tab is on screen; the timer dies with the tab
+        timer = QTimer(tab)
+        timer.setInterval(1000)
+        timer.timeout.connect(lambda: self.perf_table.isVisible() and self.refresh_performance_tab())
+        timer.start()
+        self.refresh_performance_tab()
+        return tab
+
+    def refresh_performance_tab(self):
+        rows = perf.stats()
+        self.perf_table.setRowCount(len(rows))
+        for row, (name, stat) in enumerate(rows):
+            values = [name, str(stat.count), f"{stat.total * 1000:.1f}", f"{stat.mean * 1000:.1f}",
+                      f"{stat.max * 1000:.1f}", f"{stat.bytes_read:,}", f"{stat.bytes_written:,}"]
+            for column, value in enumerate(values):
+                self.perf_table.setItem(row, column, QTableWidgetItem(value))
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "xggx-trace.json", "Trace Files (*.json)")
+        if not path:
+            return
+        try:
+            count = perf.export_chrome_trace(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Failed to export trace: {e}")
+            return
+        self.statusBar().showMessage(f"Exported {count} spans to {path}", 5000)
+
+    def build_payload_group(self, key):
+        if key in self.payload_entries:
+            return
+        page, fields = self.payload_pages[key]
+        container = QWidget()
+        group_layout = QVBoxLayout(container)
+        group_layout.setSpacing(10)
+        entries = {}
+        for field in fields:
+            field_label = QLabel(f"{field.replace('.', ' > ')}:")
+            field_label.setObjectName("fieldLabel")
+            h_layout = QHBoxLayout()
+            h_layout.setSpacing(10)
+
+            entry = QLineEdit()
+            entry.setObjectName("payloadEntry")
+            entry.setPlaceholderText(f"Enter {field.replace('.', ' ')} path or value")
+            # Filled from the model before connecting, so this is not an edit
+            entry.setText(self.project.get((key, field)))
+            entry.textChanged.connect(lambda text, k=key, f=field: self.auto_save(text, (k, f)))
+            h_layout.addWidget(field_label)
+            h_layout.addWidget(entry)
+            if key in IMAGE_KEYS:
+                preview = QLabel()
+                preview.setFixedSize(40, 40)
+                preview.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                entry.textChanged.connect(lambda text, p=preview, k=key: self.update_field_preview(p, k, text))
+                self.update_field_preview(preview, key, entry.text())
+                h_layout.addWidget(preview)
+
+            browse_button = QPushButton("Browse")
+            browse_button.setObjectName("browseButton")
+            browse_button.clicked.connect(lambda checked, e=entry, k=key, f=field: self.browse_file(e, k, f))
+            h_layout.addWidget(browse_button)
+            group_layout.addLayout(h_layout)
+            entries[field] = entry
+        group_layout.addStretch()
+        page.setWidget(container)
+        self.payload_entries[key] = entries
+
+    def update_field_preview(self, preview, key, text):
+        preview.clear()
+        preview.setProperty("previewText", text)
+        path = text.strip()
+        if not is_image_path(path):
+            return
+        if not os.path.isfile(path) and self.current_mod_path:
+            # Saved manifests keep only the name of files copied into the
+            # project; imported mods may keep their archive's own layout
+            mod_path = self.current_mod_path
+            candidates = [f"{key}/{os.path.basename(path)}", path.lstrip("/")]
+            found = [rel for rel in candidates if os.path.isfile(os.path.join(mod_path, rel))]
+            if not found:
+                # Imported mods extract an image the first time it is shown
+                pending = [rel for rel in candidates if is_pending(mod_path, rel)]
+                if pending:
+                    self.submit_job(("extract", key, text), "Extracting", lambda job: ensure_extracted(mod_path, pending[:1]),
+                                    on_done=lambda count: count and not sip.isdeleted(preview)
+                                    and self.update_field_preview(preview, key, preview.property("previewText")))
+                return
+            path = os.path.join(mod_path, found[0])
+        if os.path.isfile(path):
+            self.request_thumbnail(path, lambda pixmap: self.set_field_preview(preview, text, pixmap))
+
+    def set_field_preview(self, preview, text, pixmap):
+        # The field may have been edited or the editor closed while loading
+        if sip.isdeleted(preview) or preview.property("previewText") != text:
+            return
+        preview.setPixmap(pixmap.scaled(preview.size(), Qt.AspectRatioMode.KeepAspectRatio,
+                                        Qt.TransformationMode.SmoothTransformation))
 
     def browse_file(self, entry, key, field):
-        if key in ["app_icon", "wallpaper", "image_overrides", "mobile_image_overrides", "splash_screen", "stickers"]:
+        if key in IMAGE_KEYS:
             file_path, _ = QFileDialog.getOpenFileName(self, f"Select {field.replace('.', ' ')}", "", "Image Files (*.jpg *.png *.webp)")
         elif key in ["background_music", "browser_sounds", "keyboard_sounds"]:
             file_path, _ = QFileDialog.getOpenFileName(self, f"Select {field.replace('.', ' ')}", "", "Audio Files (*.mp3 *.wav)")
@@ -369,240 +817,357 @@ class OperaGXModMaker(QMainWindow):
         if file_path:
             entry.setText(file_path)
 
-    def auto_save(self, text=None):
+    def auto_save(self, text=None, field=None):
+        # Only the edited payload entry is touched; unchanged text is a no-op
+        if self.project.set(field, text) and self.current_mod_path:
+            self.autosave.mark_dirty(field)
+
+    def flush_autosave(self, dirty_fields):
         if self.current_mod_path:
-            self.save_manifest()
+            self.save_manifest(dirty_fields)
+            self.record_history()
 
     def manual_save(self):
         if self.current_mod_path:
+            self.autosave.discard()
             self.save_manifest()
+            self.record_history()
             QMessageBox.information(self, "Success", "Mod saved successfully!")
 
-    def update_mod_folder(self, text):
-        new_name = self.mod_name_entry.text().strip() or "My_GX_Mod"
-        new_folder = os.path.join(self.projects_dir, f"{new_name.replace(' ', '_')}_Mod")
-        
-        if self.current_mod_path and self.current_mod_path != new_folder:
-            if os.path.exists(self.current_mod_path):
-                try:
-                    # Rename the folder
-                    shutil.move(self.current_mod_path, new_folder)
-                    self.current_mod_path = new_folder
-                    # Update manifest name if it exists
-                    manifest_path = os.path.join(self.current_mod_path, "manifest.json")
-                    if os.path.exists(manifest_path):
-                        with open(manifest_path, "r") as f:
-                            manifest = json.load(f)
-                        manifest["name"] = new_name
-                        with open(manifest_path, "w") as f:
-                            json.dump(manifest, f, indent=2)
-                    self.save_manifest()  # Ensure manifest reflects the new name
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Failed to rename folder: {e}")
-            else:
-                self.current_mod_path = new_folder
-                os.makedirs(self.current_mod_path, exist_ok=True)
-                self.save_manifest()
+    def open_history(self):
+        # Each autosave (a burst of typing) becomes one undoable step
+        current = self.project.snapshot()
+        if HISTORY_PERSIST and self.current_mod_path and os.path.isdir(self.current_mod_path):
+            self.history = load_history(self.current_mod_path, current)
+        else:
+            self.history = History(current)
+        self.update_history_buttons()
 
-    def save_manifest(self):
-        mod_name = self.mod_name_entry.text().strip() or "My GX Mod"
-        dev_name = self.dev_name_entry.text().strip() or "Anonymous"
-        description = self.desc_entry.text().strip() or "A custom Opera GX mod."
-
-        manifest = {
-            "manifest_version": 3,
-            "name": mod_name,
-            "version": "1.0",
-            "description": description,
-            "developer": {"name": dev_name},
-            "icons": {"512": "icon_512.png"},
-            "mod": {
-                "schema_version": 2,
-                "flavor": {
-                    "features": [],
-                    "hash": "74be16979710d4c4e7c6647856088456",
-                    "parent_hash": "d41d8cd98f00b204e9800998ecf8427e"
-                },
-                "license": "license.txt",
-                "payload": {
-                    "app_icon": [],
-                    "wallpaper": [],
-                    "background_music": [],
-                    "browser_sounds": [],
-                    "keyboard_sounds": [],
-                    "fonts": [],
-                    "image_overrides": [],
-                    "mobile_image_overrides": [],
-                    "page_styles": [],
-                    "shaders": [],
-                    "splash_screen": [],
-                    "stickers": [],
-                    "theme": []
-                }
-            },
-            "update_url": "https://api.gx.me/store/mods/update"
-        }
-
-        # Populate payload from entries
-        for key, entries in self.payload_entries.items():
-            if key in ["app_icon", "wallpaper", "background_music", "splash_screen", "stickers"]:
-                item = {"id": "0", "name": f"{mod_name} {key.capitalize()}"}
-                for field, entry in entries.items():
-                    value = entry.text().strip()
-                    if value:
-                        if field == "dark.image" or field == "light.image":
-                            self.handle_image(value, key, field.split('.')[1])
-                            item[field] = os.path.basename(value) if os.path.exists(value) else value
-                        elif field == "tracks" or field == "sounds" or field == "images":
-                            item[field] = [v.strip() for v in value.split(',') if v.strip()]
-                        else:
-                            item[field] = value
-                if any(item.values()):
-                    manifest["mod"]["payload"][key].append(item)
-            elif key == "shaders":
-                for field, entry in entries.items():
-                    value = entry.text().strip()
-                    if value:
-                        manifest["mod"]["payload"][key].append({"name": f"{mod_name} Shader", "path": value})
-            elif key == "theme":
-                dark_accent_h = entries.get("dark.gx_accent.h", QLineEdit()).text().strip() or "211"
-                dark_accent_s = entries.get("dark.gx_accent.s", QLineEdit()).text().strip() or "100"
-                dark_accent_l = entries.get("dark.gx_accent.l", QLineEdit()).text().strip() or "54"
-                dark_base_h = entries.get("dark.gx_secondary_base.h", QLineEdit()).text().strip() or "234"
-                dark_base_s = entries.get("dark.gx_secondary_base.s", QLineEdit()).text().strip() or "35"
-                dark_base_l = entries.get("dark.gx_secondary_base.l", QLineEdit()).text().strip() or "16"
-                light_accent_h = entries.get("light.gx_accent.h", QLineEdit()).text().strip() or "224"
-                light_accent_s = entries.get("light.gx_accent.s", QLineEdit()).text().strip() or "100"
-                light_accent_l = entries.get("light.gx_accent.l", QLineEdit()).text().strip() or "66"
-                light_base_h = entries.get("light.gx_secondary_base.h", QLineEdit()).text().strip() or "210"
-                light_base_s = entries.get("light.gx_secondary_base.s", QLineEdit()).text().strip() or "47"
-                light_base_l = entries.get("light.gx_secondary_base.l", QLineEdit()).text().strip() or "88"
-
-                theme = {"id": "0", "name": f"{mod_name} Theme"}
-                if any([dark_accent_h, dark_accent_s, dark_accent_l, dark_base_h, dark_base_s, dark_base_l]):
-                    theme["dark"] = {
-                        "gx_accent": {"h": int(dark_accent_h), "s": int(dark_accent_s), "l": int(dark_accent_l)},
-                        "gx_secondary_base": {"h": int(dark_base_h), "s": int(dark_base_s), "l": int(dark_base_l)}
-                    }
-                if any([light_accent_h, light_accent_s, light_accent_l, light_base_h, light_base_s, light_base_l]):
-                    theme["light"] = {
-                        "gx_accent": {"h": int(light_accent_h), "s": int(light_accent_s), "l": int(light_accent_l)},
-                        "gx_secondary_base": {"h": int(light_base_h), "s": int(light_base_s), "l": int(light_base_l)}
-                    }
-                if theme.get("dark") or theme.get("light"):
-                    manifest["mod"]["payload"][key].append(theme)
-            else:
-                for field, entry in entries.items():
-                    value = entry.text().strip()
-                    if value:
-                        if key not in manifest["mod"]["payload"]:
-                            manifest["mod"]["payload"][key] = []
-                        manifest["mod"]["payload"][key].append({field: value})
-
-        # Ensure mod folder exists and copy files
+    def close_history(self):
+        if self.history is None:
+            return
+        self.autosave.flush()
+        if HISTORY_PERSIST and self.current_mod_path:
+            save_history(self.current_mod_path, self.history)
+        self.history = None
+
+    def record_history(self):
+        if self.history is not None and self.history.record(self.project.snapshot()):
+            self.update_history_buttons()
+
+    def update_history_buttons(self):
+        if self.history is not None and not self.main_menu_visible:
+            self.undo_button.setEnabled(self.history.can_undo())
+            self.redo_button.setEnabled(self.history.can_redo())
+
+    def undo(self):
+        self.step_history(lambda: self.history.undo())
+
+    def redo(self):
+        self.step_history(lambda: self.history.redo())
+
+    def step_history(self, step):
+        if self.history is None or self.main_menu_visible:
+            return
+        # Typing not yet autosaved is recorded first, so it is what gets undone
+        self.autosave.flush()
+        state = step()
+        if state is None:
+            return
+        changed = self.project.restore(state)
+        for field_id in changed:
+            entry = self.field_entry(field_id)
+            if entry is not None:
+                # project.set sees the value it already has, so this is not an edit
+                entry.setText(self.project.get(field_id))
+        if changed and self.current_mod_path:
+            self.save_manifest(set(changed))
+        self.update_history_buttons()
+
+    def field_entry(self, field_id):
+        # The widget showing a field, or None when its payload group was never opened
+        if len(field_id) == 1:
+            return {"name": self.mod_name_entry, "developer": self.dev_name_entry,
+                    "description": self.desc_entry}[field_id[0]]
+        return self.payload_entries.get(field_id[0], {}).get(field_id[1])
+
+    def closeEvent(self, event):
+        self.stop_watching()
+        self.close_history()
+        self.autosave.flush()
+        # Let the final save's image jobs land before the pools go away
+        if self.current_mod_path:
+            self.jobs.wait_group(self.current_mod_path)
+        self.jobs.shutdown()
+        super().closeEvent(event)
+
+    @perf.timed("save_manifest")
+    def save_manifest(self, dirty_fields=None):
+        # dirty_fields limits asset processing to the fields edited since the last
+        # save; None means a full save that reprocesses every referenced asset
+        # Ensure mod folder exists before any assets are copied into it
         if not self.current_mod_path:
-            self.current_mod_path = os.path.join(self.projects_dir, f"{mod_name.replace(' ', '_')}_Mod")
+            self.current_mod_path = new_project_path(self.projects_dir)
+        if not os.path.exists(self.current_mod_path):
             os.makedirs(self.current_mod_path, exist_ok=True)
-        else:
-            # Ensure the folder exists with the current name
-            if not os.path.exists(self.current_mod_path):
-                os.makedirs(self.current_mod_path, exist_ok=True)
+            write_project_file(self.current_mod_path, {"id": project_id(self.current_mod_path)})
+
+        image_outputs = []
+        for key, field, value in self.project.image_references():
+            if dirty_fields is None or (key, field) in dirty_fields:
+                self.handle_image(value, key, field.split('.')[1], field)
+            image_outputs.append(os.path.join(self.current_mod_path, key, os.path.basename(value)))
+
+        # Create subdirectories once per project folder rather than on every save
+        if self.prepared_mod_path != self.current_mod_path:
+            subdirs = ["app_icon", "css", "font", "icons", "mobile_logo", "music", "shaders", "sounds", "splash", "stickers", "wallpaper"]
+            for subdir in subdirs:
+                os.makedirs(os.path.join(self.current_mod_path, subdir), exist_ok=True)
+            self.prepared_mod_path = self.current_mod_path
 
-        # Create subdirectories
-        subdirs = ["app_icon", "css", "font", "icons", "mobile_logo", "music", "shaders", "sounds", "splash", "stickers", "wallpaper"]
-        for subdir in subdirs:
-            os.makedirs(os.path.join(self.current_mod_path, subdir), exist_ok=True)
+        # Save manifest; identical content is not rewritten at all
+        write_manifest(self.current_mod_path, self.project.to_json())
+        self.project.mark_clean()
 
-        # Save manifest
-        with open(os.path.join(self.current_mod_path, "manifest.json"), "w") as f:
-            json.dump(manifest, f, indent=2)
+        cache = self.get_asset_cache()
+        if dirty_fields is None:
+            cache.evict_stale(image_outputs)
+        cache.save()
 
+    @perf.timed("load_manifest")
     def load_manifest(self):
         if self.current_mod_path:
             manifest_path = os.path.join(self.current_mod_path, "manifest.json")
-            if os.path.exists(manifest_path):
-                with open(manifest_path, "r") as f:
-                    manifest = json.load(f)
-
-                self.mod_name_entry.setText(manifest.get("name", ""))
-                self.dev_name_entry.setText(manifest["developer"]["name"])
-                self.desc_entry.setText(manifest.get("description", ""))
+            if os.path.exists(manifest_path) or os.path.isdir(os.path.join(self.current_mod_path, META_DIR)):
+                try:
+                    manifest, recovered_from = recover_manifest(self.current_mod_path)
+                    project = ModProject.from_manifest(manifest)
+                except (OSError, ValueError) as e:
+                    QMessageBox.critical(self, "Error", f"Failed to read manifest: {e}")
+                    return
+                self.project = project
+                kept = self.project.kept_groups()
+                if recovered_from:
+                    self.statusBar().showMessage(
+                        f"manifest.json was damaged and has been restored from {os.path.basename(recovered_from)}", 10000)
+                elif kept:
+                    # Imported mods may use entries the editor's fields cannot show
+                    self.statusBar().showMessage(
+                        f"Kept {', '.join(kept)} as imported; editing them rewrites them in the editor's format", 10000)
 
-                payload = manifest["mod"]["payload"]
+                self.mod_name_entry.setText(self.project.get(("name",)))
+                self.dev_name_entry.setText(self.project.get(("developer",)))
+                self.desc_entry.setText(self.project.get(("description",)))
                 for key, entries in self.payload_entries.items():
-                    data = payload.get(key, [])
-                    if data:
-                        if key in ["app_icon", "wallpaper", "background_music", "splash_screen", "stickers"]:
-                            item = data[0]
-                            for field, entry in entries.items():
-                                value = item.get(field, "")
-                                if isinstance(value, list):
-                                    value = ", ".join(value)
-                                entry.setText(value)
-                        elif key == "shaders":
-                            for i, item in enumerate(data):
-                                if i < len(entries):
-                                    entries[list(entries.keys())[i]].setText(item.get("path", ""))
-                        elif key == "theme":
-                            theme = data[0] if data else {}
-                            dark_accent = theme.get("dark", {}).get("gx_accent", {"h": 211, "s": 100, "l": 54})
-                            dark_base = theme.get("dark", {}).get("gx_secondary_base", {"h": 234, "s": 35, "l": 16})
-                            light_accent = theme.get("light", {}).get("gx_accent", {"h": 224, "s": 100, "l": 66})
-                            light_base = theme.get("light", {}).get("gx_secondary_base", {"h": 210, "s": 47, "l": 88})
-                            entries.get("dark.gx_accent.h", QLineEdit()).setText(str(dark_accent.get("h", 211)))
-                            entries.get("dark.gx_accent.s", QLineEdit()).setText(str(dark_accent.get("s", 100)))
-                            entries.get("dark.gx_accent.l", QLineEdit()).setText(str(dark_accent.get("l", 54)))
-                            entries.get("dark.gx_secondary_base.h", QLineEdit()).setText(str(dark_base.get("h", 234)))
-                            entries.get("dark.gx_secondary_base.s", QLineEdit()).setText(str(dark_base.get("s", 35)))
-                            entries.get("dark.gx_secondary_base.l", QLineEdit()).setText(str(dark_base.get("l", 16)))
-                            entries.get("light.gx_accent.h", QLineEdit()).setText(str(light_accent.get("h", 224)))
-                            entries.get("light.gx_accent.s", QLineEdit()).setText(str(light_accent.get("s", 100)))
-                            entries.get("light.gx_accent.l", QLineEdit()).setText(str(light_accent.get("l", 66)))
-                            entries.get("light.gx_secondary_base.h", QLineEdit()).setText(str(light_base.get("h", 210)))
-                            entries.get("light.gx_secondary_base.s", QLineEdit()).setText(str(light_base.get("s", 47)))
-                            entries.get("light.gx_secondary_base.l", QLineEdit()).setText(str(light_base.get("l", 88)))
-                        else:
-                            for i, (field, entry) in enumerate(entries.items()):
-                                value = data[i].get(field, "") if i < len(data) else ""
-                                if isinstance(value, list):
-                                    value = ", ".join(value)
-                                entry.setText(value)
-
-    def handle_image(self, path, category, sub_category):
+                    for field, entry in entries.items():
+                        entry.setText(self.project.get((key, field)))
+
+    def get_asset_store(self):
+        # One store per projects folder, shared by every project in it
+        if not ASSET_STORE_ENABLED:
+            return None
+        if self.asset_store is None or self.asset_store.projects_dir != self.projects_dir:
+            self.asset_store = AssetStore(self.projects_dir)
+        return self.asset_store
+
+    def get_asset_cache(self):
+        if self.asset_cache is None or self.asset_cache.project_path != self.current_mod_path:
+            self.asset_cache = AssetCache(self.current_mod_path, self.get_asset_store())
+        return self.asset_cache
+
+    def clean_up_assets(self):
+        store = self.get_asset_store()
+        if store is None:
+            QMessageBox.information(self, "Disk Usage", "The shared asset store is turned off (XGGX_ASSET_STORE=0).")
+            return
+
+        def collect(job):
+            removed, freed = store.gc()
+            return removed, freed, store.usage()
+
+        def done(result):
+            removed, freed, usage = result
+            lines = list(usage.lines())[-2:]
+            QMessageBox.information(self, "Disk Usage", f"Removed {removed} unused assets ({freed:,} bytes).\n\n"
+                                    + "\n".join(lines))
+
+        self.submit_job("store", "Cleaning up assets", collect, on_done=done, group=self.projects_dir)
+
+    def handle_image(self, path, category, sub_category, field=None):
         if not os.path.exists(path):
             return
         dest_dir = os.path.join(self.current_mod_path, category)
         os.makedirs(dest_dir, exist_ok=True)
         filename = os.path.basename(path)
         dest_path = os.path.join(dest_dir, filename)
-        try:
-            with Image.open(path) as img:
-                if category == "app_icon":
-                    img.resize((256, 256), Image.Resampling.LANCZOS).save(dest_path, "PNG")
-                elif category in ["wallpaper", "splash_screen"]:
-                    if sub_category == "image" or sub_category == "path":
-                        if img.size[0] < 1920 or img.size[1] < 1080:
-                            img.resize((1920, 1080), Image.Resampling.LANCZOS).save(dest_path, "JPEG" if path.endswith('.jpg') else "PNG")
-                        else:
-                            shutil.copy(path, dest_path)
+        cache = self.get_asset_cache()
+
+        def process(job):
+            # Copies run on the worker thread, Pillow resizing in a worker process
+            def render(src, dest, plan):
+                if plan is None:
+                    render_image(src, dest, plan)
                 else:
-                    shutil.copy(path, dest_path)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to process image {filename}: {e}")
+                    self.jobs.run_in_process(job, render_image, src, dest, plan)
+            with perf.span("handle_image", file=filename) as span:
+                # Unchanged sources with unchanged settings reuse the existing output
+                if cache.process_image(path, dest_path, category, sub_category, render):
+                    span.read(os.path.getsize(path))
+                    span.wrote(os.path.getsize(dest_path))
+                cache.save()
+
+        # A newer edit of the same field supersedes a job that has not finished yet
+        self.submit_job((category, field or sub_category), f"Processing image {filename}", process)
 
-    def create_zip(self):
+    def set_watching(self, on):
+        self.stop_watching()
+        if not on or not self.current_mod_path:
+            return
+        from xggx.watch import DEBOUNCE, POLL_INTERVAL, ProjectWatcher
+        self.autosave.flush()
+        if not os.path.isdir(self.current_mod_path):
+            self.save_manifest()
+        mod_path = self.current_mod_path
+        watcher = ProjectWatcher(mod_path, cache=self.get_asset_cache())
+        self.project_watcher = watcher
+        self.watch_fs = QFileSystemWatcher(self)
+        self.watch_fs.directoryChanged.connect(lambda path: self.watch_timer.start())
+        self.watch_fs.fileChanged.connect(lambda path: self.watch_timer.start())
+        self.watch_timer.setInterval(int(DEBOUNCE * 1000))
+        self.watch_poll_timer.setInterval(int(POLL_INTERVAL * 1000))
+
+        # Image jobs still in flight are not waited for: their outputs land in
+        # the project and are picked up as changes like any other file
+        def build(job):
+            return watcher.build(), watcher.watched_dirs() + watcher.watched_files()
+        self.watch_job = self.submit_job("watch", "Building ZIP", build, group=mod_path,
+                                         on_done=lambda result: self.watched_zip_updated(watcher, *result),
+                                         on_error=lambda error: self.watch_failed(watcher, error))
+
+    def stop_watching(self):
+        self.watch_timer.stop()
+        self.watch_poll_timer.stop()
+        if self.watch_fs is not None:
+            self.watch_fs.deleteLater()
+            self.watch_fs = None
+        self.project_watcher = None
+        self.watch_job = None
+        self.watch_again = False
+
+    def update_watched_zip(self):
+        watcher = self.project_watcher
+        if watcher is None:
+            return
+        if self.watch_job is not None and not self.watch_job.future.done():
+            # Our own writes wake the watcher too; one more update once this
+            # one is done covers anything it missed
+            self.watch_again = True
+            return
+        # Autosaved edits count as changes too
+        self.autosave.flush()
+
+        def update(job):
+            report = watcher.update()
+            return report, (watcher.watched_dirs() + watcher.watched_files() if report else None)
+        self.watch_job = self.submit_job("watch", "Updating ZIP", update, group=self.current_mod_path,
+                                         on_done=lambda result: self.watched_zip_updated(watcher, *result),
+                                         on_error=lambda error: self.watch_failed(watcher, error))
+
+    def watch_job_finished(self):
+        if self.watch_again:
+            self.watch_again = False
+            self.watch_timer.start()
+
+    def watched_zip_updated(self, watcher, report, paths):
+        if watcher is not self.project_watcher:
+            return
+        self.watch_job_finished()
+        if paths is not None:
+            # Files saved by renaming a new one over them drop out of the
+            # watch, and new files have to be added
+            current = set(self.watch_fs.files() + self.watch_fs.directories())
+            stale = list(current - set(paths))
+            if stale:
+                self.watch_fs.removePaths(stale)
+            missing = [path for path in paths if path not in current]
+            if missing and self.watch_fs.addPaths(missing) and not self.watch_poll_timer.isActive():
+                self.watch_poll_timer.start()
+        if report is not None:
+            # Settle the job status first, or its next tick clears the message
+            self.update_job_status()
+            self.statusBar().showMessage(report.summary(), 5000)
+
+    def watch_failed(self, watcher, error):
+        # A half-written file is retried on its next save; the dialog would
+        # only get in the way of editing
+        if watcher is self.project_watcher:
+            self.watch_job_finished()
+            self.update_job_status()
+            self.statusBar().showMessage(f"Updating the ZIP failed: {error}", 10000)
+
+    def create_zip(self, check=True):
+        self.autosave.flush()
         if self.current_mod_path:
-            zip_name = os.path.join(self.current_mod_path, f"{os.path.basename(self.current_mod_path)}.zip")
-            with zipfile.ZipFile(zip_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, _, files in os.walk(self.current_mod_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, self.current_mod_path)
-                        zipf.write(file_path, arcname)
-            QMessageBox.information(self, "Success", f"Mod zipped to:\n{zip_name}")
+            # A new mod's folder is only created by its first save
+            if not os.path.isdir(self.current_mod_path):
+                self.save_manifest()
+            mod_path = self.current_mod_path
+            zip_name = os.path.join(mod_path, zip_file_name(self.project.mod_name))
+
+            manifest = self.project.to_manifest()
+            optimize = self.optimize_checkbox.isChecked()
+
+            def package(job):
+                from xggx.build import package_project
+                from xggx.preflight import preflight
+                # The archive must contain the output of image jobs still in flight
+                self.jobs.wait_group(mod_path, exclude=job)
+                stats, warnings = None, []
+                if check:
+                    report = preflight(mod_path, manifest)
+                    if report.errors:
+                        return None, report
+                    stats, warnings = report.stats(), report.warnings
+                with perf.span("create_zip", optimize=optimize) as span:
+                    result = package_project(mod_path, zip_name, manifest, optimize, job=job, stats=stats)
+                    span.wrote(result[0].bytes_written)
+                return result, warnings
+
+            def done(result):
+                result, problems = result
+                if result is None:
+                    self.confirm_zip(problems)
+                    return
+                report, optimize_report = result
+                message = f"Mod zipped to:\n{report.zip_path}"
+                if optimize_report is not None:
+                    message += "\n\n" + list(optimize_report.lines())[-1].replace("total", "Media")
+                if problems:
+                    message += "\n\n" + "\n".join(str(problem) for problem in problems[:PROBLEMS_SHOWN])
+                QMessageBox.information(self, "Success", message)
+
+            self.submit_job("zip", "Zipping", package, on_done=done)
+
+    def confirm_zip(self, report):
+        problems = report.errors + report.warnings
+        lines = [str(problem) for problem in problems[:PROBLEMS_SHOWN]]
+        if len(report.problems) > PROBLEMS_SHOWN:
+            lines.append(f"... and {len(report.problems) - PROBLEMS_SHOWN} more")
+        answer = QMessageBox.warning(
+            self, "Problems found",
+            "\n".join(lines) + "\n\nCreate the ZIP anyway?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No)
+        if answer == QMessageBox.StandardButton.Yes:
+            self.create_zip(check=False)
 
 if __name__ == "__main__":
+    if "--perf" in sys.argv:
+        perf.enable()
     app = QApplication(sys.argv)
     window = OperaGXModMaker()
+    if "--profile-startup" in sys.argv:
+        profile = StartupProfile(window)
+        profile.mark("window")
     window.show()
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,4 @@
+# Core, GUI-independent building blocks for the Opera GX Mod Maker.
+# Nothing in this package may import PyQt6.
+
+META_DIR = ".xggx"
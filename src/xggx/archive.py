@@ -0,0 +1,207 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from xggx import META_DIR, perf
+from xggx.projects import new_project_path, project_id, write_project_file
+from xggx.storage import match_mode, write_manifest
+
+# Imported mods keep their assets inside the original archive until something
+# needs them. Opening a zip only reads its central directory and manifest.
+# zipfile is imported by the functions that open one, so startup and projects
+# without an archive never load it.
+ARCHIVE_EXTENSIONS = {".zip", ".crx"}
+STATE_NAME = "archive.json"
+SOURCE_NAME = "source.zip"
+COPY_CHUNK = 1024 * 1024
+
+_lock = threading.Lock()
+
+
+def is_archive_path(path):
+    return os.path.splitext(path)[1].lower() in ARCHIVE_EXTENSIONS
+
+
+def manifest_member(zipf):
+    # The shallowest manifest.json, so mods zipped with their folder work too.
+    # Returns (member name, root prefix) or (None, None).
+    names = [name for name in zipf.namelist() if name == "manifest.json" or name.endswith("/manifest.json")]
+    if not names:
+        return None, None
+    name = min(names, key=lambda n: n.count("/"))
+    return name, name[:-len("manifest.json")]
+
+
+def read_archive_manifest(archive_path):
+    # zipfile finds the central directory from the end of the file, so crx
+    # packages with their signed header in front open the same way
+    import zipfile
+    with zipfile.ZipFile(archive_path, "r") as zipf:
+        name, _ = manifest_member(zipf)
+        if name is None:
+            raise ValueError(f"{os.path.basename(archive_path)} has no manifest.json")
+        return json.loads(zipf.read(name).decode("utf-8-sig"))
+
+
+def safe_target(project_path, rel_path):
+    # Refuses absolute paths and .. entries so an archive cannot write outside
+    # its project
+    parts = rel_path.replace("\\", "/").split("/")
+    if rel_path.startswith("/") or ".." in parts or ":" in parts[0]:
+        return None
+    return os.path.join(project_path, *parts)
+
+
+def state_path(project_path):
+    return os.path.join(project_path, META_DIR, STATE_NAME)
+
+
+def source_path(project_path, state):
+    # An archive moved into the project is stored relative to it, so the
+    # projects folder can itself be moved
+    if state.get("owned"):
+        return os.path.join(project_path, META_DIR, SOURCE_NAME)
+    return state["source"]
+
+
+def load_state(project_path):
+    try:
+        with open(state_path(project_path), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_state(project_path, state):
+    path = state_path(project_path)
+    if not state["members"]:
+        # Fully extracted; a source archive we moved in is no longer needed
+        if state.get("owned"):
+            try:
+                os.remove(source_path(project_path, state))
+            except OSError:
+                pass
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def extract_member(zipf, member, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as dst, zipf.open(member) as src:
+            shutil.copyfileobj(src, dst, COPY_CHUNK)
+        match_mode(tmp_path, target)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def ensure_extracted(project_path, rel_paths=None):
+    # Extracts pending members of an imported mod: all of them, or only those
+    # of rel_paths that are still in the archive. Files already on disk are
+    # never overwritten, so edits made before extraction survive. Returns the
+    # number of files extracted; a project without an archive costs one stat.
+    if not os.path.exists(state_path(project_path)):
+        return 0
+    import zipfile
+    with _lock:
+        state = load_state(project_path)
+        if state is None:
+            return 0
+        members = state["members"]
+        wanted = list(members) if rel_paths is None else [p for p in rel_paths if p in members]
+        if not wanted:
+            return 0
+        source = source_path(project_path, state)
+        if not os.path.isfile(source):
+            # Imported without move=True and the original zip has since been
+            # moved or deleted; the pending files cannot be recovered
+            raise FileNotFoundError(f"The original archive {source} is missing; move it back or import the mod again")
+        count = 0
+        with perf.span("archive.extract") as span, zipfile.ZipFile(source, "r") as zipf:
+            for rel_path in wanted:
+                member = members.pop(rel_path)
+                target = safe_target(project_path, rel_path)
+                if target is None or os.path.exists(target):
+                    continue
+                extract_member(zipf, member, target)
+                span.wrote(zipf.getinfo(member).file_size)
+                count += 1
+        save_state(project_path, state)
+        return count
+
+
+def is_pending(project_path, rel_path):
+    state = load_state(project_path) if os.path.exists(state_path(project_path)) else None
+    return state is not None and rel_path in state["members"]
+
+
+def preview_candidates(manifest):
+    # Relative paths the project index looks at for a mod's thumbnail
+    mod = manifest.get("mod")
+    payload = mod.get("payload") if isinstance(mod, dict) else None
+    if not isinstance(payload, dict):
+        return []
+    values = []
+    for key, fields in (("wallpaper", ["dark.image", "light.image"]), ("app_icon", ["path"])):
+        items = payload.get(key)
+        for item in items if isinstance(items, list) else []:
+            if isinstance(item, dict):
+                values += [item.get(field) for field in fields]
+    candidates = []
+    for value in values:
+        if not value or not isinstance(value, str):
+            continue
+        base = os.path.basename(value)
+        candidates += [value.lstrip("/"), f"wallpaper/{base}", f"app_icon/{base}"]
+    return candidates
+
+
+def import_archive(archive_path, projects_dir, move=False):
+    # Creates a project for a mod zip or crx and returns its path. Only
+    # manifest.json and one preview image are extracted; everything else is
+    # pulled out by ensure_extracted when viewed or built. With move=True the
+    # archive is moved into the project (it must be on the same filesystem),
+    # otherwise it is read from where it is and must stay there until the
+    # project is fully extracted.
+    import zipfile
+    archive_path = os.path.abspath(archive_path)
+    with zipfile.ZipFile(archive_path, "r") as zipf:
+        manifest_name, root = manifest_member(zipf)
+        if manifest_name is None:
+            raise ValueError(f"{os.path.basename(archive_path)} has no manifest.json")
+        manifest_data = zipf.read(manifest_name).decode("utf-8-sig")
+        manifest = json.loads(manifest_data)
+        if not isinstance(manifest, dict):
+            raise ValueError(f"{os.path.basename(archive_path)} has an invalid manifest.json")
+        members = {}
+        for info in zipf.infolist():
+            if info.is_dir() or not info.filename.startswith(root) or info.filename == manifest_name:
+                continue
+            rel_path = info.filename[len(root):]
+            if not rel_path.startswith(META_DIR + "/") and safe_target(projects_dir, rel_path) is not None:
+                members[rel_path] = info.filename
+
+    project_path = new_project_path(projects_dir)
+    os.makedirs(os.path.join(project_path, META_DIR))
+    write_project_file(project_path, {"id": project_id(project_path), "imported_from": archive_path})
+    if move:
+        os.rename(archive_path, os.path.join(project_path, META_DIR, SOURCE_NAME))
+    with open(state_path(project_path), "w") as f:
+        json.dump({"source": None if move else archive_path, "owned": move, "members": members}, f)
+    write_manifest(project_path, manifest_data)
+    for rel_path in preview_candidates(manifest):
+        if ensure_extracted(project_path, [rel_path]):
+            break
+    return project_path
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from xggx import META_DIR, perf
+from xggx.sniff import sniff_file
+from xggx.storage import match_mode
+
+INDEX_NAME = "assets.json"
+RESAMPLE = "LANCZOS"
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_dimensions(path):
+    # Common formats are read straight from the header, without loading Pillow
+    _, dimensions = sniff_file(path)
+    if dimensions:
+        return dimensions
+    from PIL import Image
+    # Image.open only parses the header; no pixel data is decoded here
+    with Image.open(path) as img:
+        return img.size
+
+
+def image_plan(path, category, sub_category, dimensions=None):
+    # Returns (target size, output format) or None when the file is copied as-is.
+    # Mirrors the rules the editor has always applied in handle_image.
+    if category == "app_icon":
+        return (256, 256), "PNG"
+    if category in ["wallpaper", "splash_screen"] and sub_category in ["image", "path"]:
+        width, height = dimensions or image_dimensions(path)
+        if width < 1920 or height < 1080:
+            return (1920, 1080), "JPEG" if path.endswith('.jpg') else "PNG"
+    return None
+
+
+def encode_image(path, plan, dest):
+    # dest is a path or a writable file object, e.g. an open zip entry
+    from PIL import Image
+    size, fmt = plan
+    with Image.open(path) as img:
+        img.resize(size, getattr(Image.Resampling, RESAMPLE)).save(dest, fmt)
+
+
+def render_image(path, dest_path, plan):
+    # Module-level so it can be shipped to a worker process
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path), suffix=".tmp")
+    os.close(fd)
+    try:
+        # Copies and Pillow work are separate spans so either can be blamed
+        with perf.span("image.copy" if plan is None else "image.resize") as span:
+            if plan is None:
+                shutil.copy(path, tmp_path)
+            else:
+                encode_image(path, plan, tmp_path)
+            span.read(os.path.getsize(path))
+            span.wrote(os.path.getsize(tmp_path))
+        match_mode(tmp_path, dest_path)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class AssetCache:
+    def __init__(self, project_path, store=None):
+        # store is an optional xggx.store.AssetStore shared across projects
+        self.project_path = project_path
+        self.asset_store = store
+        self.index_path = os.path.join(project_path, META_DIR, INDEX_NAME)
+        self.sources = {}
+        self.outputs = {}
+        self.dirty = False
+        self.lock = threading.RLock()
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+            self.sources = data.get("sources", {})
+            self.outputs = data.get("outputs", {})
+        except (OSError, ValueError):
+            pass
+
+    def source_info(self, path):
+        # size+mtime is trusted to avoid rehashing a source that has not been touched.
+        # The lock only guards the dict: hashing runs without it, so saves on
+        # the GUI thread never wait for a large source being read.
+        st = os.stat(path)
+        with self.lock:
+            known = self.sources.get(path)
+            if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+                return known
+        info = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": file_digest(path)}
+        with self.lock:
+            self.sources[path] = info
+            self.dirty = True
+        return info
+
+    def plan(self, path, category, sub_category):
+        info = self.source_info(path)
+        if category in ["wallpaper", "splash_screen"] and "dimensions" not in info:
+            dimensions = list(image_dimensions(path))
+            with self.lock:
+                info["dimensions"] = dimensions
+                self.dirty = True
+        return image_plan(path, category, sub_category, info.get("dimensions"))
+
+    def cache_key(self, path, plan):
+        sha1 = self.source_info(path)["sha1"]
+        if plan is None:
+            return f"{sha1}:copy"
+        (width, height), fmt = plan
+        return f"{sha1}:{width}x{height}:{RESAMPLE}:{fmt}"
+
+    def lookup(self, key, dest_path):
+        rel_path = os.path.relpath(dest_path, self.project_path)
+        entry = self.outputs.get(rel_path)
+        if not entry or entry["key"] != key:
+            return False
+        try:
+            st = os.stat(dest_path)
+        except OSError:
+            return False
+        return st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]
+
+    def store(self, key, dest_path, source=None):
+        st = os.stat(dest_path)
+        rel_path = os.path.relpath(dest_path, self.project_path)
+        self.outputs[rel_path] = {"key": key, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "source": source}
+        self.dirty = True
+
+    def source_for(self, dest_path):
+        # The original an output was processed from, if it still exists. The
+        # editor's manifest only names the copy, so this is the one record of
+        # where it came from.
+        rel_path = os.path.relpath(dest_path, self.project_path)
+        with self.lock:
+            entry = self.outputs.get(rel_path)
+            if not entry:
+                return None
+            source = entry.get("source")
+            if source is None:
+                # Indexes written before sources were recorded: the source
+                # whose hash the output's key was made from
+                sha1 = entry["key"].split(":", 1)[0]
+                source = next((path for path, info in self.sources.items()
+                               if info.get("sha1") == sha1
+                               and os.path.basename(path) == os.path.basename(dest_path)), None)
+        return source if source and os.path.isfile(source) else None
+
+    def process_image(self, path, dest_path, category, sub_category, render=render_image):
+        # Returns True when the output had to be regenerated. render can be
+        # swapped for one that runs render_image somewhere else.
+        plan = self.plan(path, category, sub_category)
+        key = self.cache_key(path, plan)
+        with self.lock:
+            if self.lookup(key, dest_path):
+                return False
+        sha1 = self.source_info(path)["sha1"]
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        if self.asset_store is not None and plan is None:
+            # Plain copies reference the shared blob instead of duplicating it
+            self.asset_store.materialize(self.asset_store.add(path, sha1), dest_path)
+        else:
+            render(path, dest_path, plan)
+            if self.asset_store is not None:
+                self.asset_store.adopt(dest_path)
+        with self.lock:
+            self.store(key, dest_path, os.path.abspath(path))
+        return True
+
+    def evict_stale(self, referenced_paths):
+        # Drops outputs the manifest no longer references, deleting the files
+        with self.lock:
+            return self._evict_stale(referenced_paths)
+
+    def _evict_stale(self, referenced_paths):
+        keep = {os.path.relpath(p, self.project_path) for p in referenced_paths}
+        removed = []
+        for rel_path in list(self.outputs):
+            if rel_path in keep:
+                continue
+            del self.outputs[rel_path]
+            try:
+                os.remove(os.path.join(self.project_path, rel_path))
+            except OSError:
+                pass
+            removed.append(rel_path)
+        if removed:
+            self.dirty = True
+        for path in list(self.sources):
+            if not os.path.exists(path):
+                del self.sources[path]
+                self.dirty = True
+        return removed
+
+    def save(self):
+        if self.asset_store is not None:
+            self.asset_store.save()
+        with self.lock:
+            if not self.dirty:
+                return
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"sources": self.sources, "outputs": self.outputs}, f, indent=2)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
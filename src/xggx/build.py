@@ -0,0 +1,203 @@
+import copy
+import functools
+import json
+import os
+import time
+
+from xggx.assets import AssetCache, encode_image, image_plan
+from xggx.optimize import optimize_files, rewrite_references
+from xggx.packager import STATE_NAME, build_zip, collect_files, stream_zip
+from xggx.preflight import PreflightError, preflight
+from xggx.projects import zip_file_name
+from xggx.styles import minify_styles
+from xggx.store import AssetStore
+from xggx.storage import read_manifest
+
+# Manifest fields that reference images the editor resizes through handle_image
+IMAGE_FIELDS = {
+    "wallpaper": ["dark.image", "light.image"],
+}
+
+
+def load_project_manifest(project_path):
+    manifest, _ = read_manifest(project_path)
+    return manifest
+
+
+def resolve_source(project_path, value):
+    # Relative references are resolved against the project so manifests kept
+    # in CI checkouts can point at assets next to them
+    path = value if os.path.isabs(value) else os.path.join(project_path, value)
+    return path if os.path.isfile(path) else None
+
+
+def image_references(project_path, manifest, cache=None):
+    # (item, field, category, source, dest path) for every referenced image
+    # that is processed into the project rather than packaged where it is.
+    # With cache, an AssetCache, images the manifest names by their processed
+    # copy (as the editor writes them) refer to the original they came from.
+    payload = manifest.get("mod", {}).get("payload", {})
+    for category, fields in IMAGE_FIELDS.items():
+        for item in payload.get(category, []):
+            for field in fields:
+                value = item.get(field)
+                if not value:
+                    continue
+                dest_path = os.path.join(project_path, category, os.path.basename(value))
+                source = resolve_source(project_path, value)
+                if source is None or os.path.abspath(source) == os.path.abspath(dest_path):
+                    source = cache.source_for(dest_path) if cache is not None else None
+                    if source is None:
+                        continue
+                yield item, field, category, source, dest_path
+
+
+def process_references(project_path, manifest, cache, sources=None, originals=False):
+    # process_assets for the images whose source is in sources (all of them
+    # when None). With originals, copies are also processed again from the
+    # originals the cache recorded for them. Returns (manifest rewritten,
+    # dest paths regenerated).
+    changed = False
+    regenerated = []
+    for item, field, category, source, dest_path in image_references(project_path, manifest,
+                                                                     cache if originals else None):
+        if (sources is None or source in sources) and cache.process_image(source, dest_path, category,
+                                                                          field.split('.')[1]):
+            regenerated.append(dest_path)
+        if item[field] != os.path.basename(item[field]):
+            item[field] = os.path.basename(item[field])
+            changed = True
+    return changed, regenerated
+
+
+def process_assets(project_path, manifest, cache=None):
+    # Headless counterpart of save_manifest's handle_image calls. Returns True
+    # when the manifest had to be rewritten to point at the processed copies.
+    cache = cache or AssetCache(project_path, AssetStore.for_project(project_path))
+    changed, _ = process_references(project_path, manifest, cache)
+    cache.save()
+    return changed
+
+
+def stream_entries(project_path, manifest):
+    # Streaming counterpart of process_assets: referenced images are resized
+    # from their original location directly into the archive instead of being
+    # written into the project and read back. Returns (arcname, source) pairs
+    # for stream_zip; the manifest passed in is not modified.
+    manifest = copy.deepcopy(manifest)
+    payload = manifest.get("mod", {}).get("payload", {})
+    transformed = {}
+    changed = False
+    for category, fields in IMAGE_FIELDS.items():
+        for item in payload.get(category, []):
+            for field in fields:
+                value = item.get(field)
+                if not value:
+                    continue
+                arcname = f"{category}/{os.path.basename(value)}"
+                source = resolve_source(project_path, value)
+                if source is None or os.path.abspath(source) == os.path.abspath(os.path.join(project_path, arcname)):
+                    continue
+                plan = image_plan(source, category, field.split('.')[1])
+                transformed[arcname] = source if plan is None else functools.partial(encode_image, source, plan)
+                if item[field] != os.path.basename(value):
+                    item[field] = os.path.basename(value)
+                    changed = True
+    if changed:
+        transformed["manifest.json"] = json.dumps(manifest, indent=2).encode("utf-8")
+    entries = [(arcname, path) for arcname, path in collect_files(project_path) if arcname not in transformed]
+    return entries + list(transformed.items())
+
+
+def stream_project(project_path, fileobj, job=None):
+    manifest = load_project_manifest(project_path)
+    return stream_zip(fileobj, stream_entries(project_path, manifest), job)
+
+
+def default_zip_path(project_path, manifest, output_dir=None):
+    return os.path.join(output_dir or os.path.abspath(project_path), zip_file_name(manifest.get("name", "")))
+
+
+def package_project(project_path, zip_path, manifest, optimize=False, workers=None, job=None, manifest_changed=False,
+                    stats=None, bundle_styles=False, state_name=STATE_NAME):
+    # Shared by the editor and the headless build. Returns the packager's
+    # BuildReport and, when optimizing, the OptimizeReport. stats comes from
+    # PreflightReport.stats().
+    files = collect_files(project_path)
+    optimize_report = None
+    if optimize:
+        files, renames, optimize_report = optimize_files(project_path, files, workers)
+        if renames:
+            manifest = rewrite_references(manifest, renames)
+            manifest_changed = True
+        files, manifest, styles_changed = minify_styles(project_path, files, manifest, optimize_report, bundle_styles)
+        manifest_changed = manifest_changed or styles_changed
+    data = None
+    if manifest_changed:
+        data = {"manifest.json": json.dumps(manifest, indent=2).encode("utf-8")}
+    return (build_zip(project_path, zip_path, job, files=files, data=data, state_name=state_name, stats=stats),
+            optimize_report)
+
+
+def check_project(project_path, manifest, timings):
+    # Returns (warning lines, stats for the packager)
+    mark = time.perf_counter()
+    report = preflight(project_path, manifest)
+    timings["check"] = time.perf_counter() - mark
+    if report.errors:
+        raise PreflightError("\n".join(report.lines()))
+    return [str(problem) for problem in report.warnings], report.stats()
+
+
+def build_project(project_path, output_dir=None, optimize=False, optimize_workers=None, stream=False, check=False,
+                  bundle_styles=False):
+    # Runs in a worker process when building in parallel, so it only returns
+    # plain picklable data. With check, the manifest is preflighted once its
+    # images are processed and errors raise PreflightError.
+    timings = {}
+    start = time.perf_counter()
+    manifest = load_project_manifest(project_path)
+    timings["manifest"] = time.perf_counter() - start
+    zip_path = default_zip_path(project_path, manifest, output_dir)
+    optimize_report = None
+    problems = []
+
+    mark = time.perf_counter()
+    if stream:
+        # Assets are transformed while zipping, so there is no separate stage
+        timings["assets"] = 0.0
+        if check:
+            problems, _ = check_project(project_path, manifest, timings)
+            mark = time.perf_counter()
+        tmp_path = zip_path + ".part"
+        try:
+            with open(tmp_path, "wb") as f:
+                report = stream_zip(f, stream_entries(project_path, manifest))
+            os.replace(tmp_path, zip_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        report.zip_path = zip_path
+    else:
+        manifest_changed = process_assets(project_path, manifest)
+        timings["assets"] = time.perf_counter() - mark
+        stats = None
+        if check:
+            problems, stats = check_project(project_path, manifest, timings)
+        mark = time.perf_counter()
+        report, optimize_report = package_project(project_path, zip_path, manifest, optimize, optimize_workers,
+                                                  manifest_changed=manifest_changed, stats=stats,
+                                                  bundle_styles=bundle_styles)
+    timings["zip"] = time.perf_counter() - mark
+    timings["total"] = time.perf_counter() - start
+    return {
+        "project": project_path,
+        "name": manifest.get("name", ""),
+        "zip_path": zip_path,
+        "timings": timings,
+        "reused": report.reused,
+        "compressed": report.compressed,
+        "bytes_written": report.bytes_written,
+        "optimize": list(optimize_report.lines()) if optimize_report else None,
+        "problems": problems,
+    }
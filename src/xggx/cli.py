@@ -0,0 +1,329 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from xggx import perf
+from xggx.build import build_project, load_project_manifest, stream_project
+from xggx.preflight import preflight
+from xggx.release import BUMP_PARTS, DELTA_HISTORY, release_project
+from xggx.store import AssetStore
+from xggx.variants import check_axes, generate_variants, parse_axis
+from xggx.watch import DEBOUNCE, POLL_INTERVAL, ProjectWatcher
+
+
+def format_result(result):
+    timings = result["timings"]
+    return (f"built {result['name'] or os.path.basename(os.path.abspath(result['project']))} in {timings['total']:.2f}s "
+            f"(assets {timings['assets']:.2f}s, zip {timings['zip']:.2f}s, "
+            f"{result['reused']} reused / {result['compressed']} compressed) -> {result['zip_path']}")
+
+
+def find_projects(paths):
+    # Accepts project folders directly, or a folder of projects such as projects/
+    projects = []
+    for path in paths:
+        if os.path.isfile(os.path.join(path, "manifest.json")):
+            projects.append(path)
+            continue
+        with os.scandir(path) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if entry.is_dir() and os.path.isfile(os.path.join(entry.path, "manifest.json")):
+                    projects.append(entry.path)
+    return projects
+
+
+def build_in_worker(*args):
+    # Spans recorded in a worker process are handed back with the result
+    perf.reset()
+    result = build_project(*args)
+    result["spans"] = perf.events() if perf.enabled else []
+    return result
+
+
+def iter_builds(projects, jobs, output_dir, optimize=False, stream=False, check=False, bundle_styles=False):
+    # Yields (project, result, error) as each build finishes
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    if jobs == 1 or len(projects) == 1:
+        for project in projects:
+            try:
+                yield project, build_project(project, output_dir, optimize, jobs, stream, check, bundle_styles), None
+            except Exception as e:
+                yield project, None, e
+        return
+    # Mods are already spread over the pool, so each optimizes its assets serially
+    with ProcessPoolExecutor(max_workers=min(jobs, len(projects))) as pool:
+        futures = {pool.submit(build_in_worker, project, output_dir, optimize, 1, stream, check,
+                               bundle_styles): project
+                   for project in projects}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+                perf.absorb(result.pop("spans"))
+                yield futures[future], result, None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def run_build(args):
+    try:
+        projects = find_projects(args.projects)
+    except OSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if not projects:
+        print("error: no projects with a manifest.json found", file=sys.stderr)
+        return 2
+    if args.stream and args.optimize:
+        print("error: --stream and --optimize cannot be combined", file=sys.stderr)
+        return 2
+    if args.bundle_styles and not args.optimize:
+        print("error: --bundle-styles requires --optimize", file=sys.stderr)
+        return 2
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    failures = 0
+    for project, result, error in iter_builds(projects, args.jobs, args.output_dir, args.optimize, args.stream,
+                                              args.check, args.bundle_styles):
+        if error is not None:
+            failures += 1
+            print(f"failed {project}: {error}", file=sys.stderr)
+        else:
+            print(format_result(result), flush=True)
+            for line in (result["optimize"] or []) + result["problems"]:
+                print(f"    {line}")
+    print(f"{len(projects) - failures}/{len(projects)} mods built in {time.perf_counter() - start:.2f}s")
+    return 1 if failures else 0
+
+
+def run_check(args):
+    try:
+        projects = find_projects(args.projects)
+    except OSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if not projects:
+        print("error: no projects with a manifest.json found", file=sys.stderr)
+        return 2
+    failed = 0
+    for project in projects:
+        try:
+            report = preflight(project, load_project_manifest(project))
+        except (OSError, ValueError) as e:
+            print(f"failed {project}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        failed += bool(report.errors)
+        print(project)
+        for line in report.lines():
+            print(f"    {line}")
+    return 1 if failed else 0
+
+
+def run_pack(args):
+    if not os.path.isfile(os.path.join(args.project, "manifest.json")):
+        print(f"error: no manifest.json in {args.project}", file=sys.stderr)
+        return 2
+    start = time.perf_counter()
+    try:
+        if args.output == "-":
+            if sys.stdout.isatty():
+                print("error: refusing to write a zip to a terminal, redirect stdout or use -o", file=sys.stderr)
+                return 2
+            report = stream_project(args.project, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+        else:
+            with open(args.output, "wb") as f:
+                report = stream_project(args.project, f)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    # stdout may be the archive itself, so the summary goes to stderr
+    print(f"packed {report.compressed} files, {report.bytes_written:,} bytes in "
+          f"{time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0
+
+
+def run_store(args):
+    if not os.path.isdir(args.projects_dir):
+        print(f"error: {args.projects_dir} is not a folder", file=sys.stderr)
+        return 2
+    store = AssetStore(args.projects_dir)
+    if args.action == "dedupe":
+        for project in find_projects([args.projects_dir]):
+            count = store.dedupe(project)
+            print(f"{os.path.basename(project)}: {count} files now shared")
+    elif args.action == "gc":
+        removed, freed = store.gc()
+        print(f"removed {removed} unreferenced blobs, {freed:,} bytes freed")
+    for line in store.usage().lines():
+        print(line)
+    return 0
+
+
+def run_variants(args):
+    if not os.path.isfile(os.path.join(args.project, "manifest.json")):
+        print(f"error: no manifest.json in {args.project}", file=sys.stderr)
+        return 2
+    try:
+        axes = [parse_axis(spec) for spec in args.axis]
+        check_axes(axes)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    start = time.perf_counter()
+    count = 0
+    for name, zip_path, size in generate_variants(args.project, axes, args.output_dir, args.jobs):
+        count += 1
+        print(f"built {name} ({size:,} bytes) -> {zip_path}", flush=True)
+    print(f"{count} variants built in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def run_release(args):
+    if not os.path.isfile(os.path.join(args.project, "manifest.json")):
+        print(f"error: no manifest.json in {args.project}", file=sys.stderr)
+        return 2
+    releases_dir = args.output_dir or os.path.join("releases", os.path.basename(os.path.abspath(args.project)))
+    start = time.perf_counter()
+    try:
+        report = release_project(args.project, releases_dir, args.bump, args.optimize, args.update_url, args.deltas)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    if report is None:
+        print("nothing changed since the last release")
+        return 0
+    for line in report.lines():
+        print(line)
+    print(f"done in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def run_serve(args):
+    from xggx.updateserver import UPDATES_PATH, make_server
+    try:
+        server = make_server(args.releases_dir, args.host, args.port)
+    except OSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    host, port = server.server_address[:2]
+    print(f"serving {args.releases_dir} at http://{host}:{port}{UPDATES_PATH}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def run_watch(args):
+    if not os.path.isfile(os.path.join(args.project, "manifest.json")):
+        print(f"error: no manifest.json in {args.project}", file=sys.stderr)
+        return 2
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    print(f"watching {args.project}, Ctrl+C to stop", file=sys.stderr)
+    try:
+        ProjectWatcher(args.project, args.output_dir).run(
+            lambda report: print(report.summary(), flush=True),
+            lambda error: print(f"failed: {error}", file=sys.stderr, flush=True),
+            interval=args.interval, debounce=args.debounce)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="xggx", description="Headless Opera GX mod builder")
+    parser.add_argument("--perf", action="store_true", help="print timing spans to stderr when done")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help="write timing spans as Chrome trace-event JSON (chrome://tracing, Perfetto)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="build mod zips from project folders")
+    build.add_argument("projects", nargs="+", help="project folders, or folders containing projects")
+    build.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    build.add_argument("-o", "--output-dir", default=None, help="write zips here instead of into each project")
+    build.add_argument("--optimize", action="store_true",
+                       help="re-encode and shrink media, minify CSS and shaders, and print a size report")
+    build.add_argument("--bundle-styles", action="store_true",
+                       help="with --optimize, merge page styles that apply to the same pages into one stylesheet")
+    build.add_argument("--stream", action="store_true",
+                       help="resize images straight into the zip instead of into the project first")
+    build.add_argument("--check", action="store_true",
+                       help="run the preflight checks first and skip mods that have errors")
+    build.set_defaults(handler=run_build)
+
+    check = commands.add_parser("check", help="report missing or broken files and bad theme values")
+    check.add_argument("projects", nargs="+", help="project folders, or folders containing projects")
+    check.set_defaults(handler=run_check)
+
+    pack = commands.add_parser("pack", help="stream one project's zip to a file or stdout")
+    pack.add_argument("project", help="project folder")
+    pack.add_argument("-o", "--output", default="-", help="output file, or - for stdout (default)")
+    pack.set_defaults(handler=run_pack)
+
+    watch = commands.add_parser("watch", help="rebuild a project's zip whenever its assets change")
+    watch.add_argument("project", help="project folder")
+    watch.add_argument("-o", "--output-dir", default=None, help="write the zip here instead of into the project")
+    watch.add_argument("--interval", type=float, default=POLL_INTERVAL,
+                       help=f"seconds between checks for changes (default: {POLL_INTERVAL})")
+    watch.add_argument("--debounce", type=float, default=DEBOUNCE,
+                       help=f"seconds without further changes before rebuilding (default: {DEBOUNCE})")
+    watch.set_defaults(handler=run_watch)
+
+    release = commands.add_parser("release", help="build the next version of a mod with delta packages")
+    release.add_argument("project", help="project folder")
+    release.add_argument("-o", "--output-dir", default=None,
+                         help="releases folder for this mod (default: releases/<project folder>)")
+    release.add_argument("--bump", choices=BUMP_PARTS, default="patch",
+                         help="version part to increase (default: patch)")
+    release.add_argument("--optimize", action="store_true", help="shrink media as for build --optimize")
+    release.add_argument("--update-url", default=None,
+                         help="set the manifest's update_url, e.g. http://127.0.0.1:8765/updates.json")
+    release.add_argument("--deltas", type=int, default=DELTA_HISTORY,
+                         help=f"make deltas from this many previous releases (default: {DELTA_HISTORY})")
+    release.set_defaults(handler=run_release)
+
+    serve = commands.add_parser("serve", help="serve a releases folder as a local update server")
+    serve.add_argument("releases_dir", help="releases folder written by release")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    serve.set_defaults(handler=run_serve)
+
+    variants = commands.add_parser("variants", help="build one zip per combination of theme colours")
+    variants.add_argument("project", help="base project folder")
+    variants.add_argument("-a", "--axis", action="append", required=True,
+                          help="theme field and values, e.g. gx_accent.h=0:360:15 or dark.gx_accent.l=40,50,60; "
+                               "without dark./light. both modes get the value (repeatable, combined as a matrix)")
+    variants.add_argument("-o", "--output-dir", default="variants", help="where to write the zips (default: variants)")
+    variants.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    variants.set_defaults(handler=run_variants)
+
+    store = commands.add_parser("store", help="manage the asset store shared by a projects folder")
+    store.add_argument("action", choices=["du", "gc", "dedupe"],
+                       help="du: report disk usage, gc: delete unreferenced blobs, "
+                            "dedupe: move existing project files into the store")
+    store.add_argument("projects_dir", help="folder containing the projects")
+    store.set_defaults(handler=run_store)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.perf or args.trace:
+        # Worker processes read the variable when they import xggx.perf
+        os.environ[perf.ENV_VAR] = "1"
+        perf.enable()
+    status = args.handler(args)
+    if args.perf:
+        print("\n".join(perf.format_stats()), file=sys.stderr)
+    if args.trace:
+        count = perf.export_chrome_trace(args.trace)
+        print(f"wrote {count} spans to {args.trace}", file=sys.stderr)
+    return status
@@ -0,0 +1,129 @@
+import json
+import os
+from collections import deque
+
+from xggx import META_DIR
+
+# Undo/redo for the editor. States are ModProject snapshots: tuples in which
+# every payload group that did not change between two states is the same
+# object, so each state costs a few pointers plus the groups actually edited.
+# Older states fall off the end once there are more than HISTORY_DEPTH.
+HISTORY_DEPTH = int(os.environ.get("XGGX_HISTORY_DEPTH", "100"))
+# Set XGGX_HISTORY_PERSIST=0 to forget the history when a project is closed
+PERSIST = os.environ.get("XGGX_HISTORY_PERSIST", "1") != "0"
+HISTORY_NAME = "history.json"
+FORMAT_VERSION = 1
+
+
+class History:
+    def __init__(self, current, depth=HISTORY_DEPTH):
+        self.current = current
+        self.undo_stack = deque(maxlen=depth)
+        self.redo_stack = deque(maxlen=depth)
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def record(self, state):
+        # Returns False when state is the current one. A new edit forgets
+        # the states that were undone.
+        if state == self.current:
+            return False
+        self.undo_stack.append(self.current)
+        self.current = state
+        self.redo_stack.clear()
+        return True
+
+    def undo(self):
+        # The state to restore, or None
+        if not self.undo_stack:
+            return None
+        self.redo_stack.append(self.current)
+        self.current = self.undo_stack.pop()
+        return self.current
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        self.undo_stack.append(self.current)
+        self.current = self.redo_stack.pop()
+        return self.current
+
+    def states(self):
+        # Oldest first: undoable states, the current one, then redoable ones
+        return list(self.undo_stack) + [self.current] + list(reversed(self.redo_stack))
+
+    def to_json(self):
+        # Payload groups shared between states are written once and referred
+        # to by index, so the file is as compact as the history in memory
+        groups, by_id, by_value, states = [], {}, {}, []
+        for general, payload in self.states():
+            refs = []
+            for group in payload:
+                # Shared groups are found by identity, which is cheaper than
+                # hashing their values
+                ref = by_id.get(id(group))
+                if ref is None:
+                    ref = by_id[id(group)] = by_value.setdefault(group, len(groups))
+                    if ref == len(groups):
+                        groups.append(list(group))
+                refs.append(ref)
+            states.append([list(general), refs])
+        return {"version": FORMAT_VERSION, "groups": groups, "states": states,
+                "position": len(self.undo_stack)}
+
+    @classmethod
+    def from_json(cls, data, shape, depth=HISTORY_DEPTH):
+        # shape is a snapshot of the current model; histories written for
+        # different fields are rejected with ValueError
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError("Unsupported history version")
+        groups = [tuple(group) for group in data["groups"]]
+        states = []
+        for general, refs in data["states"]:
+            state = (tuple(general), tuple(groups[ref] for ref in refs))
+            if len(state[0]) != len(shape[0]) or [len(g) for g in state[1]] != [len(g) for g in shape[1]]:
+                raise ValueError("History does not match the editor's fields")
+            states.append(state)
+        position = data["position"]
+        if not 0 <= position < len(states):
+            raise ValueError("Invalid history position")
+        history = cls(states[position], depth)
+        history.undo_stack.extend(states[:position])
+        history.redo_stack.extend(reversed(states[position + 1:]))
+        return history
+
+
+def history_path(project_path):
+    return os.path.join(project_path, META_DIR, HISTORY_NAME)
+
+
+def load_history(project_path, current, depth=HISTORY_DEPTH):
+    # The project's saved history with current as the newest state, or a new
+    # one. If the manifest was changed outside the editor since the history
+    # was saved, that change becomes one more undoable step.
+    try:
+        with open(history_path(project_path), "r") as f:
+            history = History.from_json(json.load(f), current, depth)
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        return History(current, depth)
+    history.record(current)
+    return history
+
+
+def save_history(project_path, history):
+    if not os.path.isdir(project_path):
+        return
+    path = history_path(project_path)
+    tmp_path = path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump(history.to_json(), f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Losing the history is no reason to stop closing a project
+        pass
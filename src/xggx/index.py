@@ -0,0 +1,210 @@
+import json
+import os
+import threading
+
+from xggx.archive import is_archive_path, read_archive_manifest
+from xggx.storage import read_manifest
+
+INDEX_NAME = ".xggx_index.json"
+INDEX_VERSION = 2
+PROJECT = "project"
+# A mod zip or crx in projects_dir, listed without extracting it
+ARCHIVE = "archive"
+
+SORT_KEYS = {
+    "name": lambda entry: entry.name.lower(),
+    "modified": lambda entry: entry.manifest_mtime_ns,
+    "developer": lambda entry: entry.summary.get("developer", "").lower(),
+}
+
+
+class ProjectEntry:
+    __slots__ = ("folder", "path", "name", "manifest_mtime_ns", "manifest_size", "summary", "thumbnail", "kind")
+
+    def __init__(self, folder, path, name, manifest_mtime_ns, manifest_size, summary, thumbnail, kind=PROJECT):
+        self.folder = folder
+        self.path = path
+        self.name = name
+        self.manifest_mtime_ns = manifest_mtime_ns
+        self.manifest_size = manifest_size
+        self.summary = summary
+        self.thumbnail = thumbnail
+        self.kind = kind
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*(data[slot] for slot in cls.__slots__))
+
+    def matches(self, text):
+        text = text.lower()
+        return (text in self.name.lower() or text in self.folder.lower()
+                or text in self.summary.get("developer", "").lower()
+                or text in self.summary.get("description", "").lower())
+
+
+def payload_items(payload, key):
+    # The dict entries of one payload group; hand-edited manifests may hold
+    # anything there
+    items = payload.get(key)
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+
+def summarize_manifest(project_path, manifest):
+    mod = manifest.get("mod")
+    payload = mod.get("payload") if isinstance(mod, dict) else None
+    if not isinstance(payload, dict):
+        payload = {}
+    # id and name are always generated, so only other keys count as content
+    configured = [key for key in payload
+                  if any(set(item) - {"id", "name"} for item in payload_items(payload, key))]
+    developer = manifest.get("developer", "")
+    if isinstance(developer, dict):
+        developer = developer.get("name", "")
+    summary = {
+        "developer": str(developer),
+        "description": str(manifest.get("description", "")),
+        "version": str(manifest.get("version", "")),
+        "payload": configured,
+    }
+    return summary, find_thumbnail(project_path, payload)
+
+
+def find_thumbnail(project_path, payload):
+    candidates = []
+    for item in payload_items(payload, "wallpaper"):
+        candidates += [item.get("dark.image"), item.get("light.image")]
+    for item in payload_items(payload, "app_icon"):
+        candidates.append(item.get("path"))
+    for value in candidates:
+        if not value or not isinstance(value, str):
+            continue
+        for path in [os.path.join(project_path, "wallpaper", os.path.basename(value)),
+                     os.path.join(project_path, "app_icon", os.path.basename(value)), value]:
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+class ProjectIndex:
+    # Persistent listing of projects_dir. A refresh stats one manifest per
+    # folder and only re-reads manifests whose mtime or size changed, so
+    # large or remote project directories stay cheap to list. refresh() may
+    # run on a worker thread: it fills a copy and swaps it in, so readers of
+    # projects never see a half-updated dict.
+
+    def __init__(self, projects_dir):
+        self.projects_dir = projects_dir
+        self.index_path = os.path.join(projects_dir, INDEX_NAME)
+        self.projects = {}
+        self.dirty = False
+        self.lock = threading.RLock()
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.projects = {folder: ProjectEntry.from_dict(entry)
+                                 for folder, entry in data.get("projects", {}).items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.projects = {}
+
+    def refresh(self):
+        # Returns True when anything in the listing changed
+        with self.lock:
+            projects = dict(self.projects)
+            seen = set()
+            changed = False
+            try:
+                it = os.scandir(self.projects_dir)
+            except OSError:
+                it = None
+            if it is not None:
+                with it:
+                    for dir_entry in it:
+                        if dir_entry.name.startswith("."):
+                            continue
+                        if dir_entry.is_dir():
+                            seen.add(dir_entry.name)
+                            changed |= self.update_folder(dir_entry.name, projects)
+                        elif is_archive_path(dir_entry.name):
+                            seen.add(dir_entry.name)
+                            changed |= self.update_archive(dir_entry.name, projects)
+            for folder in set(projects) - seen:
+                del projects[folder]
+                changed = True
+            self.projects = projects
+            if changed:
+                self.dirty = True
+                self.save()
+            return changed
+
+    def update_folder(self, folder, projects=None):
+        projects = self.projects if projects is None else projects
+        path = os.path.join(self.projects_dir, folder)
+        manifest_path = os.path.join(path, "manifest.json")
+        try:
+            st = os.stat(manifest_path)
+        except OSError:
+            return projects.pop(folder, None) is not None
+        known = projects.get(folder)
+        if known and known.manifest_mtime_ns == st.st_mtime_ns and known.manifest_size == st.st_size:
+            return False
+        try:
+            # A damaged manifest is summarized from its newest journal entry
+            manifest, recovered_from = read_manifest(path)
+            summary, thumbnail = summarize_manifest(path, manifest)
+            if recovered_from:
+                summary["error"] = "manifest damaged, recoverable from journal"
+            name = str(manifest.get("name") or folder)
+        except (OSError, ValueError, AttributeError, TypeError):
+            # Listed anyway so a damaged manifest does not make the mod vanish
+            summary, thumbnail, name = {"error": "unreadable manifest"}, None, folder
+        projects[folder] = ProjectEntry(folder, path, name, st.st_mtime_ns, st.st_size, summary, thumbnail)
+        self.dirty = True
+        return True
+
+    def update_archive(self, name, projects=None):
+        # The zip's own size and mtime stand in for the manifest's; reading the
+        # manifest touches only the central directory and that one member
+        projects = self.projects if projects is None else projects
+        path = os.path.join(self.projects_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return projects.pop(name, None) is not None
+        known = projects.get(name)
+        if known and known.manifest_mtime_ns == st.st_mtime_ns and known.manifest_size == st.st_size:
+            return False
+        import zipfile
+        try:
+            manifest = read_archive_manifest(path)
+            summary, _ = summarize_manifest(path, manifest)
+            entry_name = str(manifest.get("name") or name)
+        except (OSError, ValueError, AttributeError, TypeError, zipfile.BadZipFile):
+            # Not a mod (or not a zip at all); built zips of projects land here too
+            return projects.pop(name, None) is not None
+        projects[name] = ProjectEntry(name, path, entry_name, st.st_mtime_ns, st.st_size, summary, None, ARCHIVE)
+        self.dirty = True
+        return True
+
+    def entries(self, filter_text="", sort_by="name", reverse=False):
+        # Served from memory; never touches the disk
+        entries = [entry for entry in self.projects.values() if not filter_text or entry.matches(filter_text)]
+        entries.sort(key=SORT_KEYS[sort_by], reverse=reverse)
+        return entries
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"version": INDEX_VERSION,
+                           "projects": {folder: entry.to_dict() for folder, entry in self.projects.items()}}, f)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+        except OSError:
+            # A read-only share still gets an in-memory index
+            pass
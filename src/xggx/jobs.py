@@ -0,0 +1,119 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, group, key, on_progress=None):
+        self.group = group
+        self.key = key
+        self.on_progress = on_progress
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.key)
+
+    def progress(self, done, total):
+        # Progress reports double as cancellation points for long loops
+        self.check()
+        if self.on_progress:
+            self.on_progress(self, done, total)
+
+
+class JobQueue:
+    # Jobs are identified by (group, key), where group is usually the project
+    # path and key the field being processed. Submitting a job for a key that
+    # is still queued or running cancels the older one.
+
+    def __init__(self, max_threads=None, max_processes=None):
+        self.threads = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="xggx-job")
+        self.max_processes = max_processes
+        self.processes = None
+        self.lock = threading.Lock()
+        self.active = {}
+
+    def process_pool(self):
+        with self.lock:
+            if self.processes is None:
+                # multiprocessing is only imported once something needs it
+                from concurrent.futures import ProcessPoolExecutor
+                self.processes = ProcessPoolExecutor(max_workers=self.max_processes or os.cpu_count())
+            return self.processes
+
+    def run_in_process(self, job, fn, *args):
+        # Blocks the calling worker thread, not the GUI, while fn runs in a child process
+        job.check()
+        future = self.process_pool().submit(fn, *args)
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except TimeoutError:
+                if job.cancelled:
+                    future.cancel()
+                    raise JobCancelled(job.key)
+
+    def submit(self, group, key, fn, *args, on_done=None, on_error=None, on_progress=None):
+        job = Job(group, key, on_progress)
+        with self.lock:
+            previous = self.active.get((group, key))
+            if previous is not None:
+                previous.cancel()
+            self.active[(group, key)] = job
+        job.future = self.threads.submit(self._run, job, fn, args, on_done, on_error)
+        return job
+
+    def _run(self, job, fn, args, on_done, on_error):
+        try:
+            job.check()
+            result = fn(job, *args)
+            job.check()
+        except JobCancelled:
+            return
+        except Exception as e:
+            if on_error is not None and not job.cancelled:
+                on_error(job, e)
+            return
+        finally:
+            with self.lock:
+                if self.active.get((job.group, job.key)) is job:
+                    del self.active[(job.group, job.key)]
+        if on_done is not None:
+            on_done(job, result)
+
+    def jobs(self, group=None):
+        with self.lock:
+            return [job for job in self.active.values() if group is None or job.group == group]
+
+    def pending_count(self, group=None):
+        return len(self.jobs(group))
+
+    def wait_group(self, group, exclude=None):
+        futures = [job.future for job in self.jobs(group) if job is not exclude and job.future is not None]
+        wait(futures)
+
+    def cancel_group(self, group):
+        for job in self.jobs(group):
+            job.cancel()
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        if self.processes is not None:
+            # Waiting lets running workers exit cleanly; queued ones are dropped
+            self.processes.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,395 @@
+import copy
+import json
+import os
+
+# (label, payload key, editable fields) for every payload group the editor shows
+PAYLOAD_OPTIONS = [
+    ("App Icon", "app_icon", ["id", "name", "path"]),
+    ("Wallpaper", "wallpaper", ["id", "name", "dark.image", "light.image"]),
+    ("Background Music", "background_music", ["tracks"]),
+    ("Browser Sounds", "browser_sounds", ["sounds.CLICK", "sounds.FEATURE_SWITCH_OFF", "sounds.FEATURE_SWITCH_ON",
+                                          "sounds.HOVER", "sounds.HOVER_UP", "sounds.IMPORTANT_CLICK",
+                                          "sounds.LEVEL_UPGRADE", "sounds.LIMITER_OFF", "sounds.LIMITER_ON",
+                                          "sounds.SWITCH_TOGGLE", "sounds.TAB_CLOSE", "sounds.TAB_INSERT",
+                                          "sounds.TAB_SLASH"]),
+    ("Keyboard Sounds", "keyboard_sounds", ["sounds.TYPING_BACKSPACE", "sounds.TYPING_ENTER", "sounds.TYPING_LETTER",
+                                            "sounds.TYPING_SPACE"]),
+    ("Fonts", "fonts", ["header.name", "variants.path"]),
+    ("Image Overrides", "image_overrides", ["images.sidebar_bookmarks_button", "images.sidebar_gx_booster_button",
+                                            "images.sidebar_limiters_button", "images.sidebar_mods_button",
+                                            "images.sidebar_settings_button", "images.sidebar_shaders_button"]),
+    ("Mobile Image Overrides", "mobile_image_overrides", ["images.start_page_logo"]),
+    ("Page Styles", "page_styles", ["css", "matches"]),
+    ("Shaders", "shaders", ["path"]),
+    ("Splash Screen", "splash_screen", ["path"]),
+    ("Stickers", "stickers", ["images", "preview"]),
+    ("Theme", "theme", ["dark.gx_accent.h", "dark.gx_accent.s", "dark.gx_accent.l", "dark.gx_secondary_base.h",
+                        "dark.gx_secondary_base.s", "dark.gx_secondary_base.l", "light.gx_accent.h", "light.gx_accent.s",
+                        "light.gx_accent.l", "light.gx_secondary_base.h", "light.gx_secondary_base.s",
+                        "light.gx_secondary_base.l"]),
+]
+
+GENERAL_FIELDS = ("name", "developer", "description")
+GENERAL_DEFAULTS = {"name": "My GX Mod", "developer": "Anonymous", "description": "A custom Opera GX mod."}
+# Kept from the loaded manifest; `xggx release` bumps the version and can
+# point update_url at a local update server
+DEFAULT_VERSION = "1.0"
+DEFAULT_UPDATE_URL = "https://api.gx.me/store/mods/update"
+IMAGE_FIELDS = ("dark.image", "light.image")
+LIST_FIELDS = ("tracks", "sounds", "images")
+
+THEME_DEFAULTS = {
+    "dark.gx_accent": {"h": 211, "s": 100, "l": 54},
+    "dark.gx_secondary_base": {"h": 234, "s": 35, "l": 16},
+    "light.gx_accent": {"h": 224, "s": 100, "l": 66},
+    "light.gx_secondary_base": {"h": 210, "s": 47, "l": 88},
+}
+# Largest value of each HSL channel
+THEME_RANGES = {"h": 360, "s": 100, "l": 100}
+
+
+def field_text(value):
+    # What a text field shows for a manifest value. Raises ValueError for
+    # values no field can show, e.g. objects or lists of numbers.
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return ", ".join(value)
+    raise ValueError(f"Unsupported value {value!r}")
+
+
+class PayloadItem:
+    # Holds the raw text of one payload group's fields. The manifest entries
+    # built from them are cached until a field (or the mod name they embed)
+    # changes, and so is the frozen copy of the fields that snapshots share.
+    __slots__ = ("key", "fields", "_cache_name", "_cache", "_frozen")
+
+    def __init__(self, key, field_names):
+        self.key = key
+        self.fields = dict.fromkeys(field_names, "")
+        self._cache_name = None
+        self._cache = None
+        self._frozen = None
+
+    def get(self, field):
+        return self.fields[field]
+
+    def set(self, field, value):
+        if self.fields[field] == value:
+            return False
+        self.fields[field] = value
+        self._cache = None
+        self._frozen = None
+        return True
+
+    def freeze(self):
+        # Field values as a tuple, the same object until a field changes
+        if self._frozen is None:
+            self._frozen = tuple(self.fields.values())
+        return self._frozen
+
+    def thaw(self, frozen):
+        # Restores freeze() output; returns the fields that changed
+        changed = [field for field, value in zip(self.fields, frozen) if self.set(field, value)]
+        self._frozen = frozen
+        return changed
+
+    def values(self):
+        for field, value in self.fields.items():
+            value = value.strip()
+            if value:
+                yield field, value
+
+    def entries(self, mod_name):
+        if self._cache is None or self._cache_name != mod_name:
+            self._cache = self.build(mod_name)
+            self._cache_name = mod_name
+        return self._cache
+
+    def build(self, mod_name):
+        raise NotImplementedError
+
+    def load(self, data):
+        # data is a list of dicts; raises ValueError for anything the fields
+        # cannot show
+        raise NotImplementedError
+
+    def clear(self):
+        for field in self.fields:
+            self.set(field, "")
+
+
+class AssetItem(PayloadItem):
+    __slots__ = ()
+
+    def build(self, mod_name):
+        item = {"id": "0", "name": f"{mod_name} {self.key.capitalize()}"}
+        for field, value in self.values():
+            if field in IMAGE_FIELDS:
+                item[field] = os.path.basename(value) if os.path.exists(value) else value
+            elif field in LIST_FIELDS:
+                item[field] = [v.strip() for v in value.split(',') if v.strip()]
+            else:
+                item[field] = value
+        return [item]
+
+    def load(self, data):
+        item = data[0]
+        for field in self.fields:
+            self.set(field, field_text(item.get(field, "")))
+
+
+class ShaderItem(PayloadItem):
+    __slots__ = ()
+
+    def build(self, mod_name):
+        return [{"name": f"{mod_name} Shader", "path": value} for _, value in self.values()]
+
+    def load(self, data):
+        for item, field in zip(data, self.fields):
+            self.set(field, field_text(item.get("path", "")))
+
+
+def theme_value(text, default):
+    # Text that is not a number is kept as typed rather than failing the
+    # save; preflight reports it before the mod is packaged
+    text = text.strip()
+    if not text:
+        return default
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+class ThemeItem(PayloadItem):
+    __slots__ = ()
+
+    def build(self, mod_name):
+        theme = {"id": "0", "name": f"{mod_name} Theme"}
+        for mode in ["dark", "light"]:
+            theme[mode] = {}
+            for color in ["gx_accent", "gx_secondary_base"]:
+                defaults = THEME_DEFAULTS[f"{mode}.{color}"]
+                theme[mode][color] = {
+                    channel: theme_value(self.fields[f"{mode}.{color}.{channel}"], defaults[channel])
+                    for channel in "hsl"
+                }
+        return [theme]
+
+    def load(self, data):
+        theme = data[0] if data else {}
+        for name, defaults in THEME_DEFAULTS.items():
+            mode, color = name.split(".")
+            colors = theme.get(mode, {})
+            values = colors.get(color, defaults) if isinstance(colors, dict) else None
+            if not isinstance(values, dict):
+                raise ValueError(f"Unsupported theme colors {colors!r}")
+            for channel in "hsl":
+                self.set(f"{name}.{channel}", field_text(values.get(channel, defaults[channel])))
+
+
+class ListItem(PayloadItem):
+    __slots__ = ()
+
+    def build(self, mod_name):
+        return [{field: value} for field, value in self.values()]
+
+    def load(self, data):
+        for i, field in enumerate(self.fields):
+            self.set(field, field_text(data[i].get(field, "")) if i < len(data) else "")
+
+
+def item_class(key):
+    if key in ["app_icon", "wallpaper", "background_music", "splash_screen", "stickers"]:
+        return AssetItem
+    if key == "shaders":
+        return ShaderItem
+    if key == "theme":
+        return ThemeItem
+    return ListItem
+
+
+class ModProject:
+    # Pure-Python owner of a mod's manifest state. Fields are addressed by the
+    # same ids the editor uses: ("name",), ("developer",), ("description",) for
+    # the general tab and (payload key, field) for payload options.
+
+    def __init__(self):
+        self.general = dict.fromkeys(GENERAL_FIELDS, "")
+        self.version = DEFAULT_VERSION
+        self.update_url = DEFAULT_UPDATE_URL
+        self.payload = {key: item_class(key)(key, fields) for _, key, fields in PAYLOAD_OPTIONS}
+        # The loaded manifest, whose keys the model does not know about are
+        # written back untouched, and {payload key: (fields as loaded, raw
+        # entries or None when absent)} for every group the fields cannot
+        # reproduce, e.g. nested or extra entries of an imported mod. Such a
+        # group is written back as it was until one of its fields is edited.
+        self._base = None
+        self._kept = {}
+        self.dirty = set()
+        self._manifest = None
+        self._json = None
+
+    @classmethod
+    def from_manifest(cls, manifest):
+        project = cls()
+        project.load_manifest(manifest)
+        return project
+
+    @property
+    def mod_name(self):
+        return self.general["name"].strip() or GENERAL_DEFAULTS["name"]
+
+    def get(self, field_id):
+        if len(field_id) == 1:
+            return self.general[field_id[0]]
+        key, field = field_id
+        return self.payload[key].get(field)
+
+    def set(self, field_id, value):
+        # Returns False when the value did not change, so nothing is invalidated
+        if len(field_id) == 1:
+            if self.general[field_id[0]] == value:
+                return False
+            self.general[field_id[0]] = value
+        else:
+            key, field = field_id
+            if not self.payload[key].set(field, value):
+                return False
+        self.dirty.add(field_id)
+        self._manifest = None
+        self._json = None
+        return True
+
+    def mark_clean(self):
+        self.dirty.clear()
+
+    def snapshot(self):
+        # Immutable state for xggx.history: (general values, payload values),
+        # where each payload group's tuple is shared with earlier snapshots
+        # until that group is edited
+        return (tuple(self.general.values()), tuple(item.freeze() for item in self.payload.values()))
+
+    def restore(self, snapshot):
+        # Returns the field ids that changed, which are also marked dirty
+        general, payload = snapshot
+        changed = []
+        for field, value in zip(GENERAL_FIELDS, general):
+            if self.general[field] != value:
+                self.general[field] = value
+                changed.append((field,))
+        for (key, item), frozen in zip(self.payload.items(), payload):
+            if item.freeze() is not frozen:
+                changed += [(key, field) for field in item.thaw(frozen)]
+        if changed:
+            self.dirty.update(changed)
+            self._manifest = None
+            self._json = None
+        return changed
+
+    def load_manifest(self, manifest):
+        # Anything the editor cannot show is kept as it is rather than
+        # rejected; only a manifest that is not an object at all is an error
+        if not isinstance(manifest, dict):
+            raise ValueError("manifest.json does not contain an object")
+        developer = manifest.get("developer", {})
+        if isinstance(developer, dict):
+            developer = developer.get("name", "")
+        for key, value in (("name", manifest.get("name", "")), ("developer", developer),
+                           ("description", manifest.get("description", ""))):
+            try:
+                self.general[key] = field_text(value)
+            except ValueError:
+                self.general[key] = ""
+        self.version = manifest.get("version") or DEFAULT_VERSION
+        self.update_url = manifest.get("update_url") or DEFAULT_UPDATE_URL
+        self._base = copy.deepcopy(manifest)
+        self._kept = {}
+        mod = self._base.get("mod")
+        payload = mod.get("payload") if isinstance(mod, dict) else None
+        if not isinstance(payload, dict):
+            payload = {}
+        for key, item in self.payload.items():
+            data = payload.get(key)
+            loadable = isinstance(data, list) and all(isinstance(entry, dict) for entry in data)
+            if loadable and data:
+                try:
+                    item.load(data)
+                except ValueError:
+                    item.clear()
+                    loadable = False
+            if not loadable or item.entries(self.mod_name) != data:
+                self._kept[key] = (item.freeze(), data)
+        self.dirty.clear()
+        self._manifest = None
+        self._json = None
+
+    def kept_groups(self):
+        # Payload keys written back as loaded because no field was edited
+        return [key for key, (frozen, data) in self._kept.items()
+                if data is not None and self.payload[key].freeze() == frozen]
+
+    def image_references(self):
+        # (key, field, path) for every field whose file save_manifest processes
+        for key, item in self.payload.items():
+            for field, value in item.values():
+                if field in IMAGE_FIELDS:
+                    yield key, field, value
+
+    def to_manifest(self):
+        # The returned dict is shared with the cache and must not be mutated
+        if self._manifest is not None:
+            return self._manifest
+        mod_name = self.mod_name
+        base = self._base if isinstance(self._base, dict) else {}
+        base_mod = base.get("mod") if isinstance(base.get("mod"), dict) else {}
+        base_payload = base_mod.get("payload") if isinstance(base_mod.get("payload"), dict) else {}
+        payload = {}
+        for key in list(base_payload) + [key for key in self.payload if key not in base_payload]:
+            item = self.payload.get(key)
+            kept = self._kept.get(key)
+            if item is None:
+                payload[key] = base_payload[key]
+            elif kept is not None and item.freeze() == kept[0]:
+                if kept[1] is not None:
+                    payload[key] = kept[1]
+            else:
+                payload[key] = list(item.entries(mod_name))
+        general = {
+            "name": mod_name,
+            "version": self.version,
+            "description": self.general["description"].strip() or GENERAL_DEFAULTS["description"],
+            "developer": {"name": self.general["developer"].strip() or GENERAL_DEFAULTS["developer"]},
+        }
+        if base:
+            # Everything the editor does not edit stays as loaded
+            if isinstance(base.get("developer"), dict):
+                general["developer"] = {**base["developer"], **general["developer"]}
+            self._manifest = {**base, **general, "mod": {**base_mod, "payload": payload},
+                              "update_url": self.update_url}
+            return self._manifest
+        self._manifest = {
+            "manifest_version": 3,
+            **general,
+            "icons": {"512": "icon_512.png"},
+            "mod": {
+                "schema_version": 2,
+                "flavor": {
+                    "features": [],
+                    "hash": "74be16979710d4c4e7c6647856088456",
+                    "parent_hash": "d41d8cd98f00b204e9800998ecf8427e"
+                },
+                "license": "license.txt",
+                "payload": payload
+            },
+            "update_url": self.update_url
+        }
+        return self._manifest
+
+    def to_json(self):
+        if self._json is None:
+            self._json = json.dumps(self.to_manifest(), indent=2)
+        return self._json
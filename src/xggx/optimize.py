@@ -0,0 +1,264 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import wave
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from xggx import META_DIR, perf
+from xggx.storage import match_mode
+
+OPTIMIZED_DIR = "optimized"
+INDEX_NAME = "index.json"
+# Part of every cache key; bump when the output of an optimizer changes
+VERSION = 2
+WEBP_QUALITY = int(os.environ.get("XGGX_WEBP_QUALITY", "85"))
+STICKER_COLORS = 256
+# UI sounds shorter than this are downmixed and trimmed; music is left alone
+SHORT_SOUND_SECONDS = 10
+SILENCE_RATIO = 0.01
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+WALLPAPER_DIRS = {"wallpaper", "splash", "splash_screen"}
+SOUND_DIRS = {"sounds", "browser_sounds", "keyboard_sounds"}
+MUSIC_DIRS = {"music", "background_music"}
+FONT_DIRS = {"font", "fonts"}
+# Hinting tables only matter for tiny sizes on low-DPI screens
+DROPPED_FONT_TABLES = ["fpgm", "prep", "cvt ", "hdmx", "VDMX", "LTSH"]
+
+
+def has_module(name):
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+
+def profile_for(arcname):
+    # Returns the optimization profile for an archive entry, or None to ship
+    # it untouched. Profiles are plain dicts so they can be hashed into cache
+    # keys and sent to worker processes.
+    top = arcname.split("/", 1)[0] if "/" in arcname else ""
+    ext = os.path.splitext(arcname)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        if top in WALLPAPER_DIRS:
+            return {"kind": "image", "format": "WEBP", "quality": WEBP_QUALITY}
+        if top == "stickers" and ext == ".png":
+            return {"kind": "image", "format": "PNG", "colors": STICKER_COLORS}
+        return {"kind": "image", "format": None}
+    if ext == ".wav" and top in SOUND_DIRS:
+        return {"kind": "wav", "mono": True, "trim": True}
+    if ext in {".mp3", ".wav", ".ogg"} and top in SOUND_DIRS | MUSIC_DIRS and shutil.which("ffmpeg"):
+        if top in SOUND_DIRS:
+            return {"kind": "ffmpeg", "args": ["-ac", "1", "-b:a", "96k"]}
+        return {"kind": "ffmpeg", "args": ["-b:a", "160k"]}
+    if ext in {".ttf", ".otf"} and top in FONT_DIRS and has_module("fontTools"):
+        return {"kind": "font"}
+    return None
+
+
+def output_arcname(arcname, profile):
+    if profile["kind"] == "image" and profile["format"] == "WEBP":
+        return os.path.splitext(arcname)[0] + ".webp"
+    if profile["kind"] == "ffmpeg" and os.path.splitext(arcname)[1].lower() == ".wav":
+        return os.path.splitext(arcname)[0] + ".mp3"
+    return arcname
+
+
+def optimize_image(source, dest, profile):
+    from PIL import Image
+    with Image.open(source) as img:
+        fmt = profile["format"] or img.format
+        if profile.get("colors") and img.mode in ("RGB", "RGBA"):
+            method = Image.Quantize.FASTOCTREE if img.mode == "RGBA" else Image.Quantize.MEDIANCUT
+            img = img.quantize(colors=profile["colors"], method=method)
+        elif fmt == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        options = {"optimize": True} if fmt in ("PNG", "JPEG") else {}
+        if fmt in ("WEBP", "JPEG"):
+            options["quality"] = profile.get("quality", WEBP_QUALITY)
+        if fmt == "WEBP":
+            options["method"] = 6
+        # Pillow's PNG writer falls back to img.info for the ICC profile, so
+        # metadata is only stripped when it is explicitly left out
+        img.save(dest, fmt, icc_profile=None, exif=b"", **options)
+
+
+def optimize_wav(source, dest, profile):
+    with wave.open(source, "rb") as reader:
+        params = reader.getparams()
+        frames = reader.readframes(params.nframes)
+    typecode = {1: "B", 2: "h", 4: "i"}.get(params.sampwidth)
+    if typecode is None or params.nframes > params.framerate * SHORT_SOUND_SECONDS:
+        shutil.copyfile(source, dest)
+        return
+    samples = array(typecode, frames)
+    if sys.byteorder == "big" and params.sampwidth > 1:
+        samples.byteswap()
+    channels = params.nchannels
+    if profile.get("mono") and channels > 1:
+        samples = array(typecode, (sum(samples[i:i + channels]) // channels
+                                   for i in range(0, len(samples) - channels + 1, channels)))
+        channels = 1
+    if profile.get("trim") and samples:
+        # 8-bit WAV is unsigned with silence at 128
+        center = 128 if params.sampwidth == 1 else 0
+        threshold = max(abs(s - center) for s in samples) * SILENCE_RATIO
+        start, end = 0, len(samples)
+        while start < end and abs(samples[start] - center) <= threshold:
+            start += 1
+        while end > start and abs(samples[end - 1] - center) <= threshold:
+            end -= 1
+        start -= start % channels
+        end += (-end) % channels
+        samples = samples[start:end] if end > start else samples
+    if sys.byteorder == "big" and params.sampwidth > 1:
+        samples.byteswap()
+    with wave.open(dest, "wb") as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(params.sampwidth)
+        writer.setframerate(params.framerate)
+        writer.writeframes(samples.tobytes())
+
+
+def optimize_ffmpeg(source, dest, profile):
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-i", source, "-map_metadata", "-1", *profile["args"], dest],
+                   check=True, stdin=subprocess.DEVNULL)
+
+
+def optimize_font(source, dest, profile):
+    from fontTools.ttLib import TTFont
+    font = TTFont(source)
+    for tag in DROPPED_FONT_TABLES:
+        if tag in font:
+            del font[tag]
+    font.save(dest)
+
+
+OPTIMIZERS = {
+    "image": optimize_image,
+    "wav": optimize_wav,
+    "ffmpeg": optimize_ffmpeg,
+    "font": optimize_font,
+}
+
+
+def optimize_asset(source, dest, profile):
+    # Runs in a worker process. Writes the optimized file to dest, or the
+    # original bytes when optimizing did not make it smaller, and returns
+    # (path actually written, size).
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=os.path.splitext(dest)[1])
+    os.close(fd)
+    try:
+        with perf.span("media.optimize", kind=profile["kind"]) as span:
+            OPTIMIZERS[profile["kind"]](source, tmp_path, profile)
+            if os.path.getsize(tmp_path) >= os.path.getsize(source):
+                dest = os.path.join(os.path.dirname(dest), os.path.basename(source))
+                shutil.copyfile(source, tmp_path)
+            span.read(os.path.getsize(source))
+            span.wrote(os.path.getsize(tmp_path))
+        match_mode(tmp_path, dest)
+        os.replace(tmp_path, dest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return dest, os.path.getsize(dest)
+
+
+class OptimizeReport:
+    def __init__(self):
+        self.assets = []
+
+    def add(self, arcname, output_arcname, before, after, cached):
+        self.assets.append({"arcname": arcname, "output": output_arcname,
+                            "before": before, "after": after, "cached": cached})
+
+    @property
+    def before(self):
+        return sum(asset["before"] for asset in self.assets)
+
+    @property
+    def after(self):
+        return sum(asset["after"] for asset in self.assets)
+
+    def lines(self):
+        for asset in self.assets:
+            saved = 1 - asset["after"] / asset["before"] if asset["before"] else 0
+            name = asset["arcname"] if asset["output"] == asset["arcname"] else f"{asset['arcname']} -> {asset['output']}"
+            yield f"{name}: {asset['before']:,} -> {asset['after']:,} bytes ({saved:.0%} smaller)"
+        saved = 1 - self.after / self.before if self.before else 0
+        yield f"total: {self.before:,} -> {self.after:,} bytes ({saved:.0%} smaller)"
+
+
+def rewrite_references(value, renames):
+    # Renamed files are referenced by arcname or, for copied images, basename
+    if isinstance(value, dict):
+        return {key: rewrite_references(item, renames) for key, item in value.items()}
+    if isinstance(value, list):
+        return [rewrite_references(item, renames) for item in value]
+    if isinstance(value, str):
+        return renames.get(value, value)
+    return value
+
+
+def optimize_files(project_path, files, workers=None):
+    # Takes packager (arcname, path) pairs and returns (files, renames, report)
+    # with optimized outputs substituted. Outputs are cached in
+    # .xggx/optimized and only regenerated when the source or profile changes.
+    out_dir = os.path.join(project_path, META_DIR, OPTIMIZED_DIR)
+    index_path = os.path.join(out_dir, INDEX_NAME)
+    try:
+        with open(index_path, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+
+    report = OptimizeReport()
+    result, renames, pending = [], {}, []
+    for arcname, path in files:
+        profile = profile_for(arcname)
+        if profile is None:
+            result.append((arcname, path))
+            continue
+        st = os.stat(path)
+        profile_key = json.dumps(dict(profile, version=VERSION), sort_keys=True)
+        known = index.get(arcname)
+        if (known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns
+                and known["profile"] == profile_key and os.path.exists(os.path.join(out_dir, known["output"]))):
+            pending.append((arcname, path, st, profile_key, known["output"], None))
+        else:
+            dest = os.path.join(out_dir, output_arcname(arcname, profile))
+            pending.append((arcname, path, st, profile_key, None, (path, dest, profile)))
+
+    jobs = [job for *_, job in pending if job is not None]
+    if workers == 1 or len(jobs) <= 1:
+        outputs = [optimize_asset(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(optimize_asset, *zip(*jobs)))
+    outputs = iter(outputs)
+
+    for arcname, path, st, profile_key, cached_output, job in pending:
+        if job is None:
+            output = cached_output
+        else:
+            written, _ = next(outputs)
+            output = os.path.relpath(written, out_dir).replace(os.sep, "/")
+            index[arcname] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "profile": profile_key, "output": output}
+        output_path = os.path.join(out_dir, output)
+        result.append((output, output_path))
+        report.add(arcname, output, st.st_size, os.path.getsize(output_path), job is None)
+        if output != arcname:
+            renames[arcname] = output
+            renames[os.path.basename(arcname)] = os.path.basename(output)
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(index_path + ".tmp", "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(index_path + ".tmp", index_path)
+    return result, renames, report
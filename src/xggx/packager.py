@@ -0,0 +1,306 @@
+import copy
+import json
+import os
+import shutil
+import struct
+import time
+import zipfile
+import zlib
+
+from xggx import META_DIR, perf
+from xggx.archive import ensure_extracted
+
+STATE_NAME = "build.json"
+# Already-compressed media gains nothing from deflate, so it is stored as-is
+STORED_EXTENSIONS = {".mp3", ".ogg", ".jpg", ".jpeg", ".png", ".webp", ".gif", ".woff2"}
+# Build outputs and scratch files that must never end up inside the archive
+EXCLUDED_EXTENSIONS = {".zip", ".part", ".tmp"}
+COPY_CHUNK = 1024 * 1024
+# patch_zip leaves replaced entries' bytes behind; past this share of the
+# archive a full build compacts it instead
+MAX_WASTE = 0.5
+
+
+class BuildReport:
+    def __init__(self, zip_path):
+        self.zip_path = zip_path
+        self.reused = 0
+        self.compressed = 0
+        self.bytes_written = 0
+
+
+def collect_files(project_path):
+    # Anything an imported mod still keeps in its archive is needed now
+    ensure_extracted(project_path)
+    files = []
+    for root, dirs, names in os.walk(project_path):
+        dirs[:] = [d for d in dirs if d != META_DIR]
+        for name in names:
+            if os.path.splitext(name)[1].lower() in EXCLUDED_EXTENSIONS:
+                continue
+            file_path = os.path.join(root, name)
+            files.append((os.path.relpath(file_path, project_path).replace(os.sep, "/"), file_path))
+    return files
+
+
+def compress_type_for(arcname):
+    if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def read_state(state_path, zip_path):
+    # The previous build is only trusted if its zip is still the one we wrote
+    try:
+        with open(state_path, "r") as f:
+            state = json.load(f)
+        st = os.stat(zip_path)
+    except (OSError, ValueError):
+        return None
+    if state.get("zip_size") != st.st_size or state.get("zip_mtime_ns") != st.st_mtime_ns:
+        return None
+    return state
+
+
+def load_state(state_path, zip_path):
+    state = read_state(state_path, zip_path)
+    return state.get("entries", {}) if state else {}
+
+
+def save_state(state_path, zip_path, entries, waste=0):
+    # waste counts bytes of entries patch_zip has replaced in place
+    st = os.stat(zip_path)
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"zip_size": st.st_size, "zip_mtime_ns": st.st_mtime_ns, "waste": waste, "entries": entries},
+                  f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def copy_raw_entry(src, info, dst):
+    # Appends an entry's compressed bytes to dst without inflating or
+    # recompressing them. zipfile has no public API for this, so the local
+    # header is rewritten by hand and dst's central directory bookkeeping
+    # (filelist, NameToInfo, start_dir) is updated the way ZipFile.write does.
+    src.fp.seek(info.header_offset)
+    header = src.fp.read(zipfile.sizeFileHeader)
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    src.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+
+    new_info = copy.copy(info)
+    new_info.flag_bits &= ~0x08  # sizes and CRC are known, no data descriptor follows
+    dst.fp.seek(dst.start_dir)
+    new_info.header_offset = dst.fp.tell()
+    dst.fp.write(new_info.FileHeader())
+    remaining = info.compress_size
+    while remaining:
+        chunk = src.fp.read(min(COPY_CHUNK, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated entry {info.filename}")
+        dst.fp.write(chunk)
+        remaining -= len(chunk)
+    dst.filelist.append(new_info)
+    dst.NameToInfo[new_info.filename] = new_info
+    dst.start_dir = dst.fp.tell()
+    dst._didModify = True
+    return info.compress_size
+
+
+def file_stat(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def build_zip(project_path, zip_path, job=None, files=None, data=None, state_name=STATE_NAME, stats=None):
+    # state_name lets several archives of one project each keep their own
+    # incremental state. stats maps absolute paths to (size, mtime_ns) taken
+    # just before the build (by a preflight check); those files are not
+    # stat'ed again.
+    with perf.span("zip.build") as span:
+        report = write_zip(project_path, zip_path, job, files, data, state_name, stats or {})
+        span.wrote(report.bytes_written)
+    return report
+
+
+def write_zip(project_path, zip_path, job, files, data, state_name, stats):
+    # Entries whose source size and mtime match the previous build are copied
+    # across from the old archive still compressed; everything else is written
+    # fresh. The per-entry state lives in <project>/.xggx/build.json.
+    # data maps arcnames to in-memory contents that replace or add to files;
+    # those are reused when their CRC matches the previous build.
+    if files is None:
+        files = collect_files(project_path)
+    data = data or {}
+    files = [(arcname, file_path) for arcname, file_path in files if arcname not in data]
+    state_path = os.path.join(project_path, META_DIR, state_name)
+    previous = load_state(state_path, zip_path)
+    report = BuildReport(zip_path)
+    entries = {}
+
+    # A cancelled or failed build never leaves a truncated archive behind
+    tmp_path = zip_path + ".part"
+    old_zip = None
+    try:
+        if previous:
+            try:
+                old_zip = zipfile.ZipFile(zip_path, "r")
+            except (OSError, zipfile.BadZipFile):
+                previous = {}
+        with zipfile.ZipFile(tmp_path, "w") as zipf:
+            for i, (arcname, file_path) in enumerate(files):
+                if job is not None:
+                    job.progress(i, len(files))
+                size, mtime_ns = stats.get(os.path.abspath(file_path)) or file_stat(file_path)
+                compress_type = compress_type_for(arcname)
+                prev = previous.get(arcname)
+                old_info = old_zip.NameToInfo.get(arcname) if old_zip is not None else None
+                if (prev and old_info is not None and prev["size"] == size
+                        and prev["mtime_ns"] == mtime_ns and prev["crc"] == old_info.CRC
+                        and old_info.compress_type == compress_type):
+                    report.bytes_written += copy_raw_entry(old_zip, old_info, zipf)
+                    report.reused += 1
+                    crc = old_info.CRC
+                else:
+                    zipf.write(file_path, arcname, compress_type)
+                    info = zipf.NameToInfo[arcname]
+                    report.bytes_written += info.compress_size
+                    report.compressed += 1
+                    crc = info.CRC
+                entries[arcname] = {"size": size, "mtime_ns": mtime_ns, "crc": crc}
+            for arcname, content in data.items():
+                crc = zlib.crc32(content)
+                compress_type = compress_type_for(arcname)
+                prev = previous.get(arcname)
+                old_info = old_zip.NameToInfo.get(arcname) if old_zip is not None else None
+                if (prev and old_info is not None and prev["crc"] == crc == old_info.CRC
+                        and prev["size"] == len(content) and old_info.compress_type == compress_type):
+                    report.bytes_written += copy_raw_entry(old_zip, old_info, zipf)
+                    report.reused += 1
+                else:
+                    zipf.writestr(arcname, content, compress_type)
+                    report.bytes_written += zipf.NameToInfo[arcname].compress_size
+                    report.compressed += 1
+                entries[arcname] = {"size": len(content), "mtime_ns": None, "crc": crc}
+        if old_zip is not None:
+            old_zip.close()
+            old_zip = None
+        os.replace(tmp_path, zip_path)
+    finally:
+        if old_zip is not None:
+            old_zip.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    save_state(state_path, zip_path, entries)
+    return report
+
+
+def patch_zip(project_path, zip_path, files=(), removed=(), data=None, state_name=STATE_NAME):
+    # Updates an archive build_zip wrote in place: the given entries are
+    # dropped from the central directory and written again at its end, so the
+    # cost depends on what changed, not on the size of the mod. files and data
+    # are as for build_zip; entries whose source still matches the recorded
+    # size and mtime (or CRC, for data) are left alone. Returns a BuildReport,
+    # or None when the archive cannot be patched (missing, changed since the
+    # last build, or too much replaced data) and build_zip is needed instead.
+    # Unlike build_zip this is not atomic: an interrupted patch leaves an
+    # archive the next build notices is not the one it recorded.
+    state = read_state(os.path.join(project_path, META_DIR, state_name), zip_path)
+    if state is None:
+        return None
+    entries = state.get("entries", {})
+    data = data or {}
+    writes = []
+    for arcname, file_path in files:
+        if arcname in data:
+            continue
+        st = os.stat(file_path)
+        prev = entries.get(arcname)
+        if not prev or prev["size"] != st.st_size or prev["mtime_ns"] != st.st_mtime_ns:
+            writes.append((arcname, file_path, None))
+    for arcname, content in data.items():
+        prev = entries.get(arcname)
+        if not prev or prev["crc"] != zlib.crc32(content) or prev["size"] != len(content):
+            writes.append((arcname, None, content))
+    removed = [arcname for arcname in removed if arcname in entries]
+    report = BuildReport(zip_path)
+    if not writes and not removed:
+        report.reused = len(entries)
+        return report
+
+    with perf.span("zip.patch") as span:
+        try:
+            zipf = zipfile.ZipFile(zip_path, "a")
+        except (OSError, zipfile.BadZipFile):
+            return None
+        with zipf:
+            stale = [zipf.NameToInfo[arcname] for arcname in removed + [w[0] for w in writes]
+                     if arcname in zipf.NameToInfo]
+            waste = state.get("waste", 0) + sum(zipfile.sizeFileHeader + len(info.filename.encode("utf-8"))
+                                                + len(info.extra) + info.compress_size for info in stale)
+            if waste > MAX_WASTE * os.path.getsize(zip_path):
+                return None
+            for info in stale:
+                zipf.filelist.remove(info)
+                del zipf.NameToInfo[info.filename]
+                entries.pop(info.filename, None)
+            # Set even when only removing, so close() writes a new central directory
+            zipf._didModify = True
+            for arcname, file_path, content in writes:
+                if content is None:
+                    st = os.stat(file_path)
+                    zipf.write(file_path, arcname, compress_type_for(arcname))
+                    entries[arcname] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                        "crc": zipf.NameToInfo[arcname].CRC}
+                else:
+                    zipf.writestr(arcname, content, compress_type_for(arcname))
+                    entries[arcname] = {"size": len(content), "mtime_ns": None, "crc": zlib.crc32(content)}
+                report.bytes_written += zipf.NameToInfo[arcname].compress_size
+                report.compressed += 1
+            for arcname in removed:
+                entries.pop(arcname, None)
+        span.wrote(report.bytes_written)
+    report.reused = len(entries) - report.compressed
+    save_state(os.path.join(project_path, META_DIR, state_name), zip_path, entries, waste)
+    return report
+
+
+def write_entry(zipf, arcname, source):
+    # source is a file path, in-memory bytes, or a callable that writes the
+    # entry's contents to the file object it is given. Nothing is buffered
+    # beyond COPY_CHUNK, so this works on unseekable outputs too.
+    compress_type = compress_type_for(arcname)
+    if isinstance(source, bytes):
+        zipf.writestr(arcname, source, compress_type)
+        return zipf.NameToInfo[arcname]
+    if callable(source):
+        info = zipfile.ZipInfo(arcname, time.localtime()[:6])
+        info.external_attr = 0o644 << 16
+    else:
+        info = zipfile.ZipInfo.from_file(source, arcname)
+    info.compress_type = compress_type
+    with zipf.open(info, "w") as dst:
+        if callable(source):
+            source(dst)
+        else:
+            with open(source, "rb") as src:
+                shutil.copyfileobj(src, dst, COPY_CHUNK)
+    return info
+
+
+def stream_zip(fileobj, entries, job=None):
+    # Writes (arcname, source) entries, see write_entry, straight into fileobj,
+    # which may be stdout or a socket. Unlike build_zip there is no reuse of a
+    # previous archive, but memory stays flat whatever the mod size.
+    entries = list(entries)
+    report = BuildReport(getattr(fileobj, "name", None))
+    with perf.span("zip.stream") as span, zipfile.ZipFile(fileobj, "w") as zipf:
+        for i, (arcname, source) in enumerate(entries):
+            if job is not None:
+                job.progress(i, len(entries))
+            info = write_entry(zipf, arcname, source)
+            report.bytes_written += info.compress_size
+            report.compressed += 1
+            span.read(info.file_size)
+        span.wrote(report.bytes_written)
+    return report
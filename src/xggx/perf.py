@@ -0,0 +1,183 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Timing spans around the hot paths. Off unless XGGX_PERF=1 (or enable() is
+# called); a disabled span is a shared no-op object, so instrumented code pays
+# one global lookup per call.
+ENV_VAR = "XGGX_PERF"
+# Oldest events are dropped first, so a long session cannot grow without bound
+MAX_EVENTS = 100000
+
+enabled = os.environ.get(ENV_VAR, "") not in ("", "0")
+
+_lock = threading.Lock()
+_stats = {}
+_events = deque(maxlen=MAX_EVENTS)
+
+
+class Stat:
+    __slots__ = ("count", "total", "max", "bytes_read", "bytes_written")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class Span:
+    __slots__ = ("name", "args", "start", "bytes_read", "bytes_written")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def read(self, count):
+        self.bytes_read += count
+
+    def wrote(self, count):
+        self.bytes_written += count
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        # perf_counter is system-wide on Linux and Windows, so events from
+        # worker processes line up with the parent's in a trace
+        event = (self.name, self.start, time.perf_counter() - self.start, self.bytes_read, self.bytes_written,
+                 self.args, os.getpid(), threading.current_thread().name)
+        record(event)
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def read(self, count):
+        pass
+
+    def wrote(self, count):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def span(name, **args):
+    return Span(name, args) if enabled else NULL_SPAN
+
+
+def timed(name):
+    # Decorator form of span for functions that are timed as a whole
+    def wrap(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return wrap
+
+
+def record(event):
+    name, _, duration, bytes_read, bytes_written = event[:5]
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = Stat()
+        stat.count += 1
+        stat.total += duration
+        stat.max = max(stat.max, duration)
+        stat.bytes_read += bytes_read
+        stat.bytes_written += bytes_written
+        _events.append(event)
+
+
+def events():
+    # Picklable snapshot, e.g. for a worker process to hand back to its parent
+    with _lock:
+        return list(_events)
+
+
+def absorb(batch):
+    for event in batch:
+        record(tuple(event))
+
+
+def stats():
+    # (name, Stat) pairs, slowest total first
+    with _lock:
+        snapshot = []
+        for name, stat in _stats.items():
+            copy = Stat()
+            for slot in Stat.__slots__:
+                setattr(copy, slot, getattr(stat, slot))
+            snapshot.append((name, copy))
+    snapshot.sort(key=lambda item: item[1].total, reverse=True)
+    return snapshot
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _events.clear()
+
+
+def format_stats():
+    lines = [f"{'span':<24}{'calls':>8}{'total ms':>12}{'max ms':>10}{'read':>14}{'written':>14}"]
+    for name, stat in stats():
+        lines.append(f"{name:<24}{stat.count:>8}{stat.total * 1000:>12.1f}{stat.max * 1000:>10.1f}"
+                     f"{stat.bytes_read:>14,}{stat.bytes_written:>14,}")
+    return lines
+
+
+def chrome_trace():
+    # Trace Event Format, loadable in chrome://tracing or Perfetto
+    trace = []
+    threads = {}
+    for name, start, duration, bytes_read, bytes_written, args, pid, thread in events():
+        tid = threads.setdefault((pid, thread), len(threads) + 1)
+        args = dict(args)
+        if bytes_read:
+            args["bytes_read"] = bytes_read
+        if bytes_written:
+            args["bytes_written"] = bytes_written
+        trace.append({"name": name, "cat": "xggx", "ph": "X", "ts": start * 1e6, "dur": duration * 1e6,
+                      "pid": pid, "tid": tid, "args": args})
+    for (pid, thread), tid in threads.items():
+        trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread}})
+    return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(path):
+    # Returns the number of events written
+    trace = chrome_trace()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(trace, f)
+    os.replace(tmp_path, path)
+    return sum(1 for event in trace["traceEvents"] if event["ph"] == "X")
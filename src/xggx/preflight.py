@@ -0,0 +1,251 @@
+import json
+import os
+import stat
+
+from xggx import META_DIR, perf
+from xggx.model import IMAGE_FIELDS, THEME_DEFAULTS, THEME_RANGES
+from xggx.sniff import EXTENSIONS, KINDS, sniff_file
+
+# Checks a manifest before it is packaged: every file the payload references
+# is resolved, sniffed and measured in one pass, and all problems are
+# reported together. Sniffing results are kept in <project>/.xggx/preflight.json
+# and reused while a file's size and mtime are unchanged.
+INDEX_NAME = "preflight.json"
+
+# Payload key -> (project folder the editor keeps those files in, {field: kind}).
+# "sounds.*" matches every field under sounds; the editor writes dotted keys
+# like "dark.image" while Opera GX manifests nest them, and both are flattened
+# to the same names.
+REFERENCES = {
+    "app_icon": ("app_icon", {"path": "image"}),
+    "wallpaper": ("wallpaper", {"dark.image": "image", "light.image": "image"}),
+    "background_music": ("music", {"tracks": "audio"}),
+    "browser_sounds": ("sounds", {"sounds.*": "audio"}),
+    "keyboard_sounds": ("sounds", {"sounds.*": "audio"}),
+    "fonts": ("font", {"variants.path": "font"}),
+    "image_overrides": ("icons", {"images.*": "image"}),
+    "mobile_image_overrides": ("mobile_logo", {"images.*": "image"}),
+    "page_styles": ("css", {"css": "text"}),
+    "shaders": ("shaders", {"path": "text"}),
+    "splash_screen": ("splash", {"path": "image"}),
+    "stickers": ("stickers", {"images": "image", "preview": "image"}),
+}
+# Packaged from wherever they are when optimizing (see xggx.styles)
+STYLE_KEYS = ("page_styles", "shaders")
+
+
+class PreflightError(ValueError):
+    pass
+
+
+class FileInfo:
+    __slots__ = ("path", "size", "mtime_ns", "format", "dimensions")
+
+    def __init__(self, path, size, mtime_ns, fmt, dimensions):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.format = fmt
+        self.dimensions = dimensions
+
+    @property
+    def kind(self):
+        return KINDS.get(self.format)
+
+
+class Problem:
+    __slots__ = ("level", "where", "message")
+
+    def __init__(self, level, where, message):
+        self.level = level
+        self.where = where
+        self.message = message
+
+    def __str__(self):
+        return f"{self.level}: {self.where}: {self.message}"
+
+
+class PreflightReport:
+    def __init__(self):
+        self.problems = []
+        # Absolute path -> FileInfo for every referenced file that exists
+        self.files = {}
+        self.references = 0
+
+    @property
+    def errors(self):
+        return [problem for problem in self.problems if problem.level == "error"]
+
+    @property
+    def warnings(self):
+        return [problem for problem in self.problems if problem.level == "warning"]
+
+    def add(self, level, where, message):
+        self.problems.append(Problem(level, where, message))
+
+    def stats(self):
+        # For the packager, which then does not stat these files again
+        return {path: (info.size, info.mtime_ns) for path, info in self.files.items()}
+
+    def lines(self):
+        for problem in self.problems:
+            yield str(problem)
+        yield (f"{self.references} references to {len(self.files)} files checked: "
+               f"{len(self.errors)} errors, {len(self.warnings)} warnings")
+
+
+class FileIndex:
+    def __init__(self, project_path):
+        self.index_path = os.path.join(project_path, META_DIR, INDEX_NAME)
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.index_path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def info(self, path, st):
+        known = self.entries.get(path)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            fmt, dimensions = known[2], known[3]
+        else:
+            try:
+                fmt, dimensions = sniff_file(path)
+            except OSError:
+                fmt, dimensions = None, None
+            self.entries[path] = [st.st_size, st.st_mtime_ns, fmt, dimensions]
+            self.dirty = True
+        return FileInfo(path, st.st_size, st.st_mtime_ns, fmt, tuple(dimensions) if dimensions else None)
+
+    def retain(self, paths):
+        # Forgets files no longer referenced
+        for path in set(self.entries) - set(paths):
+            del self.entries[path]
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+        except OSError:
+            # Read-only projects are still checked, just not cached
+            pass
+
+
+def iter_fields(value, prefix=""):
+    # (dotted field name, string) for every string in a payload item
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from iter_fields(child, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, list):
+        for child in value:
+            yield from iter_fields(child, prefix)
+    elif isinstance(value, str):
+        yield prefix, value
+
+
+def reference_kind(fields, field):
+    kind = fields.get(field)
+    if kind is None and "." in field:
+        kind = fields.get(field.rsplit(".", 1)[0] + ".*")
+    return kind
+
+
+def resolve(project_path, folder, value):
+    # (path, stat result) of the first candidate that is a file, or
+    # (first candidate, None). Relative references are looked up in the
+    # project and in the folder the editor copies that kind of file to.
+    candidates = [value] if os.path.isabs(value) else [os.path.join(project_path, value)]
+    candidates.append(os.path.join(project_path, folder, os.path.basename(value)))
+    for candidate in candidates:
+        try:
+            st = os.stat(candidate)
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode):
+            return os.path.abspath(candidate), st
+    return candidates[0], None
+
+
+def check_theme(report, items):
+    theme = items[0] if items and isinstance(items[0], dict) else {}
+    for name in THEME_DEFAULTS:
+        mode, color = name.split(".")
+        values = theme.get(mode)
+        values = values.get(color) if isinstance(values, dict) else None
+        for channel, limit in THEME_RANGES.items():
+            value = values.get(channel) if isinstance(values, dict) else None
+            if value is None:
+                continue
+            where = f"theme {name}.{channel}"
+            if not isinstance(value, int) or isinstance(value, bool):
+                report.add("error", where, f"{value!r} is not a whole number")
+            elif not 0 <= value <= limit:
+                report.add("error", where, f"{value} is not between 0 and {limit}")
+
+
+def check_reference(report, index, project_path, key, folder, field, kind, value):
+    where = f"{key} {field}"
+    path, st = resolve(project_path, folder, value)
+    if st is None:
+        report.add("error", where, f"{value} not found")
+        return
+    info = report.files.get(path)
+    if info is None:
+        info = report.files[path] = index.info(path, st)
+    if info.size == 0:
+        report.add("error", where, f"{value} is empty")
+        return
+    if info.kind != kind:
+        found = f"a {info.format} file" if info.format else "not a recognized file type"
+        report.add("error", where, f"{value} is {found}, expected {kind}")
+        return
+    expected = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if expected and expected != info.format:
+        report.add("warning", where, f"{value} is a {info.format} file despite its extension")
+    if kind == "image" and info.dimensions is None:
+        report.add("warning", where, f"could not read the size of {value}")
+    project_root = os.path.abspath(project_path) + os.sep
+    if field not in IMAGE_FIELDS and not path.startswith(project_root):
+        # Only wallpapers are copied into the project when it is saved, and
+        # styles and shaders when they are minified
+        if key in STYLE_KEYS:
+            report.add("warning", where, f"{value} is outside the project folder and is only packaged when optimizing")
+        else:
+            report.add("warning", where, f"{value} is outside the project folder and will not be packaged")
+
+
+def preflight(project_path, manifest, index=None):
+    # Returns a PreflightReport; never raises for problems in the manifest
+    with perf.span("preflight"):
+        index = index or FileIndex(project_path)
+        report = PreflightReport()
+        mod = manifest.get("mod", {})
+        payload = mod.get("payload", {}) if isinstance(mod, dict) else None
+        if not isinstance(payload, dict):
+            report.add("error", "manifest", "mod.payload is not an object")
+            payload = {}
+        for key, items in payload.items():
+            if not isinstance(items, list):
+                continue
+            if key == "theme":
+                check_theme(report, items)
+                continue
+            folder, fields = REFERENCES.get(key, (key, {}))
+            for item in items:
+                for field, value in iter_fields(item):
+                    kind = reference_kind(fields, field)
+                    if kind is None or not value.strip():
+                        continue
+                    report.references += 1
+                    check_reference(report, index, project_path, key, folder, field, kind, value.strip())
+        index.retain(report.files)
+        index.save()
+    return report
@@ -0,0 +1,75 @@
+import json
+import os
+import re
+import uuid
+
+from xggx import META_DIR
+
+# Project folders are named after a stable id. The display name lives only in
+# the manifest, so renaming a mod never moves its folder.
+FOLDER_PREFIX = "mod_"
+FOLDER_PATTERN = re.compile(r"^mod_[0-9a-f]{12}$")
+LEGACY_SUFFIX = "_Mod"
+PROJECT_FILE = "project.json"
+
+
+def new_project_id():
+    return uuid.uuid4().hex[:12]
+
+
+def project_folder_name(stable_id):
+    return f"{FOLDER_PREFIX}{stable_id}"
+
+
+def project_id(project_path):
+    folder = os.path.basename(os.path.normpath(project_path))
+    return folder[len(FOLDER_PREFIX):] if is_stable_folder(folder) else folder
+
+
+def new_project_path(projects_dir):
+    while True:
+        path = os.path.join(projects_dir, project_folder_name(new_project_id()))
+        if not os.path.exists(path):
+            return path
+
+
+def is_stable_folder(folder):
+    return bool(FOLDER_PATTERN.match(folder))
+
+
+def zip_file_name(mod_name):
+    # Keeps the <Name>_Mod.zip naming users know from the old folder names
+    return f"{(mod_name.strip() or 'My GX Mod').replace(' ', '_')}{LEGACY_SUFFIX}.zip"
+
+
+def write_project_file(project_path, data):
+    meta_dir = os.path.join(project_path, META_DIR)
+    os.makedirs(meta_dir, exist_ok=True)
+    tmp_path = os.path.join(meta_dir, PROJECT_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, os.path.join(meta_dir, PROJECT_FILE))
+
+
+def migrate_legacy_folders(projects_dir):
+    # Renames old <Name>_Mod project folders to id-based ones, once. Each move
+    # is a single os.rename within projects_dir, so it is atomic; a folder that
+    # cannot be renamed right now (e.g. open elsewhere) is retried next time.
+    migrated = {}
+    try:
+        it = os.scandir(projects_dir)
+    except OSError:
+        return migrated
+    with it:
+        candidates = [entry for entry in it
+                      if entry.is_dir() and not entry.name.startswith(".") and not is_stable_folder(entry.name)
+                      and os.path.isfile(os.path.join(entry.path, "manifest.json"))]
+    for entry in candidates:
+        new_path = new_project_path(projects_dir)
+        try:
+            os.rename(entry.path, new_path)
+        except OSError:
+            continue
+        write_project_file(new_path, {"id": project_id(new_path), "legacy_folder": entry.name})
+        migrated[entry.name] = os.path.basename(new_path)
+    return migrated
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import shutil
+import zipfile
+
+from xggx import META_DIR, perf
+from xggx.build import load_project_manifest, package_project, process_assets
+from xggx.model import DEFAULT_VERSION
+from xggx.packager import COPY_CHUNK, copy_raw_entry
+from xggx.projects import zip_file_name
+from xggx.storage import atomic_write, write_manifest
+
+# Releases of one mod live in their own folder: a full zip per version, delta
+# packages from recent versions to each new one, and releases.json listing
+# them with the content hash of every file. Deltas hold only the entries that
+# changed, copied from the release still compressed, plus DELTA_MANIFEST
+# describing the result; apply_delta turns an old zip and a delta into the
+# new release.
+INDEX_NAME = "releases.json"
+DELTA_MANIFEST = ".xggx-delta.json"
+# Releases are built here first so unchanged entries are reused between them
+BUILD_ZIP = "release.zip"
+BUILD_STATE = "release_build.json"
+# Deltas are made from this many previous releases
+DELTA_HISTORY = 3
+# Deltas larger than this share of the full package are not worth offering
+MAX_DELTA_RATIO = 0.8
+BUMP_PARTS = ("major", "minor", "patch")
+
+
+class ReleaseReport:
+    def __init__(self, version, zip_path, size):
+        self.version = version
+        self.zip_path = zip_path
+        self.size = size
+        # (from version, delta path, size, changed entries, removed entries)
+        self.deltas = []
+
+    def lines(self):
+        yield f"released {self.version} ({self.size:,} bytes) -> {self.zip_path}"
+        for from_version, path, size, changed, removed in self.deltas:
+            yield (f"delta from {from_version}: {size:,} bytes, {changed} changed / {removed} removed "
+                   f"({1 - size / self.size:.0%} smaller) -> {path}")
+
+
+def parse_version(text):
+    # Extension versions: one to four dot-separated numbers
+    parts = str(text).strip().split(".")
+    if not 1 <= len(parts) <= 4 or not all(part.isdigit() for part in parts):
+        raise ValueError(f"Invalid version {text!r}")
+    return tuple(int(part) for part in parts)
+
+
+def bump_version(version, part="patch"):
+    # "1.0" -> patch "1.0.1", minor "1.1", major "2.0"
+    index = BUMP_PARTS.index(part)
+    parts = list(parse_version(version))
+    parts += [0] * (index + 1 - len(parts))
+    # Lower parts restart from zero: major "1.4.2" -> "2.0"
+    parts = parts[:index] + [parts[index] + 1] + [0] * (len(parts) - index - 1)
+    parts = parts[:max(index + 1, 2)]
+    return ".".join(str(part) for part in parts)
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def zip_hashes(zip_path):
+    # {entry name: sha256 of its uncompressed content}, in archive order
+    hashes = {}
+    with perf.span("release.hash") as span, zipfile.ZipFile(zip_path, "r") as zipf:
+        for info in zipf.infolist():
+            if info.is_dir():
+                continue
+            digest = hashlib.sha256()
+            with zipf.open(info) as f:
+                for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+                    digest.update(chunk)
+            hashes[info.filename] = digest.hexdigest()
+            span.read(info.file_size)
+    return hashes
+
+
+def listing_digest(hashes):
+    # One hash over a whole release's file hashes
+    digest = hashlib.sha256()
+    for name in sorted(hashes):
+        digest.update(f"{name}\0{hashes[name]}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def content_key(zip_path, hashes):
+    # Identifies a release's content apart from its version, so a release
+    # without changes can be skipped
+    with zipfile.ZipFile(zip_path, "r") as zipf:
+        manifest = json.loads(zipf.read("manifest.json").decode("utf-8-sig"))
+    manifest.pop("version", None)
+    others = {name: digest for name, digest in hashes.items() if name != "manifest.json"}
+    return hashlib.sha256((json.dumps(manifest, sort_keys=True) + listing_digest(others)).encode("utf-8")).hexdigest()
+
+
+def make_delta(old_files, new_zip, new_files, delta_path, from_version, to_version):
+    # Writes the entries of new_zip whose hash differs from old_files.
+    # Returns (changed entries, removed entries).
+    if DELTA_MANIFEST in new_files:
+        raise ValueError(f"{DELTA_MANIFEST} is reserved for delta packages")
+    changed = [name for name, digest in new_files.items() if old_files.get(name) != digest]
+    removed = sorted(set(old_files) - set(new_files))
+    tmp_path = delta_path + ".part"
+    try:
+        with perf.span("release.delta") as span:
+            with zipfile.ZipFile(new_zip, "r") as src, zipfile.ZipFile(tmp_path, "w") as dst:
+                for name in changed:
+                    copy_raw_entry(src, src.getinfo(name), dst)
+                # Entries not in the delta come from the old release; the
+                # digest lets apply_delta check the result
+                info = {"from": from_version, "to": to_version, "entries": list(new_files),
+                        "removed": removed, "digest": listing_digest(new_files)}
+                dst.writestr(DELTA_MANIFEST, json.dumps(info), zipfile.ZIP_DEFLATED)
+            span.wrote(os.path.getsize(tmp_path))
+        os.replace(tmp_path, delta_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(changed), len(removed)
+
+
+def apply_delta(old_zip, delta_zip, out_zip):
+    # Rebuilds a release from the previous one and a delta. Every entry is
+    # copied still compressed and the result is checked against the delta's
+    # digest; raises ValueError when old_zip lacks entries or the result does
+    # not match, e.g. because old_zip is not the release the delta is for.
+    tmp_path = out_zip + ".part"
+    try:
+        with zipfile.ZipFile(delta_zip, "r") as delta, zipfile.ZipFile(old_zip, "r") as old:
+            info = json.loads(delta.read(DELTA_MANIFEST).decode("utf-8"))
+            with zipfile.ZipFile(tmp_path, "w") as out:
+                for name in info["entries"]:
+                    source = delta if name in delta.NameToInfo else old
+                    if name not in source.NameToInfo:
+                        raise ValueError(f"{os.path.basename(old_zip)} has no {name} for version {info['from']}")
+                    copy_raw_entry(source, source.getinfo(name), out)
+        if listing_digest(zip_hashes(tmp_path)) != info["digest"]:
+            raise ValueError(f"{os.path.basename(old_zip)} is not version {info['from']}")
+        os.replace(tmp_path, out_zip)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return info["to"]
+
+
+def load_index(releases_dir):
+    try:
+        with open(os.path.join(releases_dir, INDEX_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"name": "", "releases": []}
+
+
+def save_index(releases_dir, index):
+    atomic_write(os.path.join(releases_dir, INDEX_NAME), json.dumps(index, indent=2).encode("utf-8"))
+
+
+def release_project(project_path, releases_dir, bump="patch", optimize=False, update_url=None,
+                    deltas=DELTA_HISTORY):
+    # Builds the next release into releases_dir and writes its version back
+    # to the project's manifest.json. The first release keeps the manifest's
+    # version; later ones bump the newest of it and the last release's.
+    # Returns a ReleaseReport, or None when nothing changed since the last
+    # release.
+    with perf.span("release"):
+        os.makedirs(releases_dir, exist_ok=True)
+        index = load_index(releases_dir)
+        previous = index["releases"]
+        manifest = load_project_manifest(project_path)
+        version = manifest.get("version") or DEFAULT_VERSION
+        if previous:
+            version = bump_version(max(version, previous[-1]["version"], key=parse_version), bump)
+        manifest["version"] = version
+        if update_url:
+            manifest["update_url"] = update_url
+
+        process_assets(project_path, manifest)
+        build_path = os.path.join(project_path, META_DIR, BUILD_ZIP)
+        os.makedirs(os.path.dirname(build_path), exist_ok=True)
+        package_project(project_path, build_path, manifest, optimize, manifest_changed=True, state_name=BUILD_STATE)
+        files = zip_hashes(build_path)
+        content = content_key(build_path, files)
+        if previous and previous[-1]["content"] == content:
+            return None
+
+        stem = os.path.splitext(zip_file_name(manifest.get("name", "")))[0]
+        zip_name = f"{stem}-{version}.zip"
+        zip_path = os.path.join(releases_dir, zip_name)
+        shutil.copyfile(build_path, zip_path + ".part")
+        os.replace(zip_path + ".part", zip_path)
+        size = os.path.getsize(zip_path)
+        report = ReleaseReport(version, zip_path, size)
+        entry = {"version": version, "file": zip_name, "size": size, "sha256": sha256_file(zip_path),
+                 "content": content, "files": files, "deltas": {}}
+
+        for old in previous[-deltas:] if deltas > 0 else []:
+            delta_name = f"{stem}-{old['version']}-to-{version}.delta.zip"
+            delta_path = os.path.join(releases_dir, delta_name)
+            changed, removed = make_delta(old["files"], zip_path, files, delta_path, old["version"], version)
+            delta_size = os.path.getsize(delta_path)
+            if delta_size > MAX_DELTA_RATIO * size:
+                os.remove(delta_path)
+                continue
+            entry["deltas"][old["version"]] = {"file": delta_name, "size": delta_size,
+                                               "sha256": sha256_file(delta_path)}
+            report.deltas.append((old["version"], delta_path, delta_size, changed, removed))
+
+        index["name"] = manifest.get("name", "")
+        previous.append(entry)
+        save_index(releases_dir, index)
+
+        # Only the version and update_url change in the project; the manifest
+        # built above also has its image references rewritten
+        project_manifest = load_project_manifest(project_path)
+        project_manifest["version"] = version
+        if update_url:
+            project_manifest["update_url"] = update_url
+        write_manifest(project_path, json.dumps(project_manifest, indent=2))
+    return report
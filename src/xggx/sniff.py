@@ -0,0 +1,121 @@
+import os
+import struct
+
+# File types from magic bytes and image sizes from headers, without Pillow.
+# Reading a few dozen bytes per file keeps checks over thousands of stickers
+# and sounds cheap; nothing here decodes pixel or audio data.
+HEAD_BYTES = 64
+# JPEG keeps its size in a frame header that can follow large EXIF blocks
+JPEG_SCAN_LIMIT = 1024 * 1024
+
+KINDS = {
+    "png": "image", "jpeg": "image", "gif": "image", "webp": "image", "bmp": "image",
+    "mp3": "audio", "ogg": "audio", "wav": "audio", "flac": "audio", "m4a": "audio",
+    "ttf": "font", "otf": "font", "woff": "font", "woff2": "font",
+    "text": "text",
+}
+EXTENSIONS = {
+    ".png": "png", ".jpg": "jpeg", ".jpeg": "jpeg", ".gif": "gif", ".webp": "webp", ".bmp": "bmp",
+    ".mp3": "mp3", ".ogg": "ogg", ".wav": "wav", ".flac": "flac", ".m4a": "m4a",
+    ".ttf": "ttf", ".otf": "otf", ".woff": "woff", ".woff2": "woff2",
+    ".css": "text", ".txt": "text", ".glsl": "text", ".frag": "text",
+}
+# SOF markers; DHT (C4), JPG (C8) and DAC (CC) share the range but carry no size
+JPEG_FRAME_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def sniff_format(head):
+    # Format name from a file's first bytes, or None when unrecognized
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:2] == b"BM" and len(head) >= 26:
+        return "bmp"
+    if head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[4:8] == b"ftyp":
+        return "m4a"
+    if head[:4] in (b"\x00\x01\x00\x00", b"true"):
+        return "ttf"
+    if head[:4] == b"OTTO":
+        return "otf"
+    if head[:4] == b"wOFF":
+        return "woff"
+    if head[:4] == b"wOF2":
+        return "woff2"
+    if head and b"\0" not in head:
+        try:
+            # A multi-byte character may be cut off at the end of head
+            head.decode("utf-8")
+            return "text"
+        except UnicodeDecodeError as e:
+            if e.start >= len(head) - 3:
+                return "text"
+    return None
+
+
+def header_dimensions(f, fmt, head):
+    # (width, height) read from the header of an open file, or None
+    try:
+        if fmt == "png" and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if fmt == "gif":
+            return struct.unpack("<HH", head[6:10])
+        if fmt == "bmp":
+            width, height = struct.unpack("<ii", head[18:26])
+            return width, abs(height)
+        if fmt == "webp":
+            chunk = head[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                bits = int.from_bytes(head[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+        if fmt == "jpeg":
+            return jpeg_dimensions(f)
+    except struct.error:
+        pass
+    return None
+
+
+def jpeg_dimensions(f):
+    f.seek(2)
+    while f.tell() < JPEG_SCAN_LIMIT:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] == 0xFF:
+            # Fill byte before the actual marker
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue
+        length = struct.unpack(">H", f.read(2))[0]
+        if marker[1] in JPEG_FRAME_MARKERS:
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+    return None
+
+
+def sniff_file(path):
+    # (format, dimensions) of a file; dimensions only for images
+    with open(path, "rb") as f:
+        head = f.read(HEAD_BYTES)
+        fmt = sniff_format(head)
+        dimensions = header_dimensions(f, fmt, head) if KINDS.get(fmt) == "image" else None
+    return fmt, dimensions
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import stat
+import tempfile
+
+from xggx import META_DIR, perf
+
+MANIFEST_NAME = "manifest.json"
+JOURNAL_DIR = "journal"
+JOURNAL_DEPTH = int(os.environ.get("XGGX_JOURNAL_DEPTH", "10"))
+
+# manifest path -> (sha1, size, mtime_ns) of the bytes this process last wrote,
+# so an unchanged save is skipped without even reading the file back
+_written = {}
+
+
+def read_umask():
+    # os.umask can only be read by setting it, which is not thread-safe, so
+    # this runs once at import
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+UMASK = read_umask()
+
+
+def match_mode(tmp_path, path):
+    # Temporary files from mkstemp are private (0600), and os.replace keeps
+    # that. Gives tmp_path the mode of the file it is about to replace, or
+    # the one open() would create a new file with, so projects on a shared
+    # folder stay readable by others.
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        mode = 0o666 & ~UMASK
+    os.chmod(tmp_path, mode)
+
+
+def fsync_dir(path):
+    # Makes the rename itself durable; not supported on Windows
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data):
+    # Readers see either the old file or the new one, never a truncated mix
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        match_mode(tmp_path, path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_dir(directory)
+
+
+def journal_dir(project_path):
+    return os.path.join(project_path, META_DIR, JOURNAL_DIR)
+
+
+def journal_versions(project_path):
+    # Newest first
+    try:
+        names = [name for name in os.listdir(journal_dir(project_path)) if name.endswith(".json")]
+    except OSError:
+        return []
+    return [os.path.join(journal_dir(project_path), name) for name in sorted(names, reverse=True)]
+
+
+def append_journal(project_path, data, digest, depth=JOURNAL_DEPTH):
+    directory = journal_dir(project_path)
+    os.makedirs(directory, exist_ok=True)
+    versions = journal_versions(project_path)
+    sequence = int(os.path.basename(versions[0]).split("-")[0]) + 1 if versions else 1
+    atomic_write(os.path.join(directory, f"{sequence:08d}-{digest[:12]}.json"), data)
+    for old in versions[max(depth - 1, 0):]:
+        os.remove(old)
+
+
+def is_unchanged(path, data, digest):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    known = _written.get(path)
+    if known is not None and known == (digest, st.st_size, st.st_mtime_ns):
+        return True
+    if st.st_size != len(data):
+        return False
+    with open(path, "rb") as f:
+        return f.read() == data
+
+
+def write_manifest(project_path, text, depth=JOURNAL_DEPTH):
+    # Returns False when the manifest already had exactly this content.
+    # The new version goes to the journal before it replaces manifest.json,
+    # so a crash at any point leaves a readable copy behind.
+    with perf.span("manifest.write") as span:
+        data = text.encode("utf-8")
+        digest = hashlib.sha1(data).hexdigest()
+        path = os.path.join(project_path, MANIFEST_NAME)
+        if is_unchanged(path, data, digest):
+            return False
+        if depth > 0:
+            append_journal(project_path, data, digest, depth)
+            span.wrote(len(data))
+        atomic_write(path, data)
+        span.wrote(len(data))
+        st = os.stat(path)
+        _written[path] = (digest, st.st_size, st.st_mtime_ns)
+        return True
+
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_manifest(project_path):
+    # Returns (manifest, recovered_from). recovered_from is None for a healthy
+    # manifest.json, otherwise the journal file that was used instead.
+    path = os.path.join(project_path, MANIFEST_NAME)
+    with perf.span("manifest.read") as span:
+        try:
+            manifest = load_json(path)
+            span.read(os.path.getsize(path))
+            return manifest, None
+        except (OSError, ValueError) as e:
+            error = e
+        for version in journal_versions(project_path):
+            try:
+                manifest = load_json(version)
+                span.read(os.path.getsize(version))
+                return manifest, version
+            except (OSError, ValueError):
+                continue
+        raise error
+
+
+def recover_manifest(project_path):
+    # Rewrites a damaged manifest.json from the newest readable journal entry
+    manifest, recovered_from = read_manifest(project_path)
+    if recovered_from is not None:
+        with open(recovered_from, "rb") as f:
+            atomic_write(os.path.join(project_path, MANIFEST_NAME), f.read())
+    return manifest, recovered_from
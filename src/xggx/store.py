@@ -0,0 +1,265 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from xggx import META_DIR, perf
+from xggx.assets import file_digest
+from xggx.storage import match_mode
+
+# Content-addressed blobs shared by every project in projects_dir. Project
+# files point at a blob through a reflink (copy-on-write clone) or a hardlink
+# where the filesystem allows it, and are plain copies otherwise.
+STORE_DIR = ".xggx_store"
+REFS_NAME = "refs.json"
+# auto tries reflink, then hardlink, then copy
+LINK_MODE = os.environ.get("XGGX_ASSET_LINK", "auto")
+ENABLED = os.environ.get("XGGX_ASSET_STORE", "1") != "0"
+# Smaller files are not worth a blob of their own when deduplicating
+DEDUPE_MIN_BYTES = 64 * 1024
+FICLONE = 0x40049409
+
+
+def reflink(source, dest):
+    # Linux only (Btrfs, XFS, bcachefs); raises OSError where unsupported
+    import fcntl
+    with open(source, "rb") as src, open(dest, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def link_modes():
+    if LINK_MODE != "auto":
+        return [LINK_MODE]
+    modes = ["reflink"] if hasattr(os, "uname") and os.uname().sysname == "Linux" else []
+    return modes + ["hardlink", "copy"]
+
+
+class StoreUsage:
+    def __init__(self):
+        self.blobs = 0
+        self.blob_bytes = 0
+        self.projects = {}
+        self.apparent_bytes = 0
+        self.actual_bytes = 0
+
+    def lines(self):
+        for folder, (apparent, shared) in sorted(self.projects.items()):
+            yield f"{folder}: {apparent:,} bytes, {shared:,} of them shared"
+        yield f"store: {self.blobs} blobs, {self.blob_bytes:,} bytes"
+        saved = self.apparent_bytes - self.actual_bytes
+        yield f"total: {self.apparent_bytes:,} bytes in projects, {self.actual_bytes:,} on disk ({saved:,} saved)"
+
+
+class AssetStore:
+    def __init__(self, projects_dir):
+        self.projects_dir = projects_dir
+        self.path = os.path.join(projects_dir, STORE_DIR)
+        self.refs_path = os.path.join(self.path, REFS_NAME)
+        self.lock = threading.RLock()
+        self.refs = None
+        self.dirty = False
+        # First mode that worked; reflink support is a property of the filesystem
+        self.mode = None
+
+    @classmethod
+    def for_project(cls, project_path):
+        # The store of the projects folder containing project_path, if it has one
+        projects_dir = os.path.dirname(os.path.abspath(project_path))
+        if ENABLED and os.path.isdir(os.path.join(projects_dir, STORE_DIR)):
+            return cls(projects_dir)
+        return None
+
+    def blob_path(self, digest):
+        return os.path.join(self.path, digest[:2], digest)
+
+    def load_refs(self):
+        if self.refs is None:
+            try:
+                with open(self.refs_path, "r") as f:
+                    self.refs = json.load(f)
+            except (OSError, ValueError):
+                self.refs = {}
+        return self.refs
+
+    def add(self, path, digest=None):
+        # Copies path into the store unless its content is already there.
+        # Never links to the source itself: the user may edit it later.
+        digest = digest or file_digest(path)
+        blob = self.blob_path(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob), suffix=".tmp")
+            os.close(fd)
+            try:
+                shutil.copyfile(path, tmp_path)
+                if os.name == "posix":
+                    # Hardlinked project files share these permissions, which
+                    # stops anything editing a blob in place
+                    os.chmod(tmp_path, 0o444)
+                os.replace(tmp_path, blob)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return digest
+
+    def place(self, blob, tmp_path):
+        # The mode that worked last time goes first; a hardlink can still fail
+        # for one file (e.g. its link count limit) and fall back to a copy
+        modes = link_modes()
+        if self.mode in modes:
+            modes.remove(self.mode)
+            modes.insert(0, self.mode)
+        for mode in modes:
+            try:
+                if mode == "reflink":
+                    reflink(blob, tmp_path)
+                elif mode == "hardlink":
+                    os.remove(tmp_path)
+                    os.link(blob, tmp_path)
+                else:
+                    shutil.copyfile(blob, tmp_path)
+            except OSError:
+                continue
+            self.mode = mode
+            return mode
+        raise OSError(f"Could not place {blob}")
+
+    def materialize(self, digest, dest):
+        # Makes dest a reference to the blob, replacing whatever was there
+        # atomically. Returns the mode used.
+        with perf.span("store.materialize") as span:
+            blob = self.blob_path(digest)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+            os.close(fd)
+            try:
+                mode = self.place(blob, tmp_path)
+                if mode != "hardlink":
+                    # A hardlink shares the blob's read-only mode
+                    match_mode(tmp_path, dest)
+                os.replace(tmp_path, dest)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            st = os.stat(dest)
+            if mode == "copy":
+                span.wrote(st.st_size)
+            with self.lock:
+                self.load_refs().setdefault(digest, {})[self.ref_name(dest)] = [st.st_size, st.st_mtime_ns]
+                self.dirty = True
+            return mode
+
+    def adopt(self, path, digest=None):
+        # Moves an existing project file's content into the store and leaves
+        # a reference in its place
+        digest = self.add(path, digest)
+        self.materialize(digest, path)
+        return digest
+
+    def ref_name(self, path):
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.projects_dir)).replace(os.sep, "/")
+
+    def is_live(self, rel_path, recorded):
+        try:
+            st = os.stat(os.path.join(self.projects_dir, rel_path))
+        except OSError:
+            return False
+        return [st.st_size, st.st_mtime_ns] == recorded
+
+    def gc(self):
+        # Drops references whose file was deleted or replaced, then every blob
+        # nothing references. Returns (blobs removed, bytes freed). Project
+        # files never depend on a blob existing (a hardlink keeps the data
+        # alive, reflinks and copies are independent), so even a lost
+        # refs.json cannot damage a project.
+        with self.lock:
+            refs = self.load_refs()
+            for digest in list(refs):
+                live = {rel: recorded for rel, recorded in refs[digest].items() if self.is_live(rel, recorded)}
+                if live:
+                    refs[digest] = live
+                else:
+                    del refs[digest]
+            self.dirty = True
+            removed, freed = 0, 0
+            for digest, blob in self.blobs():
+                if digest in refs:
+                    continue
+                size = os.path.getsize(blob)
+                if os.name == "posix":
+                    os.chmod(blob, 0o644)
+                os.remove(blob)
+                removed += 1
+                freed += size
+            self.save()
+            return removed, freed
+
+    def blobs(self):
+        try:
+            shards = os.listdir(self.path)
+        except OSError:
+            return
+        for shard in shards:
+            shard_path = os.path.join(self.path, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                if not name.endswith(".tmp"):
+                    yield name, os.path.join(shard_path, name)
+
+    def dedupe(self, project_path, min_bytes=DEDUPE_MIN_BYTES):
+        # Moves a project's existing large files into the store. Returns the
+        # number of files now referencing a blob.
+        count = 0
+        for root, dirs, names in os.walk(project_path):
+            dirs[:] = [d for d in dirs if d != META_DIR]
+            for name in names:
+                path = os.path.join(root, name)
+                if name.endswith((".tmp", ".part", ".zip")) or os.path.getsize(path) < min_bytes:
+                    continue
+                self.adopt(path)
+                count += 1
+        self.save()
+        return count
+
+    def usage(self):
+        # Apparent size counts every project file; actual size counts each
+        # inode once, so hardlinked files show up as savings (reflinked ones
+        # share blocks the filesystem does not report per file)
+        report = StoreUsage()
+        seen = set()
+        for _, blob in self.blobs():
+            st = os.stat(blob)
+            seen.add((st.st_dev, st.st_ino))
+            report.blobs += 1
+            report.blob_bytes += st.st_size
+        report.actual_bytes = report.blob_bytes
+        with os.scandir(self.projects_dir) as it:
+            folders = [entry for entry in it if entry.is_dir() and not entry.name.startswith(".")]
+        for entry in folders:
+            apparent = shared = 0
+            for root, _, names in os.walk(entry.path):
+                for name in names:
+                    st = os.stat(os.path.join(root, name))
+                    apparent += st.st_size
+                    key = (st.st_dev, st.st_ino)
+                    if key in seen:
+                        shared += st.st_size
+                    else:
+                        seen.add(key)
+                        report.actual_bytes += st.st_size
+            report.projects[entry.name] = (apparent, shared)
+            report.apparent_bytes += apparent
+        return report
+
+    def save(self):
+        with self.lock:
+            if not self.dirty or self.refs is None:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            tmp_path = self.refs_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.refs, f, indent=2)
+            os.replace(tmp_path, self.refs_path)
+            self.dirty = False
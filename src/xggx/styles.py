@@ -0,0 +1,288 @@
+import copy
+import hashlib
+import itertools
+import json
+import os
+import re
+
+from xggx import META_DIR, perf
+from xggx.preflight import REFERENCES, resolve
+
+# Build stage for page_styles and shaders: CSS is minified and rules repeated
+# across the styles injected into the same pages are dropped; shader sources
+# lose comments and indentation. Outputs are stored in .xggx/styles under the
+# hash of their content, so unchanged files are neither processed nor
+# rewritten again, and the packager keeps reusing their compressed entries.
+STYLES_DIR = "styles"
+# Part of every cache key; bump when the output of this module changes
+VERSION = 1
+
+CSS_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?(?:\*/|$)|\s+|[^"\'/\s]+|/', re.S)
+# Whitespace next to these never matters in CSS. + and - are left alone
+# because calc() needs the spaces around them.
+CSS_TIGHT = set("{};,>~")
+GLSL_COMMENT = re.compile(r"/\*.*?\*/|//[^\n]*", re.S)
+
+
+def in_selector(tokens, start):
+    # Whether the text from tokens[start] on is part of a selector, i.e. a {
+    # comes before the next ; or }
+    for token in itertools.islice(tokens, start, None):
+        if token[0] in "\"'":
+            continue
+        for char in token:
+            if char in "{;}":
+                return char == "{"
+    return False
+
+
+def minify_css(text):
+    tokens = [" " if token.startswith("/*") or token.isspace() else token for token in CSS_TOKEN.findall(text)]
+    out = []
+    for i, token in enumerate(tokens):
+        if token == " ":
+            continue
+        if i and tokens[i - 1] == " " and out and out[-1][-1] not in CSS_TIGHT and out[-1][-1] != ":" \
+                and token[0] not in CSS_TIGHT and (token[0] != ":" or in_selector(tokens, i)):
+            # "a :hover" is not "a:hover", but "color :red" is "color:red"
+            out.append(" ")
+        if token[0] in "\"'":
+            out.append(token)
+            continue
+        if token[0] == "}" and out and out[-1][-1] == ";" and out[-1][0] not in "\"'":
+            out[-1] = out[-1][:-1]
+            if not out[-1]:
+                out.pop()
+        out.append(token.replace(";}", "}"))
+    return "".join(out)
+
+
+def split_css(text):
+    # Top-level statements of minified CSS: rule blocks (including @media
+    # and other nested at-rules) and at-rule statements such as @import
+    blocks = []
+    depth = start = 0
+    for match in CSS_TOKEN.finditer(text):
+        token = match.group()
+        if token[0] in "\"'":
+            continue
+        for i, char in enumerate(token, match.start()):
+            if char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    blocks.append(text[start:i + 1])
+                    start = i + 1
+            elif char == ";" and depth == 0:
+                blocks.append(text[start:i + 1])
+                start = i + 1
+    if text[start:].strip():
+        blocks.append(text[start:])
+    return blocks
+
+
+def is_statement(block):
+    return not block.endswith("}")
+
+
+def dedupe_rules(sheets):
+    # Drops every rule block that appears again later in sheets (which are
+    # applied in order). The later copy decides the cascade either way, so
+    # only the last one is kept. At-rule statements are never dropped.
+    seen = set()
+    result = []
+    for blocks in reversed(sheets):
+        kept = []
+        for block in reversed(blocks):
+            if is_statement(block) or block not in seen:
+                kept.append(block)
+                seen.add(block)
+        result.append(kept[::-1])
+    return result[::-1]
+
+
+def bundle_css(sheets):
+    # @charset and @import are only valid at the start of a stylesheet
+    head, body = [], []
+    for blocks in sheets:
+        for block in blocks:
+            if is_statement(block):
+                if block not in head:
+                    head.append(block)
+            else:
+                body.append(block)
+    return "".join(head + body)
+
+
+def minify_glsl(text):
+    # Keeps one statement per line: preprocessor directives end at a newline
+    text = GLSL_COMMENT.sub(lambda m: " " if m.group().startswith("/*") else "", text)
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line) + "\n"
+
+
+MINIFIERS = {"css": minify_css, "glsl": minify_glsl}
+
+
+class StyleCache:
+    def __init__(self, project_path):
+        self.dir = os.path.join(project_path, META_DIR, STYLES_DIR)
+        self.used = set()
+
+    def path(self, digest, ext):
+        name = digest + ext
+        self.used.add(name)
+        return os.path.join(self.dir, name)
+
+    def minified(self, source_path, kind):
+        # (original size, minified text); only new content is minified
+        with open(source_path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(f"{kind}:{VERSION}:".encode() + data).hexdigest()
+        path = self.path(digest, ".min")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return len(data), f.read(), True
+        except OSError:
+            pass
+        with perf.span("styles.minify", kind=kind) as span:
+            text = MINIFIERS[kind](data.decode("utf-8-sig", errors="replace"))
+            span.read(len(data))
+        self.write(path, text)
+        return len(data), text, False
+
+    def output(self, text, ext):
+        # Path of a file holding text, written only if it is new
+        path = self.path(hashlib.sha256(text.encode("utf-8")).hexdigest(), ext)
+        if not os.path.exists(path):
+            self.write(path, text)
+        return path
+
+    def write(self, path, text):
+        os.makedirs(self.dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def prune(self):
+        # Outputs of files that are no longer referenced, or have changed
+        try:
+            names = os.listdir(self.dir)
+        except OSError:
+            return
+        for name in names:
+            if name not in self.used:
+                try:
+                    os.remove(os.path.join(self.dir, name))
+                except OSError:
+                    pass
+
+
+def as_list(value):
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, str) and item.strip()]
+    return [value] if isinstance(value, str) and value.strip() else []
+
+
+def with_type(original, values):
+    # Keeps a single path a string, as the editor writes it
+    return values if isinstance(original, list) or len(values) != 1 else values[0]
+
+
+class Reference:
+    # One path in the payload and the file it resolves to. Files outside the
+    # project are packaged into the folder the editor keeps that kind in.
+    def __init__(self, project_path, key, value):
+        folder = REFERENCES[key][0]
+        self.value = value
+        self.path, st = resolve(project_path, folder, value.strip())
+        self.exists = st is not None
+        root = os.path.abspath(project_path) + os.sep
+        if self.path.startswith(root):
+            self.arcname = os.path.relpath(self.path, project_path).replace(os.sep, "/")
+        else:
+            self.arcname = f"{folder}/{os.path.basename(self.path)}"
+        self.size = 0
+        self.text = None
+        self.cached = False
+
+
+def minify_styles(project_path, files, manifest, report, bundle=False):
+    # Takes packager (arcname, path) pairs and returns (files, manifest,
+    # manifest changed) with minified outputs substituted; sizes go into
+    # report, an OptimizeReport. The manifest passed in is not modified.
+    # Referenced files outside the project are packaged under css/ and
+    # shaders/. With bundle, page_styles entries that share their matches
+    # become one entry with a single stylesheet.
+    payload = manifest.get("mod", {}).get("payload", {})
+    if not (payload.get("page_styles") or payload.get("shaders")):
+        return files, manifest, False
+    with perf.span("styles"):
+        cache = StyleCache(project_path)
+        original, manifest = manifest, copy.deepcopy(manifest)
+        payload = manifest["mod"]["payload"]
+        outputs = {}
+        sources = set()
+        merged = set()
+
+        def add_output(ref, text, ext):
+            arcname = ref.arcname
+            path = cache.output(text, ext)
+            if arcname in outputs and outputs[arcname] != path:
+                # The same stylesheet deduplicated differently for other pages
+                stem, ext = os.path.splitext(arcname)
+                arcname = f"{stem}.{os.path.basename(path)[:8]}{ext}"
+            outputs[arcname] = path
+            sources.add(ref.path)
+            report.add(ref.arcname, arcname, ref.size, len(text.encode("utf-8")), ref.cached)
+            return arcname
+
+        def load(key, value, kind):
+            ref = Reference(project_path, key, value)
+            if ref.exists:
+                ref.size, ref.text, ref.cached = cache.minified(ref.path, kind)
+            return ref
+
+        for item in payload.get("shaders") or []:
+            if isinstance(item, dict) and as_list(item.get("path")):
+                ref = load("shaders", as_list(item["path"])[0], "glsl")
+                if ref.exists:
+                    item["path"] = add_output(ref, ref.text, os.path.splitext(ref.arcname)[1])
+
+        # page_styles entries injected into the same pages, in manifest order
+        groups = {}
+        entries = [item for item in payload.get("page_styles") or [] if isinstance(item, dict) and as_list(item.get("css"))]
+        for item in entries:
+            refs = [load("page_styles", value, "css") for value in as_list(item["css"])]
+            groups.setdefault(json.dumps(item.get("matches"), sort_keys=True), []).append((item, refs))
+
+        for group in groups.values():
+            refs = [ref for _, item_refs in group for ref in item_refs if ref.exists]
+            sheets = dedupe_rules([split_css(ref.text) for ref in refs])
+            if bundle and len(group) > 1:
+                first = group[0][0]
+                text = bundle_css(sheets)
+                digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                bundle_ref = Reference(project_path, "page_styles", f"css/bundle-{digest[:8]}.css")
+                bundle_ref.size = sum(ref.size for ref in refs)
+                bundle_ref.cached = all(ref.cached for ref in refs)
+                missing = [ref.value for _, item_refs in group for ref in item_refs if not ref.exists]
+                first["css"] = with_type(first["css"], [add_output(bundle_ref, text, ".css")] + missing)
+                sources.update(ref.path for ref in refs)
+                merged.update(id(item) for item, _ in group[1:])
+                continue
+            blocks = iter(sheets)
+            for item, item_refs in group:
+                values = [add_output(ref, "".join(next(blocks)), ".css") if ref.exists else ref.value
+                          for ref in item_refs]
+                item["css"] = with_type(item["css"], values)
+        if merged:
+            payload["page_styles"] = [item for item in payload["page_styles"] if id(item) not in merged]
+        cache.prune()
+
+    files = [(arcname, path) for arcname, path in files
+             if arcname not in outputs and os.path.abspath(path) not in sources]
+    files += sorted(outputs.items())
+    return files, manifest, manifest != original
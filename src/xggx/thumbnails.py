@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import time
+
+from xggx.assets import file_digest
+from xggx.storage import match_mode
+
+THUMBNAIL_DIR = ".xggx_thumbs"
+THUMBNAIL_SIZE = (96, 96)
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp"}
+# Each thumbnail has a small sidecar naming the source it was made from, so
+# thumbnails of deleted or edited images can be found without hashing
+SOURCE_SUFFIX = ".src"
+PRUNE_MARKER = "pruned"
+PRUNE_INTERVAL = 24 * 60 * 60
+
+# (path, size, mtime_ns) -> content digest, so a worker process does not
+# rehash sources it has already seen
+_digests = {}
+
+
+def is_image_path(path):
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def source_digest(path):
+    st = os.stat(path)
+    key = (path, st.st_size, st.st_mtime_ns)
+    digest = _digests.get(key)
+    if digest is None:
+        digest = file_digest(path)
+        _digests[key] = digest
+    return digest
+
+
+def thumbnail_path(cache_dir, digest, size):
+    return os.path.join(cache_dir, digest[:2], f"{digest}_{size[0]}x{size[1]}.png")
+
+
+def make_thumbnail(source, cache_dir, size=THUMBNAIL_SIZE):
+    # Returns the path of a small PNG for source, creating it on a miss.
+    # Thumbnails are keyed by content, so renamed or copied sources share one.
+    dest = thumbnail_path(cache_dir, source_digest(source), size)
+    if os.path.exists(dest):
+        return dest
+    from PIL import Image
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with Image.open(source) as img:
+        # draft lets the JPEG decoder scale down by up to 8x while decoding,
+        # so a 4K wallpaper is never fully decoded just to be shrunk
+        img.draft("RGB", size)
+        img.thumbnail(size)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        # Written before the thumbnail so a prune never sees one without it
+        st = os.stat(source)
+        with open(dest + SOURCE_SUFFIX, "w") as f:
+            json.dump([os.path.abspath(source), st.st_size, st.st_mtime_ns], f)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+        os.close(fd)
+        try:
+            img.save(tmp_path, "PNG")
+            match_mode(tmp_path, dest)
+            os.replace(tmp_path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return dest
+
+
+def is_live(sidecar):
+    try:
+        with open(sidecar, "r") as f:
+            path, size, mtime_ns = json.load(f)
+        st = os.stat(path)
+    except (OSError, ValueError, TypeError):
+        return False
+    return st.st_size == size and st.st_mtime_ns == mtime_ns
+
+
+def prune_thumbnails(cache_dir, interval=PRUNE_INTERVAL):
+    # Deletes thumbnails whose source was deleted or has changed since, at
+    # most once per interval. A source shared by content with another file is
+    # only recorded once; the other file's thumbnail is simply made again.
+    # Returns the number of thumbnails removed.
+    marker = os.path.join(cache_dir, PRUNE_MARKER)
+    try:
+        if time.time() - os.path.getmtime(marker) < interval:
+            return 0
+    except OSError:
+        if not os.path.isdir(cache_dir):
+            return 0
+    removed = 0
+    for shard in os.listdir(cache_dir):
+        shard_path = os.path.join(cache_dir, shard)
+        if len(shard) != 2 or not os.path.isdir(shard_path):
+            continue
+        for name in os.listdir(shard_path):
+            if not name.endswith(".png"):
+                continue
+            thumb = os.path.join(shard_path, name)
+            if is_live(thumb + SOURCE_SUFFIX):
+                continue
+            for path in (thumb, thumb + SOURCE_SUFFIX):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            removed += 1
+    try:
+        with open(marker, "w"):
+            pass
+    except OSError:
+        pass
+    return removed
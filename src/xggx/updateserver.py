@@ -0,0 +1,164 @@
+import json
+import os
+import re
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from xggx.packager import COPY_CHUNK
+from xggx.release import load_index, parse_version
+
+# A stand-in for a mod's update_url, for trying the update flow offline. It
+# serves one releases folder written by `xggx release`:
+#
+#   GET /updates.json?version=1.0.2   latest version, full package and, when
+#                                     one exists, the delta from 1.0.2
+#   GET /<file>                       a package listed in releases.json
+#
+# Packages carry their sha256 as ETag, answer If-None-Match with 304 and
+# support single byte ranges (Range, If-Range) for resumed downloads.
+UPDATES_PATH = "/updates.json"
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def package_info(entry):
+    return {"url": "/" + entry["file"], "size": entry["size"], "sha256": entry["sha256"]}
+
+
+def update_response(index, version):
+    releases = index["releases"]
+    if not releases:
+        return None
+    latest = releases[-1]
+    response = {"name": index["name"], "version": latest["version"], "package": package_info(latest),
+                "delta": None, "up_to_date": False}
+    if version:
+        try:
+            response["up_to_date"] = parse_version(version) >= parse_version(latest["version"])
+        except ValueError:
+            pass
+        delta = latest["deltas"].get(version)
+        if delta is not None and not response["up_to_date"]:
+            response["delta"] = dict(package_info(delta), **{"from": version})
+    return response
+
+
+def parse_range(header, size):
+    # (start, end) inclusive for a single satisfiable range, "unsatisfiable",
+    # or None to send the whole file (no header, several ranges or one that
+    # cannot be parsed, which RFC 9110 lets a server ignore)
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return "unsatisfiable"
+    return start, end
+
+
+class UpdateHandler(BaseHTTPRequestHandler):
+    server_version = "xggx-update"
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def handle_request(self, send_body):
+        url = urlsplit(self.path)
+        # Re-read on every request, so releases made while serving show up
+        index = load_index(self.server.releases_dir)
+        if url.path == UPDATES_PATH:
+            version = parse_qs(url.query).get("version", [""])[0]
+            response = update_response(index, version)
+            if response is None:
+                self.send_error(HTTPStatus.NOT_FOUND, "No releases yet")
+                return
+            self.send_json(response, send_body)
+            return
+        name = url.path.lstrip("/")
+        packages = {}
+        for entry in index["releases"]:
+            packages[entry["file"]] = entry
+            for delta in entry["deltas"].values():
+                packages[delta["file"]] = delta
+        # Only listed packages are served, never arbitrary paths
+        entry = packages.get(name)
+        path = os.path.join(self.server.releases_dir, name) if entry else None
+        if path is None or not os.path.isfile(path):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        self.send_package(path, f'"{entry["sha256"]}"', send_body)
+
+    def send_json(self, data, send_body):
+        body = json.dumps(data, indent=2).encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_package(self, path, etag, send_body):
+        size = os.path.getsize(path)
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        byte_range = parse_range(self.headers.get("Range"), size)
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range.strip() != etag:
+            # The client's partial copy is of another file; start over
+            byte_range = None
+        if byte_range == "unsatisfiable":
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1
+        self.send_response(HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        # A package's name includes its version, so its content never changes
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if not send_body:
+            return
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining:
+                chunk = f.read(min(COPY_CHUNK, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+
+def make_server(releases_dir, host="127.0.0.1", port=8765):
+    # port=0 picks a free port; see server.server_address
+    server = ThreadingHTTPServer((host, port), UpdateHandler)
+    server.releases_dir = os.path.abspath(releases_dir)
+    return server
@@ -0,0 +1,153 @@
+import copy
+import itertools
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from xggx import META_DIR, perf
+from xggx.build import load_project_manifest, process_assets
+from xggx.model import GENERAL_DEFAULTS, THEME_DEFAULTS, THEME_RANGES
+from xggx.packager import build_zip, collect_files, compress_type_for, copy_raw_entry
+from xggx.projects import zip_file_name
+
+# Everything except manifest.json is zipped once into this archive; each
+# variant copies its compressed entries and adds its own manifest
+BASE_ZIP = "variants_base.zip"
+BASE_STATE = "variants_build.json"
+COLOR_LABELS = {"gx_accent": "accent", "gx_secondary_base": "base"}
+
+
+def parse_axis(spec):
+    # "gx_accent.h=0:360:15" (start:stop:step, stop excluded) or
+    # "dark.gx_secondary_base.l=10,20,30". Without dark./light. the value is
+    # applied to both modes, which keeps light/dark pairs in step.
+    # Returns (theme fields, values).
+    key, sep, values = spec.partition("=")
+    if not sep or not values:
+        raise ValueError(f"Expected FIELD=VALUES, got {spec!r}")
+    key = key.strip()
+    names = key.split(".")
+    if len(names) == 3:
+        modes, (color, channel) = [names[0]], names[1:]
+    elif len(names) == 2:
+        modes, (color, channel) = ["dark", "light"], names
+    else:
+        raise ValueError(f"Unknown theme field {key!r}")
+    fields = [f"{mode}.{color}.{channel}" for mode in modes]
+    if any(f"{mode}.{color}" not in THEME_DEFAULTS for mode in modes) or channel not in THEME_RANGES:
+        raise ValueError(f"Unknown theme field {key!r}")
+    if ":" in values:
+        parts = [int(part) for part in values.split(":")]
+        if len(parts) not in (2, 3) or (len(parts) == 3 and parts[2] <= 0):
+            raise ValueError(f"Expected START:STOP[:STEP] with a positive step, got {values!r}")
+        values = list(range(*parts))
+    else:
+        values = [int(value) for value in values.split(",") if value.strip()]
+    if channel == "h":
+        values = [value % 360 for value in values]
+    elif any(not 0 <= value <= THEME_RANGES[channel] for value in values):
+        raise ValueError(f"{key} values must be between 0 and {THEME_RANGES[channel]}")
+    # Repeats (including hues a full turn apart) would build the same variant
+    # under the same file name
+    values = list(dict.fromkeys(values))
+    if not values:
+        raise ValueError(f"No values for {key!r}")
+    return tuple(fields), values
+
+
+def check_axes(axes):
+    # Two axes setting the same field would overwrite each other
+    seen = set()
+    for fields, _ in axes:
+        for field in fields:
+            if field in seen:
+                raise ValueError(f"{field} is set by more than one axis")
+            seen.add(field)
+
+
+def expand_matrix(axes):
+    # Every combination of the axes' values, as {theme field: value}
+    combinations = []
+    for values in itertools.product(*(axis_values for _, axis_values in axes)):
+        overrides = {}
+        for (fields, _), value in zip(axes, values):
+            for field in fields:
+                overrides[field] = value
+        combinations.append((values, overrides))
+    return combinations
+
+
+def variant_label(axes, values):
+    parts = []
+    for (fields, _), value in zip(axes, values):
+        mode, color, channel = fields[0].split(".")
+        prefix = f"{mode} " if len(fields) == 1 else ""
+        parts.append(f"{prefix}{COLOR_LABELS[color]} {channel}{value}")
+    return ", ".join(parts)
+
+
+def variant_manifest(manifest, name, overrides):
+    # A copy of manifest renamed and with overrides ({"dark.gx_accent.h": 120})
+    # applied to its theme. Everything else is kept exactly as loaded, including
+    # what the editor's model does not represent.
+    manifest = copy.deepcopy(manifest)
+    manifest["name"] = name
+    payload = manifest.setdefault("mod", {}).setdefault("payload", {})
+    if not payload.get("theme"):
+        payload["theme"] = [{"id": "0", "name": f"{name} Theme"}]
+    theme = payload["theme"][0]
+    for field, value in overrides.items():
+        mode, color, channel = field.split(".")
+        colors = theme.setdefault(mode, {})
+        colors.setdefault(color, dict(THEME_DEFAULTS[f"{mode}.{color}"]))[channel] = value
+    return manifest
+
+
+def write_variant(base_zip, manifest_data, zip_path):
+    # Runs in a worker process. Only the manifest is compressed; every other
+    # entry is copied from the base archive still compressed.
+    tmp_path = zip_path + ".part"
+    try:
+        with perf.span("variant.write") as span:
+            with zipfile.ZipFile(base_zip, "r") as base, zipfile.ZipFile(tmp_path, "w") as zipf:
+                for info in base.infolist():
+                    copy_raw_entry(base, info, zipf)
+                zipf.writestr("manifest.json", manifest_data, compress_type_for("manifest.json"))
+            span.wrote(os.path.getsize(tmp_path))
+        os.replace(tmp_path, zip_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(zip_path)
+
+
+def generate_variants(project_path, axes, output_dir, workers=None):
+    # Yields (name, zip path, size) as each variant finishes. Referenced
+    # images are processed and every shared file compressed once, up front,
+    # however many variants there are.
+    manifest = load_project_manifest(project_path)
+    process_assets(project_path, manifest)
+    files = [(arcname, path) for arcname, path in collect_files(project_path) if arcname != "manifest.json"]
+    base_zip = os.path.join(project_path, META_DIR, BASE_ZIP)
+    os.makedirs(os.path.dirname(base_zip), exist_ok=True)
+    build_zip(project_path, base_zip, files=files, state_name=BASE_STATE)
+
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = str(manifest.get("name") or "").strip() or GENERAL_DEFAULTS["name"]
+    tasks = []
+    for values, overrides in expand_matrix(axes):
+        name = f"{base_name} ({variant_label(axes, values)})"
+        data = json.dumps(variant_manifest(manifest, name, overrides), indent=2).encode("utf-8")
+        tasks.append((name, os.path.join(output_dir, zip_file_name(name)), data))
+
+    if workers == 1 or len(tasks) <= 1:
+        for name, zip_path, data in tasks:
+            yield name, zip_path, write_variant(base_zip, data, zip_path)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(write_variant, base_zip, data, zip_path): (name, zip_path)
+                   for name, zip_path, data in tasks}
+        for future in as_completed(futures):
+            name, zip_path = futures[future]
+            yield name, zip_path, future.result()
@@ -0,0 +1,195 @@
+import copy
+import json
+import os
+import threading
+import time
+
+from xggx import META_DIR, perf
+from xggx.assets import AssetCache
+from xggx.build import default_zip_path, image_references, load_project_manifest, package_project, process_references
+from xggx.packager import collect_files, patch_zip
+from xggx.store import AssetStore
+
+# Watch mode keeps a project's zip up to date while its assets are edited
+# elsewhere. Changes are found by comparing size and mtime snapshots, so the
+# same code serves the editor (woken by QFileSystemWatcher) and the headless
+# loop (which polls).
+POLL_INTERVAL = float(os.environ.get("XGGX_WATCH_INTERVAL", "0.2"))
+# Editors often save in several steps; a change only counts once things are quiet
+DEBOUNCE = float(os.environ.get("XGGX_WATCH_DEBOUNCE", "0.2"))
+
+
+class RebuildReport:
+    def __init__(self, zip_path, changed):
+        # changed: the files whose edits this rebuild picked up
+        self.zip_path = zip_path
+        self.changed = changed
+        self.patched = False
+        self.build = None
+        self.seconds = 0.0
+
+    def summary(self):
+        how = "patched" if self.patched else "rebuilt"
+        names = sorted(os.path.basename(path) for path in self.changed)
+        if len(names) > 3:
+            names[3:] = [f"{len(names) - 3} more"]
+        return (f"{how} {os.path.basename(self.zip_path)} in {self.seconds:.2f}s "
+                f"({self.build.compressed} written, {self.build.reused} kept)"
+                + (f" after changes to {', '.join(names)}" if names else ""))
+
+
+class ProjectWatcher:
+    # Thread-safe: the editor runs update() on worker threads, several of
+    # which may be woken by one burst of changes
+
+    def __init__(self, project_path, output_dir=None, cache=None):
+        self.project_path = os.path.abspath(project_path)
+        self.output_dir = output_dir
+        self.cache = cache or AssetCache(self.project_path, AssetStore.for_project(self.project_path))
+        self.lock = threading.Lock()
+        self.manifest_path = os.path.join(self.project_path, "manifest.json")
+        self.manifest = None
+        self.sources = set()
+        self.snapshot = {}
+        self.zip_path = None
+
+    def load_manifest(self):
+        self.manifest = load_project_manifest(self.project_path)
+        self.sources = {source for _, _, _, source, _ in image_references(self.project_path, self.manifest,
+                                                                           self.cache)}
+
+    def watched_files(self):
+        # Referenced images outside the project, plus everything that is packaged
+        return sorted(self.sources) + [path for _, path in collect_files(self.project_path)]
+
+    def watched_dirs(self):
+        dirs = set()
+        for root, names, _ in os.walk(self.project_path):
+            names[:] = [name for name in names if name != META_DIR]
+            dirs.add(root)
+        dirs.update(os.path.dirname(source) for source in self.sources)
+        return sorted(dirs)
+
+    def scan(self):
+        snapshot = {}
+        for path in self.watched_files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def poll(self):
+        # Paths added, removed or modified since the last poll or build
+        snapshot = self.scan()
+        changed = {path for path in snapshot.keys() | self.snapshot.keys()
+                   if snapshot.get(path) != self.snapshot.get(path)}
+        self.snapshot = snapshot
+        return changed
+
+    def build(self):
+        # The full build watch mode starts from; afterwards only changes are packaged
+        with self.lock:
+            start = time.perf_counter()
+            self.load_manifest()
+            report = self.package(None, set())
+            self.snapshot = self.scan()
+            report.seconds = time.perf_counter() - start
+            return report
+
+    def update(self):
+        # Returns a RebuildReport, or None when nothing changed
+        with self.lock:
+            changed = self.poll()
+            if not changed:
+                return None
+            return self.rebuild(changed)
+
+    def rebuild(self, changed):
+        start = time.perf_counter()
+        with perf.span("watch.rebuild", files=len(changed)):
+            if self.manifest_path in changed:
+                # References may have been added or removed
+                self.load_manifest()
+                report = self.package(None, changed)
+            else:
+                report = self.package(changed & self.sources, changed)
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def package(self, sources, changed):
+        # sources: referenced images to process again (None for all of them).
+        # Copies in the project are only replaced from their original once
+        # the original changes, never by a full build, so editing the copy
+        # itself is not undone.
+        manifest = copy.deepcopy(self.manifest)
+        manifest_changed, regenerated = process_references(self.project_path, manifest, self.cache, sources,
+                                                           originals=sources is not None)
+        self.cache.save()
+        for path in regenerated:
+            # Our own output is not a change to react to on the next poll
+            try:
+                st = os.stat(path)
+                self.snapshot[path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                pass
+
+        files, removed = [], []
+        for path in sorted(changed | set(regenerated)):
+            rel_path = os.path.relpath(path, self.project_path)
+            if rel_path.startswith(os.pardir) or rel_path.split(os.sep)[0] == META_DIR:
+                continue
+            arcname = rel_path.replace(os.sep, "/")
+            if os.path.isfile(path):
+                files.append((arcname, path))
+            else:
+                removed.append(arcname)
+        data = None
+        if manifest_changed:
+            data = {"manifest.json": json.dumps(manifest, indent=2).encode("utf-8")}
+
+        zip_path = default_zip_path(self.project_path, manifest, self.output_dir)
+        report = RebuildReport(zip_path, changed)
+        if self.zip_path not in (None, zip_path) and os.path.exists(self.zip_path) and not os.path.exists(zip_path):
+            # Renaming the mod renames its zip; moving the old one keeps the
+            # build state valid, so it is patched rather than rebuilt
+            os.replace(self.zip_path, zip_path)
+            self.zip_path = zip_path
+        if zip_path == self.zip_path:
+            report.build = patch_zip(self.project_path, zip_path, files, removed, data)
+        if report.build is None:
+            report.build, _ = package_project(self.project_path, zip_path, manifest, manifest_changed=manifest_changed)
+        else:
+            report.patched = True
+        self.zip_path = zip_path
+        return report
+
+    def run(self, on_report, on_error=None, interval=POLL_INTERVAL, debounce=DEBOUNCE, stop=None):
+        # Headless loop: builds once, then polls until stop() returns True
+        # (or forever), calling on_report(report) after every rebuild. A
+        # failed rebuild (e.g. an image saved half-written) goes to
+        # on_error(error) and the loop carries on; the next save retries it.
+        on_report(self.build())
+        pending = set()
+        last_change = 0.0
+        while stop is None or not stop():
+            time.sleep(interval)
+            with self.lock:
+                changed = self.poll()
+                now = time.monotonic()
+                if changed:
+                    pending |= changed
+                    last_change = now
+                    continue
+                if not pending or now - last_change < debounce:
+                    continue
+                changed, pending = pending, set()
+                try:
+                    report = self.rebuild(changed)
+                except Exception as e:
+                    if on_error is None:
+                        raise
+                    on_error(e)
+                    continue
+            on_report(report)
@@ -0,0 +1,82 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+from xggx.archive import ensure_extracted, import_archive, is_pending, read_archive_manifest
+
+MANIFEST = {"name": "Imported", "mod": {"payload": {"wallpaper": [{"id": "0", "dark.image": "wallpaper/w.png"}]}}}
+
+
+def make_archive(tmp_path, root=""):
+    path = str(tmp_path / "mod.zip")
+    with zipfile.ZipFile(path, "w") as zipf:
+        zipf.writestr(root + "manifest.json", json.dumps(MANIFEST))
+        zipf.writestr(root + "wallpaper/w.png", b"preview")
+        zipf.writestr(root + "stickers/a.png", b"sticker")
+        zipf.writestr(root + "../escape.txt", b"outside")
+    projects = tmp_path / "projects"
+    projects.mkdir()
+    return path, str(projects)
+
+
+@pytest.mark.parametrize("root", ["", "My Mod/"])
+def test_import_extracts_only_the_manifest_and_preview(tmp_path, root):
+    archive, projects = make_archive(tmp_path, root)
+    assert read_archive_manifest(archive) == MANIFEST
+    project = import_archive(archive, projects)
+    assert os.path.isfile(os.path.join(project, "manifest.json"))
+    assert os.path.isfile(os.path.join(project, "wallpaper", "w.png"))
+    assert not os.path.exists(os.path.join(project, "stickers", "a.png"))
+    assert is_pending(project, "stickers/a.png")
+
+
+def test_extraction_never_overwrites_edits(tmp_path):
+    archive, projects = make_archive(tmp_path)
+    project = import_archive(archive, projects)
+    os.makedirs(os.path.join(project, "stickers"))
+    with open(os.path.join(project, "stickers", "a.png"), "wb") as f:
+        f.write(b"edited")
+    ensure_extracted(project)
+    with open(os.path.join(project, "stickers", "a.png"), "rb") as f:
+        assert f.read() == b"edited"
+    assert not is_pending(project, "stickers/a.png")
+    assert not os.path.exists(os.path.join(projects, "escape.txt"))
+
+
+def test_moved_archive_is_removed_once_extracted(tmp_path):
+    archive, projects = make_archive(tmp_path)
+    project = import_archive(archive, projects, move=True)
+    assert not os.path.exists(archive)
+    assert ensure_extracted(project) == 1
+    with open(os.path.join(project, "stickers", "a.png"), "rb") as f:
+        assert f.read() == b"sticker"
+    # Nothing is left to extract, so the archive and its state are deleted
+    assert sorted(os.listdir(os.path.join(project, ".xggx"))) == ["journal", "project.json"]
+
+
+def test_missing_source_archive_is_reported(tmp_path):
+    archive, projects = make_archive(tmp_path)
+    project = import_archive(archive, projects)
+    os.remove(archive)
+    with pytest.raises(FileNotFoundError, match="import the mod again"):
+        ensure_extracted(project)
+
+
+def test_unusual_payloads_still_import(tmp_path):
+    path = str(tmp_path / "mod.zip")
+    manifest = {"name": "Odd", "mod": {"payload": {"wallpaper": ["w.png", {"dark.image": 5}], "app_icon": {}}}}
+    with zipfile.ZipFile(path, "w") as zipf:
+        zipf.writestr("manifest.json", json.dumps(manifest))
+    project = import_archive(path, str(tmp_path))
+    assert os.path.isfile(os.path.join(project, "manifest.json"))
+
+
+def test_manifest_must_be_an_object(tmp_path):
+    path = str(tmp_path / "mod.zip")
+    with zipfile.ZipFile(path, "w") as zipf:
+        zipf.writestr("manifest.json", "[]")
+    with pytest.raises(ValueError):
+        import_archive(path, str(tmp_path))
+    assert os.listdir(tmp_path) == ["mod.zip"]
@@ -0,0 +1,76 @@
+import json
+
+from xggx.history import History, history_path, load_history, save_history
+from xggx.model import ModProject
+
+
+def edits():
+    project = ModProject()
+    states = [project.snapshot()]
+    for value in ["one", "two", "three"]:
+        project.set(("name",), value)
+        states.append(project.snapshot())
+    return project, states
+
+
+def test_undo_redo():
+    _, states = edits()
+    history = History(states[0])
+    for state in states[1:]:
+        assert history.record(state)
+    assert not history.record(states[-1])
+    assert history.undo() == states[2]
+    assert history.undo() == states[1]
+    assert history.redo() == states[2]
+    # A new edit forgets what was undone
+    history.record(states[0])
+    assert not history.can_redo()
+
+
+def test_depth_limits_the_undo_stack():
+    _, states = edits()
+    history = History(states[0], depth=2)
+    for state in states[1:]:
+        history.record(state)
+    assert history.undo() == states[2]
+    assert history.undo() == states[1]
+    assert history.undo() is None
+
+
+def test_saved_history_round_trip():
+    project, states = edits()
+    history = History(states[0])
+    for state in states[1:]:
+        history.record(state)
+    history.undo()
+    data = json.loads(json.dumps(history.to_json()))
+    # Only the name changed, so every state shares the same payload groups
+    assert len(data["groups"]) == len(set(states[0][1]))
+
+    restored = History.from_json(data, project.snapshot())
+    assert restored.states() == history.states()
+    assert restored.current == history.current
+
+
+def test_outside_changes_become_an_undo_step(tmp_path):
+    project, states = edits()
+    history = History(states[0])
+    history.record(states[1])
+    save_history(str(tmp_path), history)
+    with open(history_path(str(tmp_path))) as f:
+        assert json.load(f)["position"] == 1
+
+    loaded = load_history(str(tmp_path), states[3])
+    assert loaded.current == states[3]
+    assert loaded.undo() == states[1]
+    assert loaded.undo() == states[0]
+
+
+def test_mismatched_history_starts_over(tmp_path):
+    _, states = edits()
+    history = History(states[0])
+    history.record(states[1])
+    save_history(str(tmp_path), history)
+    shape = (states[0][0] + ("extra",), states[0][1])
+    loaded = load_history(str(tmp_path), shape)
+    assert loaded.states() == [shape]
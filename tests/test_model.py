@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from xggx.model import ModProject
+
+
+def edited_project():
+    project = ModProject()
+    project.set(("name",), "Model Test")
+    project.set(("developer",), "Someone")
+    project.set(("wallpaper", "dark.image"), "dark.png")
+    project.set(("background_music", "tracks"), "a.mp3, b.mp3")
+    return project
+
+
+def test_manifest_round_trip():
+    project = edited_project()
+    loaded = ModProject.from_manifest(json.loads(project.to_json()))
+    for field_id in [("name",), ("developer",), ("wallpaper", "dark.image"), ("background_music", "tracks")]:
+        assert loaded.get(field_id) == project.get(field_id)
+    assert loaded.to_json() == project.to_json()
+
+
+def test_set_reports_changes_only():
+    project = edited_project()
+    project.mark_clean()
+    assert not project.set(("name",), "Model Test")
+    assert project.dirty == set()
+    assert project.set(("wallpaper", "light.image"), "light.png")
+    assert project.dirty == {("wallpaper", "light.image")}
+
+
+def test_unknown_keys_are_written_back():
+    manifest = json.loads(edited_project().to_json())
+    manifest["homepage_url"] = "https://example.com"
+    manifest["mod"]["payload"]["future_group"] = [{"id": "0", "value": 1}]
+    project = ModProject.from_manifest(manifest)
+    project.set(("description",), "Changed")
+    written = project.to_manifest()
+    assert written["homepage_url"] == "https://example.com"
+    assert written["mod"]["payload"]["future_group"] == [{"id": "0", "value": 1}]
+    assert written["description"] == "Changed"
+
+
+def test_snapshots_share_unchanged_groups():
+    project = edited_project()
+    before = project.snapshot()
+    project.set(("wallpaper", "light.image"), "light.png")
+    after = project.snapshot()
+    assert sum(a is b for a, b in zip(before[1], after[1])) == len(after[1]) - 1
+    assert project.restore(before) == [("wallpaper", "light.image")]
+    assert project.snapshot() == before
+
+
+@pytest.mark.parametrize("manifest, kept", [
+    ({"name": "x", "developer": "bob"}, []),
+    ({"name": 5, "mod": {"payload": []}}, []),
+    ({"name": "x", "mod": {"payload": {"theme": [{"dark": "x"}]}}}, ["theme"]),
+    ({"name": "x", "mod": {"payload": {"shaders": [{"path": 3}]}}}, ["shaders"]),
+    ({"name": "x", "mod": {"payload": {"background_music": [{"tracks": [1, 2]}]}}}, ["background_music"]),
+])
+def test_unusual_manifests_load(manifest, kept):
+    project = ModProject.from_manifest(manifest)
+    assert project.kept_groups() == kept
+    payload = project.to_manifest()["mod"]["payload"]
+    for key in kept:
+        assert payload[key] == manifest["mod"]["payload"][key]
+
+
+def test_string_developer_is_its_name():
+    assert ModProject.from_manifest({"developer": "bob"}).get(("developer",)) == "bob"
+
+
+def test_manifest_must_be_an_object():
+    with pytest.raises(ValueError):
+        ModProject.from_manifest([])
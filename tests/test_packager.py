@@ -0,0 +1,89 @@
+import os
+import zipfile
+
+from xggx import META_DIR
+from xggx.packager import build_zip, patch_zip
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def bump_mtime(path):
+    # Sizes and mtimes are what the build state compares
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def contents(zip_path):
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert zipf.testzip() is None
+        return {name: zipf.read(name) for name in zipf.namelist()}
+
+
+def make_project(tmp_path):
+    project = tmp_path / "mod"
+    write(str(project / "manifest.json"), b'{"name": "Test"}')
+    write(str(project / "css" / "style.css"), b"a{color:red}" * 100)
+    write(str(project / "stickers" / "a.png"), os.urandom(4096))
+    write(str(project / "stickers" / "b.png"), os.urandom(4096))
+    zip_path = str(tmp_path / "mod.zip")
+    build_zip(str(project), zip_path)
+    return project, zip_path
+
+
+def test_patch_round_trip(tmp_path):
+    project, zip_path = make_project(tmp_path)
+    css = project / "css" / "style.css"
+    write(str(css), b"a{color:blue}" * 100)
+    bump_mtime(str(css))
+    os.remove(project / "stickers" / "b.png")
+
+    report = patch_zip(str(project), zip_path, [("css/style.css", str(css))], ["stickers/b.png"],
+                       {"manifest.json": b'{"name": "Patched"}'})
+
+    assert report is not None
+    assert report.compressed == 2
+    assert contents(zip_path) == {
+        "manifest.json": b'{"name": "Patched"}',
+        "css/style.css": b"a{color:blue}" * 100,
+        "stickers/a.png": (project / "stickers" / "a.png").read_bytes(),
+    }
+    # The patched archive is recorded, so the next build reuses every entry
+    rebuilt = build_zip(str(project), zip_path, data={"manifest.json": b'{"name": "Patched"}'})
+    assert rebuilt.compressed == 0
+
+
+def test_patch_without_changes_writes_nothing(tmp_path):
+    project, zip_path = make_project(tmp_path)
+    before = os.stat(zip_path).st_mtime_ns
+
+    report = patch_zip(str(project), zip_path, [("css/style.css", str(project / "css" / "style.css"))])
+
+    assert report.compressed == 0
+    assert os.stat(zip_path).st_mtime_ns == before
+
+
+def test_patch_falls_back_when_too_much_is_replaced(tmp_path):
+    project, zip_path = make_project(tmp_path)
+    for name in ("a.png", "b.png"):
+        path = project / "stickers" / name
+        write(str(path), os.urandom(4096))
+        bump_mtime(str(path))
+    files = [(f"stickers/{name}", str(project / "stickers" / name)) for name in ("a.png", "b.png")]
+    before = (tmp_path / "mod.zip").read_bytes()
+
+    # Replacing both stickers would leave more than MAX_WASTE dead bytes
+    assert patch_zip(str(project), zip_path, files) is None
+    assert (tmp_path / "mod.zip").read_bytes() == before
+
+
+def test_patch_refuses_an_archive_changed_since_the_build(tmp_path):
+    project, zip_path = make_project(tmp_path)
+    with zipfile.ZipFile(zip_path, "a") as zipf:
+        zipf.writestr("extra.txt", b"not from the build")
+
+    assert patch_zip(str(project), zip_path, data={"manifest.json": b"{}"}) is None
+    assert os.path.exists(os.path.join(str(project), META_DIR, "build.json"))
@@ -0,0 +1,89 @@
+import io
+import os
+import struct
+
+import pytest
+from PIL import Image
+
+from xggx.preflight import preflight
+from xggx.sniff import sniff_file, sniff_format
+
+
+def image_bytes(fmt, size=(40, 30), **options):
+    out = io.BytesIO()
+    Image.new("RGB", size, "red").save(out, fmt, **options)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "JPEG", "GIF", "WEBP", "BMP"])
+def test_sniff_reads_image_sizes(tmp_path, fmt):
+    path = tmp_path / "image"
+    path.write_bytes(image_bytes(fmt))
+    found, dimensions = sniff_file(str(path))
+    assert found == ("jpeg" if fmt == "JPEG" else fmt.lower())
+    assert dimensions == (40, 30)
+
+
+def test_sniff_finds_jpeg_size_after_exif(tmp_path):
+    path = tmp_path / "photo.jpg"
+    exif = b"Exif\0\0" + os.urandom(30000)
+    data = image_bytes("JPEG")
+    # An APP1 segment in front of the frame header, as cameras write it
+    path.write_bytes(data[:2] + b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif + data[2:])
+    assert sniff_file(str(path)) == ("jpeg", (40, 30))
+
+
+def test_sniff_formats():
+    assert sniff_format(b"ID3\x04") == "mp3"
+    assert sniff_format(b"\xff\xfb\x90\x64") == "mp3"
+    assert sniff_format(b"OggS\0") == "ogg"
+    assert sniff_format(b"wOF2\0") == "woff2"
+    assert sniff_format("a { color: red } /* é".encode("utf-8")[:-1]) == "text"
+    assert sniff_format(b"\0\0\0\0binary") is None
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_preflight_reports_every_problem(tmp_path):
+    project = str(tmp_path)
+    write(os.path.join(project, "wallpaper", "dark.png"), image_bytes("PNG"))
+    write(os.path.join(project, "wallpaper", "light.png"), image_bytes("JPEG"))
+    write(os.path.join(project, "music", "a.mp3"), image_bytes("PNG"))
+    manifest = {"mod": {"payload": {
+        "wallpaper": [{"dark": {"image": "dark.png"}, "light.image": "light.png"}],
+        "background_music": [{"tracks": ["a.mp3", "missing.mp3"]}],
+        "theme": [{"dark": {"gx_accent": {"h": 400, "s": "x"}}}],
+    }}}
+    report = preflight(project, manifest)
+    problems = sorted(str(problem) for problem in report.problems)
+    assert problems == [
+        "error: background_music tracks: a.mp3 is a png file, expected audio",
+        "error: background_music tracks: missing.mp3 not found",
+        "error: theme dark.gx_accent.h: 400 is not between 0 and 360",
+        "error: theme dark.gx_accent.s: 'x' is not a whole number",
+        "warning: wallpaper light.image: light.png is a jpeg file despite its extension",
+    ]
+    assert report.references == 4
+    assert len(report.files) == 3
+
+
+def test_preflight_reuses_sniffed_files(tmp_path, monkeypatch):
+    project = str(tmp_path)
+    write(os.path.join(project, "stickers", "a.png"), image_bytes("PNG"))
+    manifest = {"mod": {"payload": {"stickers": [{"images": ["a.png"]}]}}}
+    assert not preflight(project, manifest).problems
+
+    def fail(path):
+        raise AssertionError("sniffed again")
+    monkeypatch.setattr("xggx.preflight.sniff_file", fail)
+    assert not preflight(project, manifest).problems
+
+
+@pytest.mark.parametrize("manifest", [{"mod": "x"}, {"mod": {"payload": []}}])
+def test_preflight_reports_a_malformed_payload(tmp_path, manifest):
+    assert [str(problem) for problem in preflight(str(tmp_path), manifest).errors] == [
+        "error: manifest: mod.payload is not an object"]
@@ -0,0 +1,81 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+from xggx.model import ModProject
+from xggx.release import DELTA_MANIFEST, apply_delta, bump_version, release_project
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def make_project(tmp_path):
+    project = ModProject()
+    project.set(("name",), "Release Test")
+    project.set(("page_styles", "css"), "css/style.css")
+    path = str(tmp_path / "mod")
+    write(os.path.join(path, "manifest.json"), project.to_json().encode("utf-8"))
+    write(os.path.join(path, "css", "style.css"), b"a{color:red}")
+    write(os.path.join(path, "stickers", "a.png"), os.urandom(64 * 1024))
+    write(os.path.join(path, "stickers", "b.png"), os.urandom(64 * 1024))
+    return path
+
+
+def two_releases(tmp_path):
+    project = make_project(tmp_path)
+    releases = str(tmp_path / "releases")
+    first = release_project(project, releases)
+    write(os.path.join(project, "css", "style.css"), b"a{color:blue}")
+    os.remove(os.path.join(project, "stickers", "b.png"))
+    second = release_project(project, releases)
+    return first, second
+
+
+def test_bump_version():
+    assert bump_version("1.0") == "1.0.1"
+    assert bump_version("1.0.3", "minor") == "1.1"
+    assert bump_version("1.4.2", "major") == "2.0"
+
+
+def test_apply_delta_reproduces_the_release(tmp_path):
+    first, second = two_releases(tmp_path)
+    assert [delta[0] for delta in second.deltas] == [first.version]
+    _, delta_path, _, changed, removed = second.deltas[0]
+    assert (changed, removed) == (2, 1)
+    with zipfile.ZipFile(delta_path) as delta:
+        # Only the changed entries travel, plus the description
+        assert sorted(delta.namelist()) == sorted(["manifest.json", "css/style.css", DELTA_MANIFEST])
+
+    out = str(tmp_path / "rebuilt.zip")
+    assert apply_delta(first.zip_path, delta_path, out) == second.version
+    with open(out, "rb") as f, open(second.zip_path, "rb") as expected:
+        assert f.read() == expected.read()
+
+
+def test_apply_delta_rejects_another_base(tmp_path):
+    first, second = two_releases(tmp_path)
+    _, delta_path, *_ = second.deltas[0]
+    other = str(tmp_path / "other.zip")
+    with zipfile.ZipFile(first.zip_path) as src, zipfile.ZipFile(other, "w") as dst:
+        for name in src.namelist():
+            dst.writestr(name, b"changed" if name == "stickers/a.png" else src.read(name))
+
+    out = str(tmp_path / "rebuilt.zip")
+    with pytest.raises(ValueError):
+        apply_delta(other, delta_path, out)
+    assert not os.path.exists(out)
+    assert not os.path.exists(out + ".part")
+
+
+def test_release_without_changes_is_skipped(tmp_path):
+    project = make_project(tmp_path)
+    releases = str(tmp_path / "releases")
+    assert release_project(project, releases) is not None
+    assert release_project(project, releases) is None
+    with open(os.path.join(releases, "releases.json")) as f:
+        assert len(json.load(f)["releases"]) == 1
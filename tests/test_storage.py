@@ -0,0 +1,58 @@
+import json
+import os
+import stat
+
+import pytest
+
+from xggx.storage import UMASK, journal_versions, read_manifest, recover_manifest, write_manifest
+
+
+def manifest_text(name):
+    return json.dumps({"name": name}, indent=2)
+
+
+def test_unchanged_manifest_is_not_rewritten(tmp_path):
+    project = str(tmp_path)
+    assert write_manifest(project, manifest_text("one"))
+    assert not write_manifest(project, manifest_text("one"))
+    assert len(journal_versions(project)) == 1
+
+
+def test_journal_keeps_the_newest_versions(tmp_path):
+    project = str(tmp_path)
+    for i in range(5):
+        write_manifest(project, manifest_text(str(i)), depth=3)
+    versions = journal_versions(project)
+    assert len(versions) == 3
+    with open(versions[0]) as f:
+        assert json.load(f)["name"] == "4"
+
+
+def test_damaged_manifest_is_recovered_from_the_journal(tmp_path):
+    project = str(tmp_path)
+    write_manifest(project, manifest_text("good"))
+    path = os.path.join(project, "manifest.json")
+    with open(path, "w") as f:
+        f.write('{"name": "tru')
+    manifest, recovered_from = recover_manifest(project)
+    assert manifest == {"name": "good"}
+    assert recovered_from == journal_versions(project)[0]
+    assert read_manifest(project) == ({"name": "good"}, None)
+
+
+def test_unreadable_manifest_without_journal_raises(tmp_path):
+    with open(tmp_path / "manifest.json", "w") as f:
+        f.write("{")
+    with pytest.raises(ValueError):
+        read_manifest(str(tmp_path))
+
+
+@pytest.mark.skipif(os.name != "posix", reason="file modes are POSIX only")
+def test_written_files_keep_normal_modes(tmp_path):
+    project = str(tmp_path)
+    write_manifest(project, manifest_text("one"))
+    path = os.path.join(project, "manifest.json")
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~UMASK
+    os.chmod(path, 0o640)
+    write_manifest(project, manifest_text("two"))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
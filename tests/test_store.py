@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from xggx.store import STORE_DIR, AssetStore
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@pytest.fixture
+def store(tmp_path):
+    os.makedirs(tmp_path / STORE_DIR)
+    return AssetStore(str(tmp_path))
+
+
+def test_same_content_shares_one_blob(tmp_path, store):
+    data = os.urandom(128 * 1024)
+    for project in ("a", "b"):
+        write(str(tmp_path / project / "wallpaper" / "w.png"), data)
+        assert store.dedupe(str(tmp_path / project)) == 1
+    assert len(list(store.blobs())) == 1
+    for project in ("a", "b"):
+        with open(tmp_path / project / "wallpaper" / "w.png", "rb") as f:
+            assert f.read() == data
+    assert AssetStore.for_project(str(tmp_path / "a")).path == store.path
+
+
+def test_gc_keeps_referenced_blobs(tmp_path, store):
+    write(str(tmp_path / "a" / "w.png"), os.urandom(128 * 1024))
+    store.dedupe(str(tmp_path / "a"))
+    assert store.gc() == (0, 0)
+    assert len(list(store.blobs())) == 1
+
+
+def test_gc_removes_blobs_of_deleted_and_replaced_files(tmp_path, store):
+    write(str(tmp_path / "a" / "deleted.png"), os.urandom(128 * 1024))
+    write(str(tmp_path / "a" / "replaced.png"), os.urandom(128 * 1024))
+    store.dedupe(str(tmp_path / "a"))
+    os.remove(tmp_path / "a" / "deleted.png")
+    # Editors usually write a new file and rename it over the old one
+    write(str(tmp_path / "a" / "new.png"), b"edited")
+    os.replace(tmp_path / "a" / "new.png", tmp_path / "a" / "replaced.png")
+
+    removed, freed = AssetStore(str(tmp_path)).gc()
+    assert (removed, freed) == (2, 256 * 1024)
+    assert list(store.blobs()) == []
+    with open(tmp_path / "a" / "replaced.png", "rb") as f:
+        assert f.read() == b"edited"
@@ -0,0 +1,47 @@
+from xggx.styles import bundle_css, dedupe_rules, minify_css, minify_glsl, split_css
+
+
+def test_minify_keeps_descendant_pseudo_selectors():
+    assert minify_css("a :hover { color : red ; }") == "a :hover{color:red}"
+    assert minify_css("a:hover{color:red}") == "a:hover{color:red}"
+
+
+def test_minify_keeps_spaces_calc_needs():
+    assert minify_css("div { width: calc(1px + 2px); margin: 0 -1px }") == \
+        "div{width:calc(1px + 2px);margin:0 -1px}"
+
+
+def test_minify_leaves_strings_alone():
+    css = 'a::after { content: ";}  /* not a comment */"; }'
+    assert minify_css(css) == 'a::after{content:";}  /* not a comment */"}'
+    assert minify_css("b { content: '\\';}' }") == "b{content:'\\';}'}"
+
+
+def test_minify_drops_comments_and_last_semicolons():
+    assert minify_css("/* head */\na {\n  color: red; /* inline */\n}\n\n@media (max-width: 10px) {\n  a { b: c; }\n}") \
+        == "a{color:red}@media (max-width:10px){a{b:c}}"
+
+
+def test_split_ignores_braces_in_strings():
+    css = minify_css('@import "x.css";a{content:"}"}@media print{a{b:c}}')
+    assert split_css(css) == ['@import "x.css";', 'a{content:"}"}', "@media print{a{b:c}}"]
+
+
+def test_dedupe_keeps_the_last_copy():
+    sheets = [["a{b:c}", "d{e:f}"], ['@import "x.css";', "a{b:c}"]]
+    assert dedupe_rules(sheets) == [["d{e:f}"], ['@import "x.css";', "a{b:c}"]]
+
+
+def test_dedupe_never_drops_statements():
+    sheets = [['@charset "utf-8";'], ['@charset "utf-8";']]
+    assert dedupe_rules(sheets) == sheets
+
+
+def test_bundle_hoists_statements_once():
+    sheets = [["a{b:c}", '@import "x.css";'], ['@import "x.css";', "d{e:f}"]]
+    assert bundle_css(sheets) == '@import "x.css";a{b:c}d{e:f}'
+
+
+def test_minify_glsl_keeps_directives_on_their_own_lines():
+    source = "#version 300 es\n// comment\nvoid main() {  /* block */\n    gl_FragColor = vec4(1.0);\n}\n"
+    assert minify_glsl(source) == "#version 300 es\nvoid main() {\ngl_FragColor = vec4(1.0);\n}\n"
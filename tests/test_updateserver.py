@@ -0,0 +1,88 @@
+import http.client
+import json
+import os
+import threading
+
+import pytest
+
+from xggx.model import ModProject
+from xggx.release import release_project
+from xggx.updateserver import make_server, parse_range
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@pytest.fixture
+def server(tmp_path):
+    project = ModProject()
+    project.set(("name",), "Server Test")
+    path = str(tmp_path / "mod")
+    write(os.path.join(path, "manifest.json"), project.to_json().encode("utf-8"))
+    write(os.path.join(path, "stickers", "a.png"), os.urandom(32 * 1024))
+    releases = str(tmp_path / "releases")
+    first = release_project(path, releases)
+    write(os.path.join(path, "stickers", "b.png"), os.urandom(1024))
+    second = release_project(path, releases)
+
+    httpd = make_server(releases, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, first, second
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(httpd, path, headers=None):
+    conn = http.client.HTTPConnection(*httpd.server_address)
+    try:
+        conn.request("GET", path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=10-19", 100) == (10, 19)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-5", 100) == (95, 99)
+    assert parse_range("bytes=100-", 100) == "unsatisfiable"
+    assert parse_range("bytes=0-1,5-6", 100) is None
+
+
+def test_updates_offer_a_delta_from_the_installed_version(server):
+    httpd, first, second = server
+    status, _, body = get(httpd, f"/updates.json?version={first.version}")
+    assert status == 200
+    response = json.loads(body)
+    assert response["version"] == second.version
+    assert not response["up_to_date"]
+    assert response["delta"]["from"] == first.version
+
+    status, _, body = get(httpd, f"/updates.json?version={second.version}")
+    assert json.loads(body)["up_to_date"]
+
+
+def test_packages_support_ranges_and_etags(server):
+    httpd, _, second = server
+    url = "/" + os.path.basename(second.zip_path)
+    with open(second.zip_path, "rb") as f:
+        data = f.read()
+    status, headers, body = get(httpd, url)
+    assert (status, body) == (200, data)
+
+    status, _, body = get(httpd, url, {"Range": "bytes=10-", "If-Range": headers["ETag"]})
+    assert (status, body) == (206, data[10:])
+    status, _, body = get(httpd, url, {"If-None-Match": headers["ETag"]})
+    assert (status, body) == (304, b"")
+
+
+def test_only_listed_packages_are_served(server):
+    httpd, *_ = server
+    assert get(httpd, "/releases.json")[0] == 404
+    assert get(httpd, "/../mod/manifest.json")[0] == 404
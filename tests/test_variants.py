@@ -0,0 +1,64 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+from xggx.model import ModProject
+from xggx.variants import check_axes, expand_matrix, generate_variants, parse_axis, variant_manifest
+
+
+def test_parse_axis():
+    assert parse_axis("gx_accent.h=0:360:120") == (("dark.gx_accent.h", "light.gx_accent.h"), [0, 120, 240])
+    assert parse_axis("dark.gx_secondary_base.l=10,20") == (("dark.gx_secondary_base.l",), [10, 20])
+
+
+def test_hues_wrap_and_repeats_are_dropped():
+    assert parse_axis("gx_accent.h=0:720:180")[1] == [0, 180]
+    assert parse_axis("gx_accent.s=10,10,20")[1] == [10, 20]
+
+
+@pytest.mark.parametrize("spec", ["gx_accent.h", "gx_accent.x=1", "nope.h=1", "gx_accent.l=0:10:0", "gx_accent.l=200"])
+def test_parse_axis_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_axis(spec)
+
+
+def test_overlapping_axes_are_rejected():
+    with pytest.raises(ValueError):
+        check_axes([parse_axis("gx_accent.h=1,2"), parse_axis("light.gx_accent.h=3")])
+
+
+def test_matrix_sets_both_modes():
+    axes = [parse_axis("gx_accent.h=0,180"), parse_axis("dark.gx_accent.l=10,20")]
+    combinations = expand_matrix(axes)
+    assert len(combinations) == 4
+    assert combinations[-1][1] == {"dark.gx_accent.h": 180, "light.gx_accent.h": 180, "dark.gx_accent.l": 20}
+
+
+def test_variant_manifest_keeps_everything_else():
+    manifest = {"name": "Base", "homepage_url": "x", "mod": {"payload": {"stickers": [{"id": "0"}]}}}
+    variant = variant_manifest(manifest, "Base (accent h90)", {"dark.gx_accent.h": 90})
+    assert variant["homepage_url"] == "x"
+    assert variant["mod"]["payload"]["stickers"] == [{"id": "0"}]
+    assert variant["mod"]["payload"]["theme"][0]["dark"]["gx_accent"]["h"] == 90
+    assert "theme" not in manifest["mod"]["payload"]
+
+
+def test_generate_variants(tmp_path):
+    project = ModProject()
+    project.set(("name",), "Sweep")
+    path = str(tmp_path / "mod")
+    os.makedirs(os.path.join(path, "stickers"))
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        f.write(project.to_json())
+    with open(os.path.join(path, "stickers", "a.png"), "wb") as f:
+        f.write(os.urandom(4096))
+
+    results = list(generate_variants(path, [parse_axis("gx_accent.h=0:360:120")], str(tmp_path / "out"), workers=1))
+    assert len({zip_path for _, zip_path, _ in results}) == 3
+    for name, zip_path, _ in results:
+        with zipfile.ZipFile(zip_path) as zipf:
+            assert zipf.testzip() is None
+            assert "stickers/a.png" in zipf.namelist()
+            assert json.loads(zipf.read("manifest.json"))["name"] == name